@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Process, Service, Network, CPUUsage, MemoryUsage, NetworkUsage, UserProfile, AuditLog, BugReport
+from .models import Process, Service, Network, CPUUsage, MemoryUsage, NetworkUsage, DiskIOUsage, UserProfile, AuditLog, BugReport
 
 admin.site.register(Process)
 admin.site.register(Service)
@@ -7,6 +7,7 @@ admin.site.register(Network)
 admin.site.register(CPUUsage)
 admin.site.register(MemoryUsage)
 admin.site.register(NetworkUsage)
+admin.site.register(DiskIOUsage)
 admin.site.register(UserProfile)
 admin.site.register(AuditLog)
 
@@ -0,0 +1,166 @@
+# api/blocklist.py
+import ipaddress
+import logging
+import threading
+
+from django.conf import settings
+
+from .commands import run_command
+
+logger = logging.getLogger('hyperion.api')
+
+# Nom de l'ensemble ipset (suffixe -v6 pour IPv6) et taille maximale de chacun
+SET_NAME = getattr(settings, 'BLOCKLIST_SET_NAME', 'hyperion-blocklist')
+MAX_ELEMENTS = getattr(settings, 'BLOCKLIST_MAX_ELEMENTS', 65536)
+# Règles iptables identiques retirées au plus par adresse (ancien block_ip appelé plusieurs fois)
+LEGACY_DUPLICATES = 16
+
+
+def parse_addresses(addresses) -> list:
+    """Normalised networks (a bare address becomes a /32 or /128); ValueError if invalid"""
+    return [ipaddress.ip_network(str(address).strip(), strict=False) for address in addresses]
+
+
+class IPBlocklist:
+    """Blocked addresses kept in ipset hash:net sets, matched by one iptables rule each.
+
+    A lookup in the set costs the same for 10 or 10 000 addresses, where
+    one ``iptables -A`` rule per address is matched linearly. Every batch of
+    adds and removes is a single ``ipset restore`` call, so blocking a list
+    forks once. The set and DROP rule of a family are created with its
+    first address, so a host without ip6tables still blocks IPv4.
+
+    ``runner`` takes the argument list and an optional ``input`` and returns
+    a ``CommandResult``; tests swap it for a fake.
+    """
+
+    FAMILIES = {
+        # version IP : (famille ipset, suffixe du nom, commande du pare-feu)
+        4: ('inet', '', 'iptables'),
+        6: ('inet6', '-v6', 'ip6tables'),
+    }
+
+    def __init__(self, name=SET_NAME, runner=run_command, max_elements=MAX_ELEMENTS, sudo=True):
+        self.name = name
+        self.runner = runner
+        self.max_elements = max_elements
+        self.prefix = ['sudo'] if sudo else []
+        self._ready = set()
+        self._lock = threading.Lock()
+
+    def set_name(self, network) -> str:
+        return self.name + self.FAMILIES[network.version][1]
+
+    def _run(self, args, input=None):
+        return self.runner(self.prefix + args, input=input)
+
+    def _restore(self, lines) -> bool:
+        script = '\n'.join(lines + [''])
+        return self._run(['ipset', '-exist', 'restore'], input=script.encode()).ok
+
+    def ensure(self, version) -> bool:
+        """Create the set of one IP version and its DROP rule if they do not exist yet"""
+        family, suffix, firewall = self.FAMILIES[version]
+        with self._lock:
+            if version in self._ready:
+                return True
+            if not self._restore([f'create {self.name}{suffix} hash:net family {family} maxelem {self.max_elements}']):
+                return False
+            rule = ['INPUT', '-m', 'set', '--match-set', f'{self.name}{suffix}', 'src', '-j', 'DROP']
+            # -C vérifie la présence de la règle : une seule règle par ensemble
+            if not self._run([firewall, '-C'] + rule).ok and not self._run([firewall, '-I'] + rule).ok:
+                logger.warning(f"Liste de blocage IPv{version} indisponible : règle {firewall} non créée")
+                return False
+            self._ready.add(version)
+            return True
+
+    def apply(self, add=(), remove=()) -> bool:
+        """Add and remove addresses in one ``ipset restore`` invocation.
+
+        Addresses of a family whose set cannot be set up are skipped, the
+        others are still applied; False is then returned.
+        """
+        add, remove = parse_addresses(add), parse_addresses(remove)
+        if not add and not remove:
+            return True
+        ready = {version for version in sorted({network.version for network in add + remove})
+                 if self.ensure(version)}
+        lines = [f'add {self.set_name(network)} {network}' for network in add if network.version in ready]
+        lines += [f'del {self.set_name(network)} {network}' for network in remove if network.version in ready]
+        applied = not lines or self._restore(lines)
+        if applied and lines:
+            logger.info(f"Liste de blocage : {len(lines)} ajout(s) ou retrait(s)")
+        return applied and len(lines) == len(add) + len(remove)
+
+    def _legacy_rule(self, network) -> list:
+        # Règle créée par block_ip avant la liste ipset : iptables -A INPUT -s <ip> -j DROP
+        firewall = self.FAMILIES[network.version][2]
+        host = network.network_address if network.prefixlen == network.max_prefixlen else network
+        return [firewall, '-D', 'INPUT', '-s', str(host), '-j', 'DROP']
+
+    def _drop_legacy(self, networks) -> int:
+        removed = 0
+        for network in networks:
+            # Une adresse bloquée plusieurs fois avait autant de règles identiques
+            for _ in range(LEGACY_DUPLICATES):
+                if not self._run(self._legacy_rule(network)).ok:
+                    break
+                removed += 1
+        return removed
+
+    def drop_legacy_rules(self, addresses) -> int:
+        """Delete the per-address DROP rules of the former block_ip that are still listed"""
+        networks = parse_addresses(addresses)
+        if not networks:
+            return 0
+        # Une lecture de INPUT : aucun iptables -D pour les adresses sans ancienne règle
+        listed = set(parse_addresses(self.legacy_rules()))
+        return self._drop_legacy([network for network in networks if network in listed])
+
+    def legacy_rules(self) -> list:
+        """Addresses still blocked by per-address rules, read from ``iptables -S INPUT``"""
+        addresses = []
+        for _, _, firewall in self.FAMILIES.values():
+            result = self._run([firewall, '-S', 'INPUT'])
+            if not result.ok:
+                continue
+            for line in result.stdout.splitlines():
+                parts = line.split()
+                # Exactement « -A INPUT -s <réseau> -j DROP » : les autres règles ne sont pas à nous
+                if len(parts) == 6 and parts[:3] == ['-A', 'INPUT', '-s'] and parts[4:] == ['-j', 'DROP']:
+                    addresses.append(parts[3])
+        # Règles en double : _drop_legacy les retire toutes
+        return list(dict.fromkeys(addresses))
+
+    def migrate_legacy_rules(self) -> list:
+        """Move the per-address rules into the sets: one restore, then one delete per rule"""
+        addresses = self.legacy_rules()
+        if addresses and self.add(addresses):
+            self._drop_legacy(parse_addresses(addresses))
+            return addresses
+        return []
+
+    def add(self, addresses) -> bool:
+        return self.apply(add=addresses)
+
+    def remove(self, addresses) -> bool:
+        return self.apply(remove=addresses)
+
+    def members(self) -> list:
+        """Blocked networks, read back with ``ipset save``"""
+        members = []
+        for _, suffix, _ in self.FAMILIES.values():
+            result = self._run(['ipset', 'save', f'{self.name}{suffix}'])
+            if not result.ok:
+                continue
+            for line in result.stdout.splitlines():
+                parts = line.split()
+                if len(parts) >= 3 and parts[0] == 'add':
+                    members.append(parts[2])
+        return members
+
+    def reset(self):
+        self._ready = set()
+
+
+ip_blocklist = IPBlocklist()
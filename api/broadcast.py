@@ -0,0 +1,145 @@
+# api/broadcast.py
+import asyncio
+import json
+import logging
+import os
+
+from asgiref.sync import sync_to_async
+
+from .disk_sampler import live_disk_io_sampler
+from .recent import recent_samples
+
+logger = logging.getLogger('hyperion.api')
+
+# Groupe commun à tous les workers, alimenté par le démon hyperion_collector
+LIVE_GROUP = 'metrics.live'
+# Événements de cycle de vie des processus, publiés par Celery (api.process_events)
+PROCESS_EVENTS_GROUP = 'processes.events'
+# Avancement des opérations groupées sur les services (api.service_bulk)
+SERVICES_GROUP = 'services.bulk'
+
+
+class MetricBroadcaster:
+    """Compute a metric payload once per tick and fan it out to a channel-layer group.
+
+    Consumers only join and leave the group; a single producer task per worker
+    process queries the database, whatever the number of open sockets.
+    """
+
+    message_type = 'metric.update'
+
+    def __init__(self, metric, fetch, interval=1.0):
+        self.metric = metric
+        self.fetch = fetch
+        self.interval = interval
+        # Groupe propre au worker : chaque producteur ne sert que ses sockets locales
+        self.group_name = f'metrics.{metric}.{os.getpid()}'
+        self.subscribers = 0
+        self.ticks = 0
+        self.last_text = None
+        self._task = None
+
+    async def subscribe(self, channel_layer, channel_name):
+        """Add a channel to the group and start the producer if needed"""
+        await channel_layer.group_add(self.group_name, channel_name)
+        self.subscribers += 1
+        if self.last_text is not None:
+            # Envoyer immédiatement le dernier état aux nouveaux abonnés
+            await channel_layer.send(channel_name, {
+                'type': self.message_type,
+                'metric': self.metric,
+                'text': self.last_text,
+            })
+        if not self._is_running():
+            self._task = asyncio.ensure_future(self._run(channel_layer))
+
+    async def unsubscribe(self, channel_layer, channel_name):
+        """Remove a channel from the group; the producer stops with the last one"""
+        await channel_layer.group_discard(self.group_name, channel_name)
+        self.subscribers = max(self.subscribers - 1, 0)
+        if self.subscribers == 0 and self._is_running():
+            self._task.cancel()
+
+    def _is_running(self):
+        if self._task is None or self._task.done():
+            return False
+        # Une tâche attachée à une autre boucle (boucle fermée) ne tourne plus
+        return self._task.get_loop() is asyncio.get_running_loop()
+
+    async def tick(self, channel_layer):
+        """Compute the payload once and send it to every subscriber"""
+        payload = await sync_to_async(self.fetch)()
+        self.last_text = json.dumps(payload)
+        self.ticks += 1
+        await channel_layer.group_send(self.group_name, {
+            'type': self.message_type,
+            'metric': self.metric,
+            'text': self.last_text,
+        })
+
+    async def _run(self, channel_layer):
+        while self.subscribers > 0:
+            try:
+                await self.tick(channel_layer)
+            except Exception:
+                # Base indisponible, cache froid en échec... : nouvel essai au tick suivant
+                logger.exception(f"Diffusion de la métrique {self.metric} impossible")
+            await asyncio.sleep(self.interval)
+
+
+class GroupStream:
+    """Channel-layer group fed by a producer running outside the ASGI workers.
+
+    Unlike MetricBroadcaster there is no local producer task: consumers only
+    join the group, e.g. the one the ``hyperion_collector`` daemon publishes to.
+    """
+
+    message_type = 'metric.update'
+
+    def __init__(self, metric, group_name):
+        self.metric = metric
+        self.group_name = group_name
+
+    async def subscribe(self, channel_layer, channel_name):
+        await channel_layer.group_add(self.group_name, channel_name)
+
+    async def unsubscribe(self, channel_layer, channel_name):
+        await channel_layer.group_discard(self.group_name, channel_name)
+
+
+def recent_usage_payload(series, message_type, limit=50):
+    """Latest usage samples of a metric, formatted for the dashboard charts"""
+    return {
+        'type': message_type,
+        'data': recent_samples.latest(series, limit)
+    }
+
+
+def recent_network_usage(limit=50):
+    """Latest per-interface network counters, newest first"""
+    return recent_samples.latest('network', limit)
+
+
+def get_cpu_payload():
+    return recent_usage_payload('cpu', 'cpu_usage')
+
+
+def get_memory_payload():
+    return recent_usage_payload('memory', 'memory_usage')
+
+
+def get_disk_io_payload():
+    """Per-device I/O rates since the previous tick"""
+    rates = live_disk_io_sampler.sample()
+    return {
+        'type': 'disk_io',
+        'data': [{'device': device, **values} for device, values in sorted(rates.items())]
+    }
+
+
+cpu_broadcaster = MetricBroadcaster('cpu', get_cpu_payload)
+memory_broadcaster = MetricBroadcaster('memory', get_memory_payload)
+live_stream = GroupStream('live', LIVE_GROUP)
+process_events_stream = GroupStream('process_events', PROCESS_EVENTS_GROUP)
+service_bulk_stream = GroupStream('service_bulk', SERVICES_GROUP)
+disk_io_broadcaster = MetricBroadcaster('disk_io', get_disk_io_payload, interval=2.0)
@@ -0,0 +1,239 @@
+# api/chunks.py
+import struct
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import MetricChunk
+from .rollups import SOURCES, bucket_start
+
+# Fenêtre de points regroupés dans un bloc, par série
+CHUNK_SECONDS = 3600
+
+# Delta-of-delta des horodatages (ms) : (préfixe, longueur du préfixe, bits de valeur)
+_DOD_CLASSES = (
+    (0b10, 2, 7),
+    (0b110, 3, 9),
+    (0b1110, 4, 12),
+)
+_DOD_FALLBACK = (0b1111, 4, 64)
+
+
+class BitWriter:
+    def __init__(self):
+        self.buffer = bytearray()
+        self._acc = 0
+        self._bits = 0
+
+    def write(self, value, bits):
+        self._acc = (self._acc << bits) | (value & ((1 << bits) - 1))
+        self._bits += bits
+        while self._bits >= 8:
+            self._bits -= 8
+            self.buffer.append((self._acc >> self._bits) & 0xFF)
+        self._acc &= (1 << self._bits) - 1
+
+    def getvalue(self) -> bytes:
+        if self._bits:
+            return bytes(self.buffer) + bytes([(self._acc << (8 - self._bits)) & 0xFF])
+        return bytes(self.buffer)
+
+
+class BitReader:
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def read(self, bits) -> int:
+        value = 0
+        while bits:
+            byte = self.data[self.position >> 3]
+            offset = self.position & 7
+            take = min(8 - offset, bits)
+            value = (value << take) | ((byte >> (8 - offset - take)) & ((1 << take) - 1))
+            self.position += take
+            bits -= take
+        return value
+
+
+def _signed(value, bits):
+    return value - (1 << bits) if value >= 1 << (bits - 1) else value
+
+
+def _float_bits(value):
+    return struct.unpack('>Q', struct.pack('>d', value))[0]
+
+
+def _bits_float(bits):
+    return struct.unpack('>d', struct.pack('>Q', bits))[0]
+
+
+def _leading_zeros(value):
+    return 64 - value.bit_length()
+
+
+def _trailing_zeros(value):
+    return (value & -value).bit_length() - 1
+
+
+def encode_points(points) -> bytes:
+    """Gorilla-encode (epoch_ms, float) pairs sorted by time.
+
+    Timestamps are stored as delta-of-delta with variable-length prefixes and
+    values as the XOR with the previous value, keeping only the meaningful
+    bits; regular sampling and slowly changing values cost a few bits each.
+    """
+    writer = BitWriter()
+    writer.write(len(points), 32)
+    if not points:
+        return writer.getvalue()
+
+    timestamp, value = points[0]
+    writer.write(timestamp, 64)
+    previous_bits = _float_bits(value)
+    writer.write(previous_bits, 64)
+    previous_timestamp, previous_delta = timestamp, 0
+    leading, trailing = 65, 65
+
+    for timestamp, value in points[1:]:
+        delta = timestamp - previous_timestamp
+        dod = delta - previous_delta
+        if dod == 0:
+            writer.write(0, 1)
+        else:
+            for prefix, prefix_bits, bits in _DOD_CLASSES:
+                if -(1 << (bits - 1)) <= dod < 1 << (bits - 1):
+                    break
+            else:
+                prefix, prefix_bits, bits = _DOD_FALLBACK
+            writer.write(prefix, prefix_bits)
+            writer.write(dod, bits)
+        previous_timestamp, previous_delta = timestamp, delta
+
+        bits = _float_bits(value)
+        xor = bits ^ previous_bits
+        previous_bits = bits
+        if xor == 0:
+            writer.write(0, 1)
+            continue
+        writer.write(1, 1)
+        new_leading = min(_leading_zeros(xor), 31)
+        new_trailing = _trailing_zeros(xor)
+        if new_leading >= leading and new_trailing >= trailing:
+            # Les bits significatifs tiennent dans la fenêtre précédente
+            writer.write(0, 1)
+            writer.write(xor >> trailing, 64 - leading - trailing)
+        else:
+            leading, trailing = new_leading, new_trailing
+            meaningful = 64 - leading - trailing
+            writer.write(1, 1)
+            writer.write(leading, 5)
+            writer.write(meaningful & 0x3F, 6)  # 64 est codé 0
+            writer.write(xor >> trailing, meaningful)
+    return writer.getvalue()
+
+
+def decode_points(data):
+    """Yield the (epoch_ms, float) pairs of an encoded chunk"""
+    reader = BitReader(data)
+    count = reader.read(32)
+    if not count:
+        return
+    timestamp = _signed(reader.read(64), 64)
+    value_bits = reader.read(64)
+    yield timestamp, _bits_float(value_bits)
+    delta = 0
+    leading = trailing = 0
+
+    for _ in range(count - 1):
+        if reader.read(1):
+            # Préfixe 10, 110, 1110 ou 1111 : taille du delta-of-delta
+            bits = _DOD_FALLBACK[2]
+            for _prefix, _prefix_bits, class_bits in _DOD_CLASSES:
+                if not reader.read(1):
+                    bits = class_bits
+                    break
+            delta += _signed(reader.read(bits), bits)
+        timestamp += delta
+
+        if reader.read(1):
+            if reader.read(1):
+                leading = reader.read(5)
+                meaningful = reader.read(6) or 64
+                trailing = 64 - leading - meaningful
+            value_bits ^= reader.read(64 - leading - trailing) << trailing
+        yield timestamp, _bits_float(value_bits)
+
+
+def _epoch_ms(moment):
+    return int(moment.timestamp() * 1000)
+
+
+def _from_epoch_ms(epoch_ms):
+    return datetime.fromtimestamp(epoch_ms / 1000, tz=dt_timezone.utc)
+
+
+def pack_chunks(metric, now=None, window=CHUNK_SECONDS) -> int:
+    """Pack the raw samples of closed windows into MetricChunk rows"""
+    source = SOURCES[metric]
+    end = bucket_start(now or timezone.now(), window)
+    last = MetricChunk.objects.filter(metric=metric).aggregate(last=Max('start'))['last']
+    if last is not None:
+        start = last + timedelta(seconds=window)
+    else:
+        first = source.model.objects.aggregate(first=Min('recorded_at'))['first']
+        if first is None:
+            return 0
+        start = bucket_start(first, window)
+
+    fields = ['recorded_at', source.value_field]
+    if source.series_field:
+        fields.append(source.series_field)
+
+    written = 0
+    step = timedelta(seconds=window)
+    while start < end:
+        series = defaultdict(list)
+        rows = source.model.objects.filter(
+            recorded_at__gte=start, recorded_at__lt=start + step,
+            **{f'{source.value_field}__isnull': False}
+        ).order_by('recorded_at').values_list(*fields)
+        for row in rows.iterator():
+            series[row[2] if source.series_field else ''].append((_epoch_ms(row[0]), float(row[1])))
+        if not series:
+            # Trou dans les données : reprendre à la fenêtre du prochain échantillon
+            following = source.model.objects.filter(
+                recorded_at__gte=start + step
+            ).aggregate(first=Min('recorded_at'))['first']
+            if following is None:
+                break
+            start = max(bucket_start(following, window), start + step)
+            continue
+
+        chunks = [
+            MetricChunk(
+                metric=metric, series=name, start=start, end=start + step,
+                count=len(points), data=encode_points(points)
+            )
+            for name, points in series.items()
+        ]
+        with transaction.atomic():
+            MetricChunk.objects.bulk_create(chunks, ignore_conflicts=True)
+        written += len(chunks)
+        start += step
+    return written
+
+
+def iter_points(metric, start, end, series=None):
+    """Stream decoded (series, recorded_at, value) points in [start, end), chunk by chunk"""
+    chunks = MetricChunk.objects.filter(metric=metric, start__lt=end, end__gt=start)
+    if series is not None:
+        chunks = chunks.filter(series=series)
+    low, high = _epoch_ms(start), _epoch_ms(end)
+    for chunk in chunks.order_by('start', 'series').iterator():
+        for timestamp, value in decode_points(bytes(chunk.data)):
+            if low <= timestamp < high:
+                yield chunk.series, _from_epoch_ms(timestamp), value
@@ -0,0 +1,93 @@
+# api/collection.py
+import logging
+
+import psutil
+from django.db import transaction
+from django.utils import timezone
+
+from .cpu_sampler import RECORDED_MODES, cpu_sampler
+from .disk_sampler import disk_io_sampler
+from .models import CPUUsage, DiskIOUsage, MemoryUsage, NetworkUsage, StorageUsage
+from .net_sampler import net_sampler
+from .recent import recent_samples
+from .utils import get_storage_info
+
+logger = logging.getLogger('hyperion.api')
+
+
+def _read(source, reader, default):
+    # Une source en échec ne fait pas perdre les autres mesures de l'instantané
+    try:
+        return reader()
+    except Exception:
+        logger.exception(f"Collecte de la source {source} impossible")
+        return default
+
+
+def collect_snapshot() -> dict:
+    """Read every collected metric from psutil once, at a single instant.
+
+    Each source is read on its own: one that fails is logged and left empty
+    (None for CPU and memory) while the others are still recorded.
+    """
+    recorded_at = timezone.now()
+    network = _read('network', lambda: psutil.net_io_counters(pernic=True), {})
+    return {
+        'recorded_at': recorded_at,
+        'cpu': _read('cpu', cpu_sampler.sample, None),
+        'memory': _read('memory', psutil.virtual_memory, None),
+        'swap': _read('swap', psutil.swap_memory, None),
+        'network': network,
+        'network_rates': _read('network_rates', lambda: net_sampler.sample(network, recorded_at), {}) if network else {},
+        'storage': _read('storage', get_storage_info, []),
+        'disk_io': _read('disk_io', lambda: disk_io_sampler.sample(now=recorded_at), {}),
+    }
+
+
+def build_rows(snapshot) -> dict:
+    """Unsaved model instances for a snapshot, all sharing its timestamp"""
+    recorded_at = snapshot['recorded_at']
+    cpu = snapshot['cpu']
+    memory, swap = snapshot['memory'], snapshot['swap']
+    return {
+        CPUUsage: [CPUUsage(
+            usage=cpu['usage'],
+            per_core=cpu['per_core'],
+            recorded_at=recorded_at,
+            **{mode: cpu['modes'].get(mode) for mode in RECORDED_MODES}
+        )] if cpu is not None else [],
+        MemoryUsage: [MemoryUsage(
+            usage=memory.percent,
+            swap=swap.percent if swap is not None else None,
+            recorded_at=recorded_at
+        )] if memory is not None else [],
+        NetworkUsage: [
+            NetworkUsage(
+                interface=interface,
+                received=stats.bytes_recv,
+                sent=stats.bytes_sent,
+                recorded_at=recorded_at,
+                **snapshot['network_rates'].get(interface, {})
+            )
+            for interface, stats in snapshot['network'].items()
+        ],
+        StorageUsage: [
+            StorageUsage(recorded_at=recorded_at, **info)
+            for info in snapshot['storage']
+        ],
+        DiskIOUsage: [
+            DiskIOUsage(device=device, recorded_at=recorded_at, **rates)
+            for device, rates in snapshot['disk_io'].items()
+        ],
+    }
+
+
+def persist_snapshot(snapshot) -> dict:
+    """Write a snapshot with one bulk INSERT per model, in a single transaction"""
+    rows = build_rows(snapshot)
+    with transaction.atomic():
+        for model, objects in rows.items():
+            if objects:
+                model.objects.bulk_create(objects)
+    recent_samples.record(obj for objects in rows.values() for obj in objects)
+    return {model.__name__: len(objects) for model, objects in rows.items()}
@@ -0,0 +1,200 @@
+# api/collector.py
+import json
+import logging
+import threading
+import time
+from array import array
+from datetime import datetime, timezone as dt_timezone
+
+import psutil
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.utils import timezone
+
+from .broadcast import LIVE_GROUP
+from .models import CPUUsage, MemoryUsage, NetworkUsage
+from .net_sampler import collector_net_sampler
+from .recent import recent_samples
+
+logger = logging.getLogger('hyperion.api')
+
+
+class RingBuffer:
+    """Fixed-size circular buffer of (timestamp, value) pairs in typed arrays.
+
+    Memory is allocated once; appending overwrites the oldest sample and
+    ``total`` counts every sample ever appended, so readers can ask for the
+    samples appended since a previous position.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, timestamp, value):
+        index = self.total % self.capacity
+        self.timestamps[index] = timestamp
+        self.values[index] = value
+        self.total += 1
+
+    def _positions(self, start):
+        start = max(start, self.total - self.capacity, 0)
+        return (position % self.capacity for position in range(start, self.total))
+
+    def last(self, count=None) -> list:
+        """The latest samples as (timestamp, value) pairs, oldest first"""
+        count = len(self) if count is None else min(count, len(self))
+        return [
+            (self.timestamps[index], self.values[index])
+            for index in self._positions(self.total - count)
+        ]
+
+    def values_since(self, position) -> list:
+        """Values appended after ``position`` (a previous ``total``) still in the buffer"""
+        return [self.values[index] for index in self._positions(position)]
+
+
+class MetricCollector:
+    """Sample psutil at a sub-second rate into ring buffers, flush aggregates to the DB.
+
+    Every sample is published on the ``metrics.live`` channel-layer group so
+    that WebSocket consumers read the live buffers without touching the
+    database; every ``flush_interval`` seconds the samples gathered since the
+    previous flush are averaged and written with one bulk INSERT per model.
+    A failing step is logged and the daemon keeps running; samples that
+    could not be written stay pending for the next flush.
+    """
+
+    def __init__(self, interval=0.5, flush_interval=10.0, capacity=3600, live_window=120):
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self.capacity = capacity
+        self.live_window = live_window
+        self.cpu = RingBuffer(capacity)
+        self.memory = RingBuffer(capacity)
+        self.network = {}
+        self.flushes = 0
+        self._flushed = 0
+        self._interfaces = ()
+        self._counters = {}
+        self._sampled_at = None
+
+    def sample(self, now=None):
+        now = time.time() if now is None else now
+        # Intervalle None : usage depuis l'appel précédent, sans attente
+        self.cpu.append(now, psutil.cpu_percent(None))
+        self.memory.append(now, psutil.virtual_memory().percent)
+        counters = psutil.net_io_counters(pernic=True)
+        for interface, stats in counters.items():
+            if interface not in self.network:
+                self.network[interface] = (RingBuffer(self.capacity), RingBuffer(self.capacity))
+            received, sent = self.network[interface]
+            received.append(now, stats.bytes_recv)
+            sent.append(now, stats.bytes_sent)
+        self._interfaces = tuple(counters)
+        self._counters = counters
+        self._sampled_at = now
+
+    def flush(self) -> dict:
+        """Write the average of the samples gathered since the last flush"""
+        cpu = self.cpu.values_since(self._flushed)
+        memory = self.memory.values_since(self._flushed)
+        if not cpu:
+            return {}
+
+        recorded_at = timezone.now()
+        # Débits calculés depuis le dernier relevé écrit, à l'instant de l'échantillon
+        rates = collector_net_sampler.sample(
+            self._counters, datetime.fromtimestamp(self._sampled_at, tz=dt_timezone.utc)
+        )
+        rows = {
+            CPUUsage: [CPUUsage(usage=round(sum(cpu) / len(cpu), 1), recorded_at=recorded_at)],
+            MemoryUsage: [MemoryUsage(usage=round(sum(memory) / len(memory), 1), recorded_at=recorded_at)],
+            NetworkUsage: [
+                NetworkUsage(
+                    interface=interface,
+                    received=int(self.network[interface][0].last(1)[0][1]),
+                    sent=int(self.network[interface][1].last(1)[0][1]),
+                    recorded_at=recorded_at,
+                    **rates.get(interface, {})
+                )
+                for interface in self._interfaces
+            ],
+        }
+        with transaction.atomic():
+            for model, objects in rows.items():
+                if objects:
+                    model.objects.bulk_create(objects)
+        # Lignes écrites : un échec du cache récent ne doit pas les réécrire au prochain flush
+        self._flushed = self.cpu.total
+        self.flushes += 1
+        recent_samples.record(obj for objects in rows.values() for obj in objects)
+        return {model.__name__: len(objects) for model, objects in rows.items()}
+
+    def live_payload(self) -> dict:
+        """Latest samples of the buffers and current per-interface rates (bytes/s)"""
+        network = {}
+        for interface in self._interfaces:
+            rates = {}
+            for field, buffer in zip(('received', 'sent'), self.network[interface]):
+                samples = buffer.last(2)
+                if len(samples) < 2 or samples[1][0] <= samples[0][0]:
+                    rates[field] = 0.0
+                else:
+                    (t0, v0), (t1, v1) = samples
+                    rates[field] = round(max(v1 - v0, 0) / (t1 - t0), 1)
+            network[interface] = rates
+        return {
+            'type': 'live_metrics',
+            'cpu': self.cpu.last(self.live_window),
+            'memory': self.memory.last(self.live_window),
+            'network': network,
+        }
+
+    def publish(self, channel_layer=None):
+        channel_layer = channel_layer or get_channel_layer()
+        if channel_layer is None:
+            return
+        async_to_sync(channel_layer.group_send)(LIVE_GROUP, {
+            'type': 'metric.update',
+            'metric': 'live',
+            'text': json.dumps(self.live_payload()),
+        })
+
+    def _attempt(self, step, action) -> bool:
+        try:
+            action()
+            return True
+        except Exception:
+            # Couche de canaux ou base indisponible : nouvel essai au tour suivant.
+            # flush() n'avance _flushed qu'après l'écriture : rien n'est perdu
+            logger.exception(f"Collecteur : échec de l'étape {step}")
+            return False
+
+    def run(self, stop=None, samples=None):
+        """Sample until ``stop`` is set (or ``samples`` samples were taken), then flush"""
+        stop = stop or threading.Event()
+        psutil.cpu_percent(None)
+        taken = 0
+        next_sample = time.monotonic()
+        next_flush = next_sample + self.flush_interval
+        try:
+            while not stop.is_set() and (samples is None or taken < samples):
+                if self._attempt('sample', self.sample):
+                    self._attempt('publish', self.publish)
+                taken += 1
+                now = time.monotonic()
+                if now >= next_flush:
+                    self._attempt('flush', self.flush)
+                    next_flush = now + self.flush_interval
+                # En retard (machine chargée) : on saute les échantillons manqués
+                next_sample = max(next_sample + self.interval, now)
+                stop.wait(next_sample - now)
+        finally:
+            self._attempt('flush', self.flush)
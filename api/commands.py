@@ -0,0 +1,116 @@
+# api/commands.py
+import asyncio
+import logging
+import subprocess
+import threading
+import time
+import weakref
+from collections import namedtuple
+
+from django.conf import settings
+
+logger = logging.getLogger('hyperion.api')
+
+# Délai par défaut (secondes) et nombre de commandes système exécutées en parallèle
+DEFAULT_TIMEOUT = getattr(settings, 'COMMAND_TIMEOUT', 30.0)
+MAX_CONCURRENCY = getattr(settings, 'COMMAND_CONCURRENCY', 4)
+
+
+class CommandResult(namedtuple('CommandResult', ['args', 'returncode', 'stdout', 'stderr', 'duration', 'timed_out'])):
+    """Outcome of a system command; ``returncode`` is None when it timed out"""
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+_thread_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+# asyncio.Semaphore est lié à sa boucle : un sémaphore par boucle d'événements
+_loop_slots = weakref.WeakKeyDictionary()
+
+
+def _loop_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _loop_slots.get(loop)
+    if semaphore is None:
+        semaphore = _loop_slots[loop] = asyncio.Semaphore(MAX_CONCURRENCY)
+    return semaphore
+
+
+def _log_failure(result):
+    if result.timed_out:
+        logger.warning(f"Commande {result.args[0]} interrompue après {result.duration}s")
+    elif not result.ok:
+        logger.warning(f"Commande {result.args} en échec ({result.returncode}): {result.stderr.strip()}")
+
+
+async def run_command_async(args, timeout=None, input=None) -> CommandResult:
+    """Run a command without blocking the event loop.
+
+    At most ``COMMAND_CONCURRENCY`` commands run at once per event loop; a
+    command still running after ``timeout`` seconds is killed.
+    """
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    async with _loop_semaphore():
+        started = time.monotonic()
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except OSError as e:
+            # Exécutable absent ou non exécutable
+            result = CommandResult(list(args), 127, '', str(e), 0.0, False)
+            _log_failure(result)
+            return result
+
+        timed_out = False
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(input), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            stdout, stderr = await proc.communicate()
+            timed_out = True
+
+    result = CommandResult(
+        list(args),
+        None if timed_out else proc.returncode,
+        stdout.decode('utf-8', 'replace'),
+        stderr.decode('utf-8', 'replace'),
+        round(time.monotonic() - started, 3),
+        timed_out,
+    )
+    _log_failure(result)
+    return result
+
+
+def run_command(args, timeout=None, input=None) -> CommandResult:
+    """Blocking counterpart of ``run_command_async`` for views, tasks and threads"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        raise RuntimeError('run_command() would block the event loop, await run_command_async() instead')
+
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    with _thread_slots:
+        started = time.monotonic()
+        try:
+            completed = subprocess.run(args, input=input, capture_output=True, timeout=timeout)
+            result = CommandResult(
+                list(args), completed.returncode,
+                completed.stdout.decode('utf-8', 'replace'), completed.stderr.decode('utf-8', 'replace'),
+                round(time.monotonic() - started, 3), False,
+            )
+        except subprocess.TimeoutExpired as e:
+            result = CommandResult(
+                list(args), None, (e.stdout or b'').decode('utf-8', 'replace'),
+                (e.stderr or b'').decode('utf-8', 'replace'), round(time.monotonic() - started, 3), True,
+            )
+        except OSError as e:
+            result = CommandResult(list(args), 127, '', str(e), 0.0, False)
+    _log_failure(result)
+    return result
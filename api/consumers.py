@@ -1,6 +1,7 @@
 # hyperion/api/consumers.py
 import asyncio
 import json
+import logging
 import shutil
 import subprocess
 import threading
@@ -8,21 +9,98 @@ import paramiko
 
 from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-from django.apps import apps
 
 from .utils import (
-    get_processes, get_services, stop_process, start_service, stop_service, restart_service,
-    block_ip, unblock_ip, block_port, list_directory, get_storage_info, get_system_temperatures,
+    get_services, stop_process, start_service_async, stop_service_async, restart_service_async,
+    block_ip_async, unblock_ip_async, block_port_async, list_directory, get_storage_info, get_system_temperatures,
 )
+from .broadcast import cpu_broadcaster, memory_broadcaster, live_stream, disk_io_broadcaster, process_events_stream, service_bulk_stream, recent_network_usage
+from .process_snapshot import ProcessStreamState, ProcessSubscription
+
+logger = logging.getLogger('hyperion.api')
+
+async def handle_process_action(data):
+    """Run a process action sent by a client and build the reply"""
+    pid = data.get('pid')
+    if data.get('action') == 'stop':
+        success = stop_process(pid)
+        return {
+            'status': 'success' if success else 'error',
+            'action': 'stop',
+            'pid': pid
+        }
+    return None
+
+
+async def handle_service_action(data):
+    """Run a service action sent by a client and build the reply"""
+    action = data.get('action')
+    service_name = data.get('service')
+
+    success = False
+    if action == 'start':
+        success = await start_service_async(service_name)
+    elif action == 'stop':
+        success = await stop_service_async(service_name)
+    elif action == 'restart':
+        success = await restart_service_async(service_name)
+
+    return {
+        'status': 'success' if success else 'error',
+        'action': action,
+        'service': service_name
+    }
+
+
+async def handle_network_action(data):
+    """Run a firewall action sent by a client and build the reply"""
+    action = data.get('action')
+
+    success = False
+    if action == 'block_ip':
+        ip = data.get('ip_address')
+        success = await block_ip_async(ip)
+    elif action == 'unblock_ip':
+        ip = data.get('ip_address')
+        success = await unblock_ip_async(ip)
+    elif action == 'block_port':
+        port = data.get('port')
+        protocol = data.get('protocol', 'tcp')
+        success = await block_port_async(port, protocol)
+
+    return {
+        'status': 'success' if success else 'error',
+        'action': action
+    }
+
+
+def subscription_error(exc, **extra):
+    return {'type': 'error', 'action': 'subscribe', 'message': str(exc), **extra}
+
 
 class ProcessConsumer(AsyncWebsocketConsumer):
+    """Process table stream: a full snapshot on subscribe, then deltas.
+
+    Every message carries a per-connection ``seq``; a client that detects a
+    gap sends ``{"action": "resync"}`` to get a new full snapshot. A
+    ``{"action": "subscribe", ...}`` message narrows the stream to the rows
+    the client displays (see ProcessSubscription).
+    """
+
     async def connect(self):
         await self.accept()
         self.is_connected = True
+        self.stream = ProcessStreamState()
+        # Événements started/exited/restarted publiés par la tâche detect_process_events
+        await process_events_stream.subscribe(self.channel_layer, self.channel_name)
         asyncio.create_task(self.send_periodic_updates())
 
     async def disconnect(self, close_code):
         self.is_connected = False
+        await process_events_stream.unsubscribe(self.channel_layer, self.channel_name)
+
+    async def metric_update(self, event):
+        await self.send(text_data=event['text'])
 
     async def send_periodic_updates(self):
         while self.is_connected:
@@ -32,33 +110,41 @@ class ProcessConsumer(AsyncWebsocketConsumer):
     async def receive(self, text_data):
         data = json.loads(text_data)
         action = data.get('action')
-        pid = data.get('pid')
-
-        if action == 'stop':
-            success = stop_process(pid)
-            await self.send(text_data=json.dumps({
-                'status': 'success' if success else 'error',
-                'action': 'stop',
-                'pid': pid
-            }))
 
-    @sync_to_async
-    def get_process_data(self):
-        return get_processes()
+        if action == 'resync':
+            await self.send_processes(full=True)
+        elif action == 'subscribe':
+            try:
+                self.stream.subscription = ProcessSubscription.from_message(data)
+            except (TypeError, ValueError) as e:
+                await self.send(text_data=json.dumps(subscription_error(e)))
+                return
+            await self.send_processes(full=True)
+        else:
+            reply = await handle_process_action(data)
+            if reply is not None:
+                await self.send(text_data=json.dumps(reply))
 
-    async def send_processes(self):
-        processes = await self.get_process_data()
-        await self.send(text_data=json.dumps(processes))
+    async def send_processes(self, full=False):
+        message = await sync_to_async(self.stream.next_message)(full)
+        if message is not None:
+            await self.send(text_data=json.dumps(message))
 
 
 class ServiceConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         await self.accept()
         self.is_connected = True
+        # Avancement unité par unité de POST /api/services/bulk/
+        await service_bulk_stream.subscribe(self.channel_layer, self.channel_name)
         asyncio.create_task(self.send_periodic_updates())
 
     async def disconnect(self, close_code):
         self.is_connected = False
+        await service_bulk_stream.unsubscribe(self.channel_layer, self.channel_name)
+
+    async def metric_update(self, event):
+        await self.send(text_data=event['text'])
 
     async def send_periodic_updates(self):
         while self.is_connected:
@@ -67,22 +153,8 @@ class ServiceConsumer(AsyncWebsocketConsumer):
 
     async def receive(self, text_data):
         data = json.loads(text_data)
-        action = data.get('action')
-        service_name = data.get('service')
-
-        success = False
-        if action == 'start':
-            success = start_service(service_name)
-        elif action == 'stop':
-            success = stop_service(service_name)
-        elif action == 'restart':
-            success = restart_service(service_name)
-
-        await self.send(text_data=json.dumps({
-            'status': 'success' if success else 'error',
-            'action': action,
-            'service': service_name
-        }))
+        reply = await handle_service_action(data)
+        await self.send(text_data=json.dumps(reply))
 
     @sync_to_async
     def get_service_data(self):
@@ -100,37 +172,14 @@ class NetworkConsumer(AsyncWebsocketConsumer):
 
     async def receive(self, text_data):
         data = json.loads(text_data)
-        action = data.get('action')
-
-        if action == 'block_ip':
-            ip = data.get('ip_address')
-            success = block_ip(ip)
-        elif action == 'unblock_ip':
-            ip = data.get('ip_address')
-            success = unblock_ip(ip)
-        elif action == 'block_port':
-            port = data.get('port')
-            protocol = data.get('protocol', 'tcp')
-            success = block_port(port, protocol)
-
-        await self.send(text_data=json.dumps({
-            'status': 'success' if success else 'error',
-            'action': action
-        }))
+        reply = await handle_network_action(data)
+        await self.send(text_data=json.dumps(reply))
 
         await self.send_network_status()
 
     @sync_to_async
     def get_network_usage_data(self):
-        NetworkUsage = apps.get_model('api', 'NetworkUsage')
-        return [
-            {
-                'recorded_at': network.recorded_at.isoformat(),
-                'received': network.received,
-                'sent': network.sent
-            }
-            for network in NetworkUsage.objects.order_by('-recorded_at')[:50]
-        ]
+        return recent_network_usage()
 
     async def send_network_status(self):
         network_data = {
@@ -139,70 +188,28 @@ class NetworkConsumer(AsyncWebsocketConsumer):
         await self.send(text_data=json.dumps(network_data))
 
 
-class CPUConsumer(AsyncWebsocketConsumer):
+class MetricStreamConsumer(AsyncWebsocketConsumer):
+    """Base consumer for metrics pushed by a shared MetricBroadcaster"""
+    broadcaster = None
+
     async def connect(self):
         await self.accept()
-        self.is_connected = True
-        asyncio.create_task(self.send_periodic_updates())
+        await self.broadcaster.subscribe(self.channel_layer, self.channel_name)
 
     async def disconnect(self, close_code):
-        self.is_connected = False
-
-    @sync_to_async
-    def get_cpu_data(self):
-        CPUUsage = apps.get_model('api', 'CPUUsage')
-        return [
-            {
-                'recorded_at': usage.recorded_at.isoformat(),
-                'usage': usage.usage
-            }
-            for usage in CPUUsage.objects.order_by('-recorded_at')[:50]
-        ]
-
-    async def send_periodic_updates(self):
-        while self.is_connected:
-            await self.send_cpu_data()
-            await asyncio.sleep(1)  # Update every second
-
-    async def send_cpu_data(self):
-        cpu_data = await self.get_cpu_data()
-        await self.send(text_data=json.dumps({
-            'type': 'cpu_usage',
-            'data': cpu_data
-        }))
+        await self.broadcaster.unsubscribe(self.channel_layer, self.channel_name)
 
+    async def metric_update(self, event):
+        # Le payload est déjà sérialisé une seule fois par le producteur
+        await self.send(text_data=event['text'])
 
-class MemoryConsumer(AsyncWebsocketConsumer):
-    async def connect(self):
-        await self.accept()
-        self.is_connected = True
-        asyncio.create_task(self.send_periodic_updates())
-
-    async def disconnect(self, close_code):
-        self.is_connected = False
 
-    @sync_to_async
-    def get_memory_data(self):
-        MemoryUsage = apps.get_model('api', 'MemoryUsage')
-        return [
-            {
-                'recorded_at': usage.recorded_at.isoformat(),
-                'usage': usage.usage
-            }
-            for usage in MemoryUsage.objects.order_by('-recorded_at')[:50]
-        ]
+class CPUConsumer(MetricStreamConsumer):
+    broadcaster = cpu_broadcaster
 
-    async def send_periodic_updates(self):
-        while self.is_connected:
-            await self.send_memory_data()
-            await asyncio.sleep(1)  # Update every second
 
-    async def send_memory_data(self):
-        memory_data = await self.get_memory_data()
-        await self.send(text_data=json.dumps({
-            'type': 'memory_usage',
-            'data': memory_data
-        }))
+class MemoryConsumer(MetricStreamConsumer):
+    broadcaster = memory_broadcaster
 
 
 class FileSystemConsumer(AsyncWebsocketConsumer):
@@ -340,13 +347,38 @@ class ShellConsumer(AsyncWebsocketConsumer):
             self.shell_process.terminate()
             self.shell_process = None
 class StorageConsumer(AsyncWebsocketConsumer):
+    """Capacity of the partitions every 30 seconds, plus an optional ``io`` subchannel.
+
+    ``{"action": "subscribe", "channel": "io"}`` adds the per-device I/O
+    rates (IOPS, throughput, latency, utilisation) of the shared
+    ``disk_io`` broadcaster as ``{"type": "disk_io", ...}`` messages.
+    """
+
     async def connect(self):
         await self.accept()
         self.is_connected = True
+        self.io_subscribed = False
         asyncio.create_task(self.send_periodic_updates())
 
     async def disconnect(self, close_code):
         self.is_connected = False
+        if self.io_subscribed:
+            await disk_io_broadcaster.unsubscribe(self.channel_layer, self.channel_name)
+
+    async def receive(self, text_data):
+        data = json.loads(text_data)
+        if data.get('channel') != 'io':
+            await self.send(text_data=json.dumps({'type': 'error', 'message': f"Unknown channel: {data.get('channel')}"}))
+        elif data.get('action') == 'subscribe' and not self.io_subscribed:
+            self.io_subscribed = True
+            await disk_io_broadcaster.subscribe(self.channel_layer, self.channel_name)
+        elif data.get('action') == 'unsubscribe' and self.io_subscribed:
+            self.io_subscribed = False
+            await disk_io_broadcaster.unsubscribe(self.channel_layer, self.channel_name)
+
+    async def metric_update(self, event):
+        if self.io_subscribed:
+            await self.send(text_data=event['text'])
 
     @sync_to_async
     def get_storage_data(self):
@@ -455,4 +487,173 @@ class SSHConsumer(AsyncWebsocketConsumer):
         if self.shell:
             self.shell.close()
         if self.ssh_client:
-            self.ssh_client.close()
\ No newline at end of file
+            self.ssh_client.close()
+
+class DashboardConsumer(AsyncWebsocketConsumer):
+    """Single multiplexed socket carrying every periodic dashboard stream.
+
+    Client messages::
+
+        {"action": "subscribe", "stream": "cpu", "interval": 2}
+        {"action": "unsubscribe", "stream": "cpu"}
+        {"stream": "services", "action": "restart", "service": "nginx"}
+
+    Server messages are ``{"stream": "<name>", "data": <payload>}`` where the
+    payload is what the dedicated ``/ws/<name>/`` socket would have sent.
+    The interactive shell and file browser keep their own sockets.
+    """
+
+    STREAM_INTERVALS = {
+        'processes': 1,
+        'services': 1,
+        'networks': 5,
+        'cpu': 1,
+        'memory': 1,
+        'storage': 30,
+        'disk_io': 2,
+        'temperature': 5,
+        'live': 1,
+        'process_events': 1,
+    }
+    BROADCAST_STREAMS = {
+        'cpu': cpu_broadcaster,
+        'memory': memory_broadcaster,
+        'live': live_stream,
+        'disk_io': disk_io_broadcaster,
+        'process_events': process_events_stream,
+    }
+    # Flux d'événements : chaque message est relayé, sans limitation de fréquence
+    EVENT_STREAMS = ('process_events',)
+    STREAM_ACTIONS = {
+        'processes': handle_process_action,
+        'services': handle_service_action,
+        'networks': handle_network_action,
+    }
+    MIN_INTERVAL = 0.5
+    MAX_INTERVAL = 3600
+
+    async def connect(self):
+        await self.accept()
+        self.subscriptions = {}
+        self.process_stream = ProcessStreamState()
+        self.outbox = asyncio.Queue()
+        self.wakeup = asyncio.Event()
+        # Une seule tâche d'écriture par connexion, quel que soit le nombre de flux
+        self.writer = asyncio.create_task(self.write_loop())
+
+    async def disconnect(self, close_code):
+        self.writer.cancel()
+        for stream in list(self.subscriptions):
+            await self.unsubscribe(stream)
+
+    async def receive(self, text_data):
+        data = json.loads(text_data)
+        action = data.get('action')
+        stream = data.get('stream')
+
+        if stream not in self.STREAM_INTERVALS:
+            self.enqueue({'type': 'error', 'message': f'Unknown stream: {stream}'})
+        elif action == 'subscribe':
+            await self.subscribe(stream, data)
+        elif action == 'unsubscribe':
+            await self.unsubscribe(stream)
+        elif stream == 'processes' and action == 'resync':
+            self.enqueue_stream(stream, await sync_to_async(self.process_stream.next_message)(True))
+        elif stream in self.STREAM_ACTIONS:
+            reply = await self.STREAM_ACTIONS[stream](data)
+            if reply is not None:
+                self.enqueue_stream(stream, reply)
+            if stream == 'networks' and stream in self.subscriptions:
+                self.subscriptions[stream]['due'] = 0
+                self.wakeup.set()
+
+    async def subscribe(self, stream, data):
+        try:
+            interval = float(data.get('interval') or self.STREAM_INTERVALS[stream])
+            if stream == 'processes':
+                self.process_stream.subscription = ProcessSubscription.from_message(data)
+        except (TypeError, ValueError) as e:
+            self.enqueue(subscription_error(e, stream=stream))
+            return
+
+        interval = min(max(interval, self.MIN_INTERVAL), self.MAX_INTERVAL)
+        already_subscribed = stream in self.subscriptions
+        self.subscriptions[stream] = {'interval': interval, 'due': 0}
+        if stream == 'processes':
+            # Nouveau filtre : repartir d'un instantané complet
+            self.process_stream.view = None
+        if stream in self.BROADCAST_STREAMS and not already_subscribed:
+            await self.BROADCAST_STREAMS[stream].subscribe(self.channel_layer, self.channel_name)
+        self.wakeup.set()
+
+    async def unsubscribe(self, stream):
+        if self.subscriptions.pop(stream, None) is None:
+            return
+        if stream in self.BROADCAST_STREAMS:
+            await self.BROADCAST_STREAMS[stream].unsubscribe(self.channel_layer, self.channel_name)
+
+    async def metric_update(self, event):
+        # Flux CPU/mémoire/live : relayer le payload du producteur partagé au rythme demandé
+        stream = event.get('metric')
+        subscription = self.subscriptions.get(stream)
+        now = asyncio.get_running_loop().time()
+        if subscription is None:
+            return
+        if stream not in self.EVENT_STREAMS:
+            if subscription['due'] > now:
+                return
+            subscription['due'] = now + subscription['interval']
+        self.outbox.put_nowait(f'{{"stream": {json.dumps(stream)}, "data": {event["text"]}}}')
+        self.wakeup.set()
+
+    def enqueue(self, message):
+        self.outbox.put_nowait(json.dumps(message))
+        self.wakeup.set()
+
+    def enqueue_stream(self, stream, data):
+        if data is not None:
+            self.enqueue({'stream': stream, 'data': data})
+
+    async def write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self.wakeup.clear()
+            now = loop.time()
+            for stream, subscription in list(self.subscriptions.items()):
+                if stream in self.BROADCAST_STREAMS or subscription['due'] > now:
+                    continue
+                subscription['due'] = now + subscription['interval']
+                try:
+                    data = await self.poll(stream)
+                except Exception as e:
+                    # Un flux en échec ne doit pas arrêter l'écrivain des autres flux
+                    logger.exception(f"Lecture du flux {stream} impossible")
+                    self.enqueue({'stream': stream, 'error': str(e)})
+                    continue
+                self.enqueue_stream(stream, data)
+
+            while not self.outbox.empty():
+                await self.send(text_data=self.outbox.get_nowait())
+
+            polled = [
+                subscription['due'] for stream, subscription in self.subscriptions.items()
+                if stream not in self.BROADCAST_STREAMS
+            ]
+            timeout = max(min(polled) - loop.time(), 0) if polled else None
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def poll(self, stream):
+        if stream == 'processes':
+            return await sync_to_async(self.process_stream.next_message)()
+        if stream == 'services':
+            return await sync_to_async(get_services)()
+        if stream == 'networks':
+            return {'usage': await sync_to_async(recent_network_usage)()}
+        if stream == 'storage':
+            return {'type': 'storage_info', 'data': await sync_to_async(get_storage_info)()}
+        if stream == 'temperature':
+            return {'type': 'temperature_info', 'data': await sync_to_async(get_system_temperatures)()}
+        return None
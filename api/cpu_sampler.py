@@ -0,0 +1,75 @@
+# api/cpu_sampler.py
+import psutil
+
+from .sampler_state import sampler_state
+
+# Modes détaillés conservés en base (iowait/steal n'existent que sous Linux)
+RECORDED_MODES = ('user', 'system', 'iowait', 'steal')
+# Temps d'attente comptés comme inactifs, comme le fait psutil.cpu_percent
+IDLE_MODES = ('idle', 'iowait')
+# Sous Linux, guest/guest_nice sont déjà inclus dans user/nice
+GUEST_MODES = ('guest', 'guest_nice')
+
+
+def _percent(part, total):
+    return round(100.0 * part / total, 1) if total > 0 else 0.0
+
+
+def busy_percent(delta) -> float:
+    """Utilisation (%) over a cpu_times delta"""
+    total = sum(value for mode, value in delta.items() if mode not in GUEST_MODES)
+    idle = sum(delta.get(mode, 0.0) for mode in IDLE_MODES)
+    return _percent(total - idle, total)
+
+
+def mode_percents(delta) -> dict:
+    """Share (%) of each cpu_times mode over a delta"""
+    total = sum(value for mode, value in delta.items() if mode not in GUEST_MODES)
+    return {
+        mode: _percent(value, total)
+        for mode, value in delta.items() if mode not in GUEST_MODES
+    }
+
+
+class CPUSampler:
+    """Non-blocking CPU utilisation computed from cpu_times deltas between calls.
+
+    The previous per-core ``cpu_times`` are swapped atomically in
+    ``sampler_state``, shared by the worker processes of the host, so
+    whichever Celery child runs the next tick continues from the last
+    sample. Without a usable previous sample (first call, expired entry,
+    core hotplug, counters reset by a reboot) ``sample`` returns None
+    rather than an average since boot.
+    """
+
+    def __init__(self, cache_key='cpu_sampler:times', timeout=600, state=sampler_state):
+        self.cache_key = cache_key
+        self.timeout = timeout
+        self.state = state
+
+    def reset(self):
+        self.state.delete(self.cache_key)
+
+    def sample(self):
+        current = [times._asdict() for times in psutil.cpu_times(percpu=True)]
+        previous = self.state.swap(self.cache_key, current, self.timeout)
+        if previous is None or len(previous) != len(current):
+            return None
+
+        deltas = [
+            {mode: after[mode] - before.get(mode, 0.0) for mode in after}
+            for before, after in zip(previous, current)
+        ]
+        # Compteurs remis à zéro (redémarrage, cœur remis en ligne) : intervalle inutilisable
+        if any(value < 0 for delta in deltas for value in delta.values()):
+            return None
+
+        overall = {mode: sum(delta[mode] for delta in deltas) for mode in current[0]}
+        return {
+            'usage': busy_percent(overall),
+            'per_core': [busy_percent(delta) for delta in deltas],
+            'modes': mode_percents(overall),
+        }
+
+
+cpu_sampler = CPUSampler()
@@ -2,6 +2,7 @@
 from functools import wraps
 from django.core.exceptions import PermissionDenied
 from .models import AuditLog, UserProfile
+from .utils import get_client_ip
 
 def require_permission(permission):
     def decorator(view_func):
@@ -16,7 +17,8 @@ def require_permission(permission):
                     AuditLog.objects.create(
                         user=request.user,
                         action='permission_denied',
-                        details=f'No role assigned'
+                        details=f'No role assigned',
+                        ip_address=get_client_ip(request),
                     )
                     raise PermissionDenied
                     
@@ -24,14 +26,16 @@ def require_permission(permission):
                     AuditLog.objects.create(
                         user=request.user,
                         action='permission_denied',
-                        details=f'Access denied to {permission}'
+                        details=f'Access denied to {permission}',
+                        ip_address=get_client_ip(request),
                     )
                     raise PermissionDenied
                 
                 AuditLog.objects.create(
                     user=request.user,
                     action='permission_granted',
-                    details=f'Access granted to {permission}'
+                    details=f'Access granted to {permission}',
+                    ip_address=get_client_ip(request),
                 )
                     
                 return view_func(request, *args, **kwargs)
@@ -0,0 +1,97 @@
+# api/disk_sampler.py
+import psutil
+from django.core.cache import cache
+from django.utils import timezone
+
+from .sampler_state import sampler_state
+
+# Compteurs psutil relus à chaque relevé (busy_time n'existe que sous Linux/FreeBSD)
+COUNTERS = ('read_count', 'write_count', 'read_bytes', 'write_bytes', 'read_time', 'write_time', 'busy_time')
+FIELDS = (
+    'read_iops', 'write_iops', 'read_bytes_rate', 'write_bytes_rate',
+    'read_latency', 'write_latency', 'utilization',
+)
+
+
+def read_disk_counters() -> dict:
+    """Per-device disk_io_counters, empty when the platform exposes none"""
+    try:
+        return psutil.disk_io_counters(perdisk=True) or {}
+    except (RuntimeError, OSError):
+        # Conteneurs sans /proc/diskstats
+        return {}
+
+
+def io_rates(before, after, elapsed) -> dict:
+    """IOPS, throughput (bytes/s), average latency (ms) and utilisation (%) over a delta"""
+    delta = {name: after[name] - before[name] for name in COUNTERS if after.get(name) is not None}
+    reads, writes = delta['read_count'], delta['write_count']
+    busy = delta.get('busy_time')
+    return {
+        'read_iops': round(reads / elapsed, 1),
+        'write_iops': round(writes / elapsed, 1),
+        'read_bytes_rate': round(delta['read_bytes'] / elapsed, 1),
+        'write_bytes_rate': round(delta['write_bytes'] / elapsed, 1),
+        'read_latency': round(delta['read_time'] / reads, 2) if reads else 0.0,
+        'write_latency': round(delta['write_time'] / writes, 2) if writes else 0.0,
+        # busy_time en ms : part du temps où le périphérique avait une requête en cours
+        'utilization': min(round(100.0 * busy / (elapsed * 1000), 1), 100.0) if busy is not None else None,
+    }
+
+
+class DiskIOSampler:
+    """Per-device I/O rates computed from disk_io_counters deltas between calls.
+
+    Like ``NetworkSampler``, the previous counters are swapped atomically in
+    ``sampler_state``; with ``state=None`` they stay in the cache of the
+    current process. Devices seen for the first time, or whose counters went
+    backwards (reboot, device re-attached), are left out of the result.
+    """
+
+    def __init__(self, cache_key='disk_sampler:counters', timeout=600, state=sampler_state):
+        self.cache_key = cache_key
+        self.timeout = timeout
+        self.state = state
+
+    def reset(self):
+        if self.state is not None:
+            self.state.delete(self.cache_key)
+        cache.delete(self.cache_key)
+
+    def _swap(self, reading):
+        if self.state is not None:
+            return self.state.swap(self.cache_key, reading, self.timeout)
+        previous = cache.get(self.cache_key)
+        cache.set(self.cache_key, reading, self.timeout)
+        return previous
+
+    def sample(self, counters=None, now=None) -> dict:
+        """{device: {field: value}} for the devices with a previous reading"""
+        counters = read_disk_counters() if counters is None else counters
+        now = (now or timezone.now()).timestamp()
+        current = {
+            device: {name: getattr(stats, name, None) for name in COUNTERS}
+            for device, stats in counters.items()
+        }
+        previous = self._swap({'at': now, 'counters': current}) or {}
+        if not previous or now <= previous['at']:
+            return {}
+
+        elapsed = now - previous['at']
+        rates = {}
+        for device, after in current.items():
+            before = previous['counters'].get(device)
+            if before is None:
+                continue
+            if any(
+                after[name] is not None and (before[name] is None or after[name] < before[name])
+                for name in COUNTERS
+            ):
+                continue
+            rates[device] = io_rates(before, after, elapsed)
+        return rates
+
+
+disk_io_sampler = DiskIOSampler()
+# Instance séparée pour le flux WebSocket : ses relevés rapprochés ne raccourcissent pas l'intervalle enregistré en base
+live_disk_io_sampler = DiskIOSampler(cache_key='hyperion:disk_sampler:live', state=None)
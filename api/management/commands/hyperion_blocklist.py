@@ -0,0 +1,30 @@
+# api/management/commands/hyperion_blocklist.py
+from django.core.management.base import BaseCommand, CommandError
+
+from api.blocklist import ip_blocklist
+
+
+class Command(BaseCommand):
+    help = 'Manage the ipset blocklist of blocked IP addresses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action', choices=['migrate', 'list'],
+            help='migrate: move per-address iptables DROP rules into the ipset sets, '
+                 'list: show blocked addresses'
+        )
+
+    def handle(self, *args, **options):
+        if options['action'] == 'list':
+            for address in ip_blocklist.members():
+                self.stdout.write(address)
+            return
+
+        legacy = ip_blocklist.legacy_rules()
+        if not legacy:
+            self.stdout.write('No per-address rule to migrate')
+            return
+        migrated = ip_blocklist.migrate_legacy_rules()
+        if not migrated:
+            raise CommandError(f'Could not add {len(legacy)} addresses to the blocklist, rules left in place')
+        self.stdout.write(f'{len(migrated)} addresses moved to {ip_blocklist.name}')
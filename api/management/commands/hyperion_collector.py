@@ -0,0 +1,60 @@
+# api/management/commands/hyperion_collector.py
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.collector import MetricCollector
+
+
+class Command(BaseCommand):
+    help = 'Sample system metrics at a sub-second rate and flush aggregated batches to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            default=getattr(settings, 'COLLECTOR_SAMPLE_INTERVAL', 0.5),
+            help='Seconds between two samples'
+        )
+        parser.add_argument(
+            '--flush-interval', type=float,
+            default=getattr(settings, 'COLLECTOR_FLUSH_INTERVAL', 10.0),
+            help='Seconds between two database writes'
+        )
+        parser.add_argument(
+            '--buffer-size', type=int,
+            default=getattr(settings, 'COLLECTOR_BUFFER_SIZE', 3600),
+            help='Samples kept in memory per metric'
+        )
+        parser.add_argument(
+            '--samples', type=int, default=None,
+            help='Stop after this many samples (runs until interrupted by default)'
+        )
+
+    def handle(self, *args, **options):
+        if options['interval'] <= 0 or options['flush_interval'] <= 0 or options['buffer_size'] < 1:
+            raise CommandError('Intervals and buffer size must be positive')
+
+        collector = MetricCollector(
+            interval=options['interval'],
+            flush_interval=options['flush_interval'],
+            capacity=options['buffer_size'],
+        )
+        stop = threading.Event()
+        # Arrêt propre : le dernier lot est écrit avant de quitter
+        previous = {
+            signum: signal.signal(signum, lambda *_: stop.set())
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+
+        self.stdout.write(
+            f"Collecting every {options['interval']}s, "
+            f"flushing every {options['flush_interval']}s"
+        )
+        try:
+            collector.run(stop, samples=options['samples'])
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        self.stdout.write(f'Collector stopped after {collector.cpu.total} samples, {collector.flushes} flushes')
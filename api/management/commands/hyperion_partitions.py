@@ -0,0 +1,64 @@
+# api/management/commands/hyperion_partitions.py
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from api import partitions
+
+
+class Command(BaseCommand):
+    help = 'Manage monthly range partitions of the metric tables (PostgreSQL only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action', choices=['enable', 'create', 'drop', 'status'],
+            help='enable: convert the tables, create: add upcoming months, '
+                 'drop: remove expired months, status: list partitions'
+        )
+        parser.add_argument(
+            '--models', nargs='+', choices=partitions.METRIC_MODELS, default=partitions.METRIC_MODELS,
+            help='Metric models to manage (all by default)'
+        )
+        parser.add_argument(
+            '--months-ahead', type=int, default=partitions.MONTHS_AHEAD,
+            help='Months created in advance after the current one'
+        )
+        parser.add_argument(
+            '--older-than', type=int, default=None,
+            help='Drop partitions older than this many days (RETENTION_DAYS by default)'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning requires PostgreSQL')
+
+        now = timezone.now()
+        retention = getattr(settings, 'RETENTION_DAYS', {})
+        for name in options['models']:
+            model = apps.get_model('api', name)
+            if options['action'] == 'enable':
+                created = partitions.enable_partitioning(model, now, options['months_ahead'])
+                self.stdout.write(f'{name}: {len(created)} partitions' if created else f'{name}: already partitioned')
+                continue
+
+            if not partitions.is_partitioned(model):
+                self.stdout.write(f'{name}: not partitioned, run "enable" first')
+                continue
+
+            if options['action'] == 'create':
+                last = partitions.ensure_partitions(model, now, options['months_ahead'])
+                self.stdout.write(f'{name}: partitions ready until {last:%Y-%m}')
+            elif options['action'] == 'drop':
+                days = options['older_than'] or retention.get(f'api.{name}')
+                if days is None:
+                    self.stdout.write(f'{name}: no retention configured, skipped')
+                    continue
+                dropped = partitions.drop_partitions(model, now - timedelta(days=days))
+                self.stdout.write(f'{name}: dropped {", ".join(dropped) or "nothing"}')
+            else:
+                for partition, lower, upper in partitions.list_partitions(model):
+                    self.stdout.write(f'{name}: {partition} [{lower:%Y-%m-%d}, {upper:%Y-%m-%d})')
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_bugreport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cpuusage',
+            name='iowait',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cpuusage',
+            name='per_core',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='cpuusage',
+            name='steal',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cpuusage',
+            name='system',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cpuusage',
+            name='user',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_batched_collection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50)),
+                ('series', models.CharField(blank=True, default='', max_length=255)),
+                ('resolution', models.CharField(choices=[('1m', '1 minute'), ('1h', '1 heure'), ('1d', '1 jour')], max_length=2)),
+                ('bucket', models.DateTimeField()),
+                ('count', models.PositiveIntegerField()),
+                ('min', models.FloatField()),
+                ('max', models.FloatField()),
+                ('avg', models.FloatField()),
+                ('p95', models.FloatField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='metricrollup',
+            index=models.Index(fields=['metric', 'resolution', 'bucket'], name='api_metricr_metric_16875e_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='metricrollup',
+            unique_together={('metric', 'resolution', 'series', 'bucket')},
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:46
+
+from django.db import migrations, models
+
+# Tables de métriques existant à cette migration (les suivantes ajoutent leurs index).
+# SQL figé ici : une migration ne dépend pas du code applicatif, qui peut évoluer
+TABLES = ('api_cpuusage', 'api_memoryusage', 'api_networkusage', 'api_storageusage')
+
+
+def add_brin_indexes(apps, schema_editor):
+    # BRIN uniquement sous PostgreSQL ; sans effet sur les autres moteurs
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS "{table}_recorded_brin" ON "{table}" USING brin ("recorded_at")')
+
+
+def remove_brin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{table}_recorded_brin"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_metricrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cpuusage',
+            index=models.Index(fields=['recorded_at'], name='api_cpuusage_recorded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='memoryusage',
+            index=models.Index(fields=['recorded_at'], name='api_memusage_recorded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='networkusage',
+            index=models.Index(fields=['interface', 'recorded_at'], name='api_netusage_iface_rec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='networkusage',
+            index=models.Index(fields=['recorded_at'], name='api_netusage_recorded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='storageusage',
+            index=models.Index(fields=['mount_point', 'recorded_at'], name='api_stousage_mount_rec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='storageusage',
+            index=models.Index(fields=['recorded_at'], name='api_stousage_recorded_idx'),
+        ),
+        migrations.RunPython(add_brin_indexes, remove_brin_indexes),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_metric_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50)),
+                ('series', models.CharField(blank=True, default='', max_length=255)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('count', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='metricchunk',
+            index=models.Index(fields=['metric', 'start'], name='api_metricc_metric_afb89a_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='metricchunk',
+            unique_together={('metric', 'series', 'start')},
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_metricchunk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='networkusage',
+            name='drops_in',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='networkusage',
+            name='drops_out',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='networkusage',
+            name='errors_in',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='networkusage',
+            name='errors_out',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='networkusage',
+            name='packets_received_rate',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='networkusage',
+            name='packets_sent_rate',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='networkusage',
+            name='received_rate',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='networkusage',
+            name='sent_rate',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
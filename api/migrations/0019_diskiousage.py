@@ -0,0 +1,51 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:56
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def add_brin_index(apps, schema_editor):
+    # SQL figé ici plutôt qu'importé de api.partitions : la migration ne change pas avec le code
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS "api_diskiousage_recorded_brin" ON "api_diskiousage" USING brin ("recorded_at")'
+        )
+
+
+def remove_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS "api_diskiousage_recorded_brin"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_networkusage_rates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiskIOUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('device', models.CharField(max_length=100)),
+                ('read_iops', models.FloatField()),
+                ('write_iops', models.FloatField()),
+                ('read_bytes_rate', models.FloatField()),
+                ('write_bytes_rate', models.FloatField()),
+                ('read_latency', models.FloatField()),
+                ('write_latency', models.FloatField()),
+                ('utilization', models.FloatField(blank=True, null=True)),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='diskiousage',
+            index=models.Index(fields=['device', 'recorded_at'], name='api_diskio_device_rec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='diskiousage',
+            index=models.Index(fields=['recorded_at'], name='api_diskio_recorded_idx'),
+        ),
+        migrations.RunPython(add_brin_index, remove_brin_index),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:58
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_diskiousage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('interval', models.FloatField()),
+                ('pids', models.BinaryField()),
+                ('names', models.JSONField(default=list)),
+                ('cpu', models.BinaryField()),
+                ('rss', models.BinaryField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='processsample',
+            index=models.Index(fields=['recorded_at'], name='api_procsample_recorded_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_processsample'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('started', 'Démarré'), ('exited', 'Terminé'), ('restarted', 'Redémarré')], max_length=10)),
+                ('pid', models.IntegerField()),
+                ('name', models.CharField(max_length=255)),
+                ('create_time', models.FloatField()),
+                ('previous_pid', models.IntegerField(blank=True, null=True)),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='processevent',
+            index=models.Index(fields=['recorded_at'], name='api_procevent_recorded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processevent',
+            index=models.Index(fields=['name', 'recorded_at'], name='api_procevent_name_rec_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 # api/models.py
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -23,17 +24,51 @@ class Network(models.Model):
 
 class CPUUsage(models.Model):
     usage = models.FloatField()
-    recorded_at = models.DateTimeField(auto_now_add=True)
+    # Répartition par mode (%) et utilisation de chaque cœur
+    user = models.FloatField(null=True, blank=True)
+    system = models.FloatField(null=True, blank=True)
+    iowait = models.FloatField(null=True, blank=True)
+    steal = models.FloatField(null=True, blank=True)
+    per_core = models.JSONField(default=list, blank=True)
+    # Pas d'auto_now_add : la collecte groupée fixe le même instant pour toutes les lignes d'un tick
+    recorded_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recorded_at'], name='api_cpuusage_recorded_idx'),
+        ]
 
 class MemoryUsage(models.Model):
     usage = models.FloatField()
-    recorded_at = models.DateTimeField(auto_now_add=True)
+    swap = models.FloatField(null=True, blank=True)
+    recorded_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recorded_at'], name='api_memusage_recorded_idx'),
+        ]
 
 class NetworkUsage(models.Model):
     interface = models.CharField(max_length=100)
+    # Compteurs cumulés bruts (octets)
     received = models.BigIntegerField()
     sent = models.BigIntegerField()
-    recorded_at = models.DateTimeField(auto_now_add=True)
+    # Débits et compteurs d'erreurs depuis la mesure précédente (vides au premier relevé ou après remise à zéro)
+    received_rate = models.FloatField(null=True, blank=True)
+    sent_rate = models.FloatField(null=True, blank=True)
+    packets_received_rate = models.FloatField(null=True, blank=True)
+    packets_sent_rate = models.FloatField(null=True, blank=True)
+    errors_in = models.BigIntegerField(null=True, blank=True)
+    errors_out = models.BigIntegerField(null=True, blank=True)
+    drops_in = models.BigIntegerField(null=True, blank=True)
+    drops_out = models.BigIntegerField(null=True, blank=True)
+    recorded_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['interface', 'recorded_at'], name='api_netusage_iface_rec_idx'),
+            models.Index(fields=['recorded_at'], name='api_netusage_recorded_idx'),
+        ]
     
 class FileSystem(models.Model):
     path = models.CharField(max_length=255)
@@ -129,8 +164,106 @@ class StorageUsage(models.Model):
     free = models.BigIntegerField()  # Free space in bytes
     percent_used = models.FloatField()  # Percentage used
     fs_type = models.CharField(max_length=50)  # ext4, ntfs, etc.
-    recorded_at = models.DateTimeField(auto_now_add=True)
-    
+    recorded_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['mount_point', 'recorded_at'], name='api_stousage_mount_rec_idx'),
+            models.Index(fields=['recorded_at'], name='api_stousage_recorded_idx'),
+        ]
+
+class DiskIOUsage(models.Model):
+    """Activité d'un disque depuis le relevé précédent (api.disk_sampler)"""
+    device = models.CharField(max_length=100)  # sda, nvme0n1, etc.
+    read_iops = models.FloatField()
+    write_iops = models.FloatField()
+    read_bytes_rate = models.FloatField()  # octets/s
+    write_bytes_rate = models.FloatField()
+    read_latency = models.FloatField()  # ms par lecture
+    write_latency = models.FloatField()  # ms par écriture
+    utilization = models.FloatField(null=True, blank=True)  # % du temps occupé (Linux/FreeBSD)
+    recorded_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['device', 'recorded_at'], name='api_diskio_device_rec_idx'),
+            models.Index(fields=['recorded_at'], name='api_diskio_recorded_idx'),
+        ]
+
+class ProcessSample(models.Model):
+    """Top-N des processus (CPU et RSS) sur un intervalle, en colonnes compactes (api.process_history)"""
+    recorded_at = models.DateTimeField(default=timezone.now, editable=False)
+    interval = models.FloatField()  # secondes couvertes par l'échantillon
+    pids = models.BinaryField()  # int32 little-endian
+    names = models.JSONField(default=list)
+    cpu = models.BinaryField()  # float32, % d'un cœur sur l'intervalle
+    rss = models.BinaryField()  # int64, octets
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recorded_at'], name='api_procsample_recorded_idx'),
+        ]
+
+class ProcessEvent(models.Model):
+    """Démarrage, arrêt ou redémarrage d'un processus (api.process_events)"""
+    KIND_CHOICES = (
+        ('started', 'Démarré'),
+        ('exited', 'Terminé'),
+        ('restarted', 'Redémarré'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    pid = models.IntegerField()
+    name = models.CharField(max_length=255)
+    create_time = models.FloatField()
+    previous_pid = models.IntegerField(null=True, blank=True)  # pid remplacé (restarted)
+    recorded_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recorded_at'], name='api_procevent_recorded_idx'),
+            models.Index(fields=['name', 'recorded_at'], name='api_procevent_name_rec_idx'),
+        ]
+
+class MetricRollup(models.Model):
+    """Agrégats d'une métrique par intervalle (1m/1h/1d), calculés par le compactage"""
+    RESOLUTION_CHOICES = (
+        ('1m', '1 minute'),
+        ('1h', '1 heure'),
+        ('1d', '1 jour'),
+    )
+
+    metric = models.CharField(max_length=50)  # cpu, memory, network.received, ...
+    series = models.CharField(max_length=255, blank=True, default='')  # interface, point de montage
+    resolution = models.CharField(max_length=2, choices=RESOLUTION_CHOICES)
+    bucket = models.DateTimeField()  # début de l'intervalle (UTC)
+    count = models.PositiveIntegerField()
+    min = models.FloatField()
+    max = models.FloatField()
+    avg = models.FloatField()
+    p95 = models.FloatField()
+
+    class Meta:
+        unique_together = ('metric', 'resolution', 'series', 'bucket')
+        indexes = [
+            models.Index(fields=['metric', 'resolution', 'bucket']),
+        ]
+
+class MetricChunk(models.Model):
+    """Fenêtre d'échantillons bruts d'une série, compressée (encodage Gorilla)"""
+    metric = models.CharField(max_length=50)
+    series = models.CharField(max_length=255, blank=True, default='')
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    count = models.PositiveIntegerField()
+    data = models.BinaryField()  # voir api.chunks.encode_points
+
+    class Meta:
+        unique_together = ('metric', 'series', 'start')
+        indexes = [
+            models.Index(fields=['metric', 'start']),
+        ]
+
 class SimulationEnvironment(models.Model):
     name = models.CharField(max_length=100)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -0,0 +1,92 @@
+# api/net_sampler.py
+import psutil
+from django.utils import timezone
+
+from .sampler_state import sampler_state
+
+# Compteurs psutil -> champ NetworkUsage, convertis en débit par seconde
+RATE_COUNTERS = {
+    'bytes_recv': 'received_rate',
+    'bytes_sent': 'sent_rate',
+    'packets_recv': 'packets_received_rate',
+    'packets_sent': 'packets_sent_rate',
+}
+# Compteurs psutil -> champ NetworkUsage, stockés en nombre par intervalle
+COUNT_COUNTERS = {
+    'errin': 'errors_in',
+    'errout': 'errors_out',
+    'dropin': 'drops_in',
+    'dropout': 'drops_out',
+}
+COUNTERS = tuple(RATE_COUNTERS) + tuple(COUNT_COUNTERS)
+RATE_FIELDS = tuple(RATE_COUNTERS.values()) + tuple(COUNT_COUNTERS.values())
+
+WRAP_32 = 1 << 32
+
+
+def counter_delta(before, after):
+    """Increase of a cumulative counter, None when it was reset.
+
+    A counter that went backwards from a value below 2**32 and whose wrapped
+    increase is plausible (under 2**31) is treated as a 32-bit wrap; any
+    other decrease (reboot, driver reload, interface recreated) is a reset.
+    """
+    if after >= before:
+        return after - before
+    if before < WRAP_32:
+        wrapped = WRAP_32 - before + after
+        if wrapped < WRAP_32 // 2:
+            return wrapped
+    return None
+
+
+class NetworkSampler:
+    """Per-interface rates computed from net_io_counters deltas between calls.
+
+    The previous counters and their timestamp are swapped atomically in
+    ``sampler_state``, like ``CPUSampler``, so successive readings cover
+    contiguous intervals whichever worker takes them. An interface without
+    a previous reading, or whose counters were reset, gets ``None`` for
+    every field instead of a bogus spike.
+    """
+
+    def __init__(self, cache_key='net_sampler:counters', timeout=600, state=sampler_state):
+        self.cache_key = cache_key
+        self.timeout = timeout
+        self.state = state
+
+    def reset(self):
+        self.state.delete(self.cache_key)
+
+    def sample(self, counters=None, now=None) -> dict:
+        """{interface: {field: value or None}} for the current counters"""
+        counters = psutil.net_io_counters(pernic=True) if counters is None else counters
+        now = (now or timezone.now()).timestamp()
+        current = {
+            interface: {name: getattr(stats, name, 0) for name in COUNTERS}
+            for interface, stats in counters.items()
+        }
+        previous = self.state.swap(self.cache_key, {'at': now, 'counters': current}, self.timeout) or {}
+
+        elapsed = now - previous['at'] if previous else None
+        before_all = previous.get('counters', {})
+
+        rates = {}
+        for interface, after in current.items():
+            before = before_all.get(interface)
+            fields = dict.fromkeys(RATE_FIELDS)
+            if before is not None and elapsed and elapsed > 0:
+                deltas = {name: counter_delta(before[name], after[name]) for name in COUNTERS}
+                # Un seul compteur remis à zéro suffit à invalider l'intervalle
+                if all(delta is not None for delta in deltas.values()):
+                    for name, field in RATE_COUNTERS.items():
+                        fields[field] = round(deltas[name] / elapsed, 1)
+                    for name, field in COUNT_COUNTERS.items():
+                        fields[field] = deltas[name]
+            rates[interface] = fields
+        return rates
+
+
+net_sampler = NetworkSampler()
+# Démon hyperion_collector : ses écritures ne raccourcissent pas les intervalles des workers Celery
+collector_net_sampler = NetworkSampler(cache_key='net_sampler:collector')
@@ -0,0 +1,228 @@
+# api/partitions.py
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.db import NotSupportedError, connection, transaction
+
+# Tables de métriques horodatées : BRIN et partitionnement mensuel possibles
+METRIC_MODELS = ('CPUUsage', 'MemoryUsage', 'NetworkUsage', 'StorageUsage', 'DiskIOUsage')
+# Mois créés à l'avance après le mois courant par la maintenance planifiée
+MONTHS_AHEAD = getattr(settings, 'PARTITION_MONTHS_AHEAD', 3)
+
+
+def metric_models():
+    return [apps.get_model('api', name) for name in METRIC_MODELS]
+
+
+def brin_index_name(model):
+    return f'{model._meta.db_table}_recorded_brin'
+
+
+def create_brin_indexes(schema_editor, models=None):
+    """BRIN index on recorded_at: tiny, and efficient for append-only time ranges"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.quote_name
+    for model in models or metric_models():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {quote(brin_index_name(model))} '
+            f'ON {quote(model._meta.db_table)} USING brin ({quote("recorded_at")})'
+        )
+
+
+def month_start(moment) -> datetime:
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def next_month(moment) -> datetime:
+    if moment.month == 12:
+        return datetime(moment.year + 1, 1, 1, tzinfo=dt_timezone.utc)
+    return datetime(moment.year, moment.month + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def month_ranges(first, last) -> list:
+    """(lower, upper) bounds of every month from ``first`` to ``last`` included"""
+    ranges = []
+    lower = month_start(first)
+    while lower <= last:
+        upper = next_month(lower)
+        ranges.append((lower, upper))
+        lower = upper
+    return ranges
+
+
+def partition_name(table, lower) -> str:
+    return f'{table}_p{lower:%Y%m}'
+
+
+def default_partition_name(table) -> str:
+    return f'{table}_default'
+
+
+def _require_postgres():
+    if connection.vendor != 'postgresql':
+        raise NotSupportedError('Partitioning requires PostgreSQL')
+
+
+def is_partitioned(model) -> bool:
+    _require_postgres()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relkind = 'p' FROM pg_class c WHERE c.oid = to_regclass(%s)",
+            [model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def list_partitions(model) -> list:
+    """(name, lower, upper) of the monthly partitions of a partitioned table"""
+    _require_postgres()
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE parent.relname = %s ORDER BY child.relname',
+            [table]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        suffix = name[len(table) + 2:]
+        if not (name.startswith(f'{table}_p') and suffix.isdigit() and len(suffix) == 6):
+            continue
+        lower = datetime(int(suffix[:4]), int(suffix[4:]), 1, tzinfo=dt_timezone.utc)
+        partitions.append((name, lower, next_month(lower)))
+    return partitions
+
+
+def _table_exists(cursor, name) -> bool:
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [name])
+    return cursor.fetchone()[0]
+
+
+def create_default_partition(model):
+    """DEFAULT partition: rows outside every monthly partition are kept instead of rejected"""
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {quote(default_partition_name(table))} PARTITION OF {quote(table)} DEFAULT'
+        )
+
+
+def create_partitions(model, first, last) -> list:
+    """Create the missing monthly partitions covering [first, last].
+
+    Rows of a new month already stored in the DEFAULT partition are moved
+    into it: the DEFAULT partition is detached meanwhile, so PostgreSQL does
+    not reject the new bounds.
+    """
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    default = default_partition_name(table)
+    recorded_at = quote('recorded_at')
+    created = []
+    with connection.cursor() as cursor:
+        has_default = _table_exists(cursor, default)
+        for lower, upper in month_ranges(first, last):
+            name = partition_name(table, lower)
+            if _table_exists(cursor, name):
+                continue
+            with transaction.atomic():
+                if has_default:
+                    cursor.execute(f'ALTER TABLE {quote(table)} DETACH PARTITION {quote(default)}')
+                cursor.execute(
+                    f'CREATE TABLE {quote(name)} PARTITION OF {quote(table)} FOR VALUES FROM (%s) TO (%s)',
+                    [lower, upper]
+                )
+                if has_default:
+                    bounds = f'WHERE {recorded_at} >= %s AND {recorded_at} < %s'
+                    cursor.execute(f'INSERT INTO {quote(name)} SELECT * FROM {quote(default)} {bounds}', [lower, upper])
+                    cursor.execute(f'DELETE FROM {quote(default)} {bounds}', [lower, upper])
+                    cursor.execute(f'ALTER TABLE {quote(table)} ATTACH PARTITION {quote(default)} DEFAULT')
+            created.append(name)
+    return created
+
+
+def ensure_partitions(model, now, months_ahead=MONTHS_AHEAD) -> datetime:
+    """Partitions from the current month to ``months_ahead`` months later, plus DEFAULT"""
+    last = now
+    for _ in range(months_ahead):
+        last = next_month(last)
+    create_default_partition(model)
+    create_partitions(model, now, last)
+    return last
+
+
+def maintain_partitions(now, months_ahead=MONTHS_AHEAD, retention=None) -> dict:
+    """Create upcoming months and drop expired ones for every partitioned metric table"""
+    if connection.vendor != 'postgresql':
+        return {}
+    retention = getattr(settings, 'RETENTION_DAYS', {}) if retention is None else retention
+    report = {}
+    for model in metric_models():
+        if not is_partitioned(model):
+            continue
+        name = model.__name__
+        ensure_partitions(model, now, months_ahead)
+        days = retention.get(f'api.{name}')
+        dropped = drop_partitions(model, now - timedelta(days=days)) if days is not None else []
+        report[name] = {'partitions': len(list_partitions(model)), 'dropped': dropped}
+    return report
+
+
+def enable_partitioning(model, now, months_ahead=MONTHS_AHEAD):
+    """Convert a metric table into a table partitioned by month on recorded_at.
+
+    The existing rows are copied into the new partitions in one transaction.
+    PostgreSQL requires the partition key in the primary key, which becomes
+    (id, recorded_at); ids still come from the original sequence.
+    """
+    _require_postgres()
+    if is_partitioned(model):
+        return []
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    legacy = f'{table}_unpartitioned'
+    with transaction.atomic(), connection.schema_editor(atomic=False) as editor:
+        editor.execute(f'ALTER TABLE {quote(table)} RENAME TO {quote(legacy)}')
+        editor.execute(
+            f'CREATE TABLE {quote(table)} (LIKE {quote(legacy)} INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE ({quote("recorded_at")})'
+        )
+        editor.execute(f'ALTER SEQUENCE {quote(f"{table}_id_seq")} OWNED BY {quote(table)}.{quote("id")}')
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT MIN({quote("recorded_at")}) FROM {quote(legacy)}')
+            first = cursor.fetchone()[0] or now
+        last = now
+        for _ in range(months_ahead):
+            last = next_month(last)
+        created = create_partitions(model, first, last)
+        # Filet de sécurité si la maintenance planifiée ne passe pas : aucune écriture refusée
+        create_default_partition(model)
+
+        editor.execute(f'INSERT INTO {quote(table)} SELECT * FROM {quote(legacy)}')
+        editor.execute(f'DROP TABLE {quote(legacy)}')
+        # Contraintes et index recréés une fois les noms libérés par l'ancienne table
+        editor.execute(f'ALTER TABLE {quote(table)} ADD PRIMARY KEY ({quote("id")}, {quote("recorded_at")})')
+        for index in model._meta.indexes:
+            editor.add_index(model, index)
+        create_brin_indexes(editor, [model])
+    return created
+
+
+def drop_partitions(model, before) -> list:
+    """Drop the partitions holding only rows recorded before ``before``"""
+    quote = connection.ops.quote_name
+    dropped = []
+    for name, lower, upper in list_partitions(model):
+        if upper <= before:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE {quote(name)}')
+            dropped.append(name)
+    return dropped
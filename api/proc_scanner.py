@@ -0,0 +1,153 @@
+# api/proc_scanner.py
+import os
+import pwd
+import sys
+import time
+from array import array
+from collections import namedtuple
+
+# Lettres d'état de /proc/<pid>/stat -> valeurs de psutil.Process.status()
+STATUSES = {
+    'R': 'running',
+    'S': 'sleeping',
+    'D': 'disk-sleep',
+    'Z': 'zombie',
+    'T': 'stopped',
+    't': 'tracing-stop',
+    'X': 'dead',
+    'x': 'dead',
+    'K': 'wake-kill',
+    'W': 'waking',
+    'I': 'idle',
+    'P': 'parked',
+}
+
+Columns = namedtuple('Columns', ['pids', 'names', 'states', 'uids', 'start_ticks', 'cpu_ticks', 'rss_pages'])
+
+
+def _read(path) -> bytes:
+    # os.read sans objet fichier : une seule allocation par lecture
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return os.read(fd, 4096)
+    finally:
+        os.close(fd)
+
+
+def available(root='/proc') -> bool:
+    return sys.platform.startswith('linux') and os.path.exists(os.path.join(root, 'self', 'stat'))
+
+
+class ProcScanner:
+    """Process table read from ``/proc/<pid>/stat`` and ``statm`` only.
+
+    psutil opens several files per process (status, cmdline, ...); this
+    scanner opens two and one ``stat()`` for the owner, parses them into
+    typed arrays, then builds the same rows as ``ProcessRegistry.sample``.
+    ``name`` is the kernel ``comm`` (at most 15 characters) and ``cmdline``
+    is left empty. ``cpu_percent`` is measured between two scans, keyed by
+    (pid, start time), like psutil's per-handle measurement.
+    """
+
+    def __init__(self, root='/proc'):
+        self.root = root
+        self.clock_ticks = os.sysconf('SC_CLK_TCK')
+        self.page_size = os.sysconf('SC_PAGE_SIZE')
+        self._boot_time = None
+        self._users = {}
+        self._previous = {}
+        self._previous_at = None
+
+    def reset(self):
+        self._previous = {}
+        self._previous_at = None
+
+    def boot_time(self) -> float:
+        if self._boot_time is None:
+            with open(os.path.join(self.root, 'stat'), 'rb') as stat:
+                for line in stat:
+                    if line.startswith(b'btime'):
+                        self._boot_time = float(line.split()[1])
+                        break
+        return self._boot_time
+
+    def mem_total(self) -> int:
+        """Total memory in bytes, from meminfo"""
+        with open(os.path.join(self.root, 'meminfo'), 'rb') as meminfo:
+            for line in meminfo:
+                if line.startswith(b'MemTotal:'):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def username(self, uid):
+        name = self._users.get(uid)
+        if name is None:
+            try:
+                name = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                name = str(uid)
+            self._users[uid] = name
+        return name
+
+    def scan_columns(self) -> Columns:
+        """Parse stat/statm of every process into columns"""
+        columns = Columns(array('i'), [], [], array('i'), array('Q'), array('Q'), array('Q'))
+        root = self.root
+        for entry in os.listdir(root):
+            if not entry.isdigit():
+                continue
+            base = f'{root}/{entry}'
+            try:
+                stat = _read(f'{base}/stat')
+                statm = _read(f'{base}/statm')
+                uid = os.stat(base).st_uid
+            except (FileNotFoundError, ProcessLookupError, PermissionError):
+                # Processus terminé pendant le parcours
+                continue
+            # comm peut contenir espaces et parenthèses : découper sur la dernière
+            close = stat.rfind(b')')
+            fields = stat[close + 2:].split()
+            columns.pids.append(int(entry))
+            columns.names.append(stat[stat.find(b'(') + 1:close].decode('utf-8', 'replace'))
+            columns.states.append(fields[0].decode())
+            columns.uids.append(uid)
+            # Champs 14-15 (utime, stime) et 22 (starttime) de proc(5), décalés de 3
+            columns.cpu_ticks.append(int(fields[11]) + int(fields[12]))
+            columns.start_ticks.append(int(fields[19]))
+            columns.rss_pages.append(int(statm.split(None, 2)[1]))
+        return columns
+
+    def scan(self) -> list:
+        columns = self.scan_columns()
+        now = time.monotonic()
+        elapsed = now - self._previous_at if self._previous_at is not None else 0.0
+        boot_time = self.boot_time()
+        mem_total = self.mem_total() or 1
+        ticks = self.clock_ticks
+        page_size = self.page_size
+        previous = self._previous
+        current = {}
+
+        processes = []
+        for index, pid in enumerate(columns.pids):
+            key = (pid, columns.start_ticks[index])
+            cpu_ticks = columns.cpu_ticks[index]
+            current[key] = cpu_ticks
+            before = previous.get(key)
+            # 0.0 au premier passage, comme psutil.Process.cpu_percent(None)
+            cpu_percent = 0.0
+            if before is not None and elapsed > 0:
+                cpu_percent = round(100.0 * (cpu_ticks - before) / ticks / elapsed, 1)
+            processes.append({
+                'pid': pid,
+                'name': columns.names[index],
+                'username': self.username(columns.uids[index]),
+                'cmdline': '',
+                'create_time': boot_time + columns.start_ticks[index] / ticks,
+                'status': STATUSES.get(columns.states[index], columns.states[index]),
+                'cpu_percent': cpu_percent,
+                'memory_percent': 100.0 * columns.rss_pages[index] * page_size / mem_total,
+            })
+        self._previous = current
+        self._previous_at = now
+        return processes
@@ -0,0 +1,113 @@
+# api/process_events.py
+import json
+from collections import defaultdict
+
+import psutil
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.utils import timezone
+
+from .broadcast import PROCESS_EVENTS_GROUP
+from .models import ProcessEvent
+from .sampler_state import sampler_state
+
+
+def read_process_table() -> dict:
+    """{(pid, create_time): name} of the live processes"""
+    table = {}
+    for proc in psutil.process_iter(['pid', 'name', 'create_time']):
+        info = proc.info
+        if info['create_time'] is not None:
+            table[(info['pid'], info['create_time'])] = info['name']
+    return table
+
+
+def diff_tables(previous, current) -> list:
+    """Lifecycle events between two process tables, in O(n).
+
+    Keys are (pid, create_time), so a reused pid shows up as an exit and a
+    start. A process that exits while another one with the same name starts
+    in the same interval is reported once, as ``restarted``.
+    """
+    exited_by_name = defaultdict(list)
+    for key in previous.keys() - current.keys():
+        exited_by_name[previous[key]].append(key)
+
+    events = []
+    for key in sorted(current.keys() - previous.keys(), key=lambda key: key[1]):
+        name = current[key]
+        event = {'kind': 'started', 'pid': key[0], 'create_time': key[1], 'name': name, 'previous_pid': None}
+        if exited_by_name.get(name):
+            event['kind'] = 'restarted'
+            event['previous_pid'] = exited_by_name[name].pop(0)[0]
+        events.append(event)
+    for name, keys in exited_by_name.items():
+        for pid, create_time in keys:
+            events.append({'kind': 'exited', 'pid': pid, 'create_time': create_time, 'name': name, 'previous_pid': None})
+    return events
+
+
+class ProcessEventDetector:
+    """Diff each process table with the previous one, kept in ``sampler_state``.
+
+    The previous table is swapped atomically in state shared by the worker
+    processes of the host, so whichever Celery child runs the next tick
+    diffs against the table of the last tick, and each event is emitted
+    once. The first tick only records the table.
+    """
+
+    def __init__(self, cache_key='process_events:table', timeout=600, state=sampler_state):
+        self.cache_key = cache_key
+        self.timeout = timeout
+        self.state = state
+
+    def reset(self):
+        self.state.delete(self.cache_key)
+
+    def detect(self, table=None) -> list:
+        table = read_process_table() if table is None else table
+        # Clés (pid, create_time) aplaties : l'état est sérialisé en JSON
+        previous = self.state.swap(
+            self.cache_key, [(pid, created, name) for (pid, created), name in table.items()], self.timeout
+        )
+        if previous is None:
+            return []
+        return diff_tables({(pid, created): name for pid, created, name in previous}, table)
+
+
+def persist_events(events, recorded_at=None) -> list:
+    """Write the events with a single bulk INSERT"""
+    recorded_at = recorded_at or timezone.now()
+    return ProcessEvent.objects.bulk_create([
+        ProcessEvent(recorded_at=recorded_at, **event) for event in events
+    ])
+
+
+def event_payload(instances) -> dict:
+    return {
+        'type': 'process_events',
+        'events': [
+            {
+                'kind': event.kind,
+                'pid': event.pid,
+                'name': event.name,
+                'previous_pid': event.previous_pid,
+                'recorded_at': event.recorded_at.isoformat(),
+            }
+            for event in instances
+        ],
+    }
+
+
+def publish_events(instances, channel_layer=None):
+    channel_layer = channel_layer or get_channel_layer()
+    if channel_layer is None or not instances:
+        return
+    async_to_sync(channel_layer.group_send)(PROCESS_EVENTS_GROUP, {
+        'type': 'metric.update',
+        'metric': 'process_events',
+        'text': json.dumps(event_payload(instances)),
+    })
+
+
+process_event_detector = ProcessEventDetector()
@@ -0,0 +1,164 @@
+# api/process_history.py
+import heapq
+import sys
+from array import array
+from collections import defaultdict
+
+import psutil
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ProcessSample
+from .sampler_state import sampler_state
+
+RANKINGS = ('cpu', 'memory')
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+
+def pack(typecode, values) -> bytes:
+    """Little-endian bytes of a typed array, whatever the host byte order"""
+    packed = array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack(typecode, data) -> list:
+    unpacked = array(typecode)
+    unpacked.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        unpacked.byteswap()
+    return unpacked.tolist()
+
+
+def _cpu_seconds(cpu_times):
+    return cpu_times.user + cpu_times.system
+
+
+class ProcessHistorySampler:
+    """Top-N processes by CPU and by RSS over the interval since the previous call.
+
+    CPU is measured from the ``cpu_times`` delta of each process, keyed by
+    (pid, create_time). The previous reading is swapped atomically in
+    ``sampler_state``, shared by the worker processes of the host, so
+    consecutive samples cover adjacent intervals whichever Celery child
+    runs them. A process started during the interval is charged all of its
+    CPU time.
+    """
+
+    def __init__(self, top_n=10, cache_key='process_history:times', timeout=900, state=sampler_state):
+        self.top_n = top_n
+        self.cache_key = cache_key
+        self.timeout = timeout
+        self.state = state
+
+    def reset(self):
+        self.state.delete(self.cache_key)
+
+    def _read(self):
+        processes = {}
+        for proc in psutil.process_iter(['pid', 'name', 'create_time', 'cpu_times', 'memory_info']):
+            info = proc.info
+            # Champs illisibles (AccessDenied) : valeur None
+            if info['cpu_times'] is None or info['memory_info'] is None:
+                continue
+            key = f"{info['pid']}:{info['create_time']}"
+            processes[key] = (
+                info['pid'], info['name'], info['create_time'],
+                _cpu_seconds(info['cpu_times']), info['memory_info'].rss
+            )
+        return processes
+
+    def sample(self, now=None):
+        """(interval, [(pid, name, cpu_percent, rss)]) or None on the first call"""
+        now = (now or timezone.now()).timestamp()
+        current = self._read()
+        previous = self.state.swap(self.cache_key, {
+            'at': now, 'cpu': {key: values[3] for key, values in current.items()}
+        }, self.timeout)
+        if previous is None or now <= previous['at']:
+            return None
+
+        interval = now - previous['at']
+        rows = []
+        for key, (pid, name, create_time, cpu, rss) in current.items():
+            before = previous['cpu'].get(key)
+            if before is None:
+                # Démarré pendant l'intervalle : tout son temps CPU en fait partie
+                before = 0.0 if create_time >= previous['at'] else cpu
+            rows.append((pid, name, round(100.0 * max(cpu - before, 0.0) / interval, 1), rss))
+
+        top = {row[0]: row for row in heapq.nlargest(self.top_n, rows, key=lambda row: row[2])}
+        top.update((row[0], row) for row in heapq.nlargest(self.top_n, rows, key=lambda row: row[3]))
+        return interval, sorted(top.values(), key=lambda row: (-row[2], -row[3]))
+
+
+def record_sample(sampler, now=None):
+    """Store one ProcessSample row, None on the sampler's first call"""
+    now = now or timezone.now()
+    sampled = sampler.sample(now)
+    if sampled is None:
+        return None
+    interval, rows = sampled
+    return ProcessSample.objects.create(
+        recorded_at=now,
+        interval=interval,
+        pids=pack('i', [row[0] for row in rows]),
+        names=[row[1] for row in rows],
+        cpu=pack('f', [row[2] for row in rows]),
+        rss=pack('q', [row[3] for row in rows]),
+    )
+
+
+def iter_entries(sample):
+    """(pid, name, cpu_percent, rss) of a stored sample"""
+    return zip(
+        unpack('i', sample.pids), sample.names,
+        unpack('f', sample.cpu), unpack('q', sample.rss)
+    )
+
+
+def contributions(start, end, by='cpu', limit=DEFAULT_LIMIT) -> list:
+    """Processes (grouped by name) ranked by their share of CPU or memory over [start, end).
+
+    CPU is counted in CPU-seconds over the recorded intervals, memory as the
+    time-weighted average RSS. Only the top-N kept at each tick are counted,
+    so the figures are lower bounds for the long tail.
+    """
+    if by not in RANKINGS:
+        raise ValueError(f'Unknown ranking: {by}')
+    totals = defaultdict(lambda: {'pids': set(), 'samples': 0, 'cpu_seconds': 0.0,
+                                  'peak_cpu_percent': 0.0, 'rss_seconds': 0.0, 'peak_rss': 0})
+    span = 0.0
+    samples = ProcessSample.objects.filter(recorded_at__gte=start, recorded_at__lt=end)
+    for sample in samples.order_by('recorded_at').iterator():
+        span += sample.interval
+        for pid, name, cpu, rss in iter_entries(sample):
+            entry = totals[name]
+            entry['pids'].add(pid)
+            entry['samples'] += 1
+            entry['cpu_seconds'] += cpu / 100.0 * sample.interval
+            entry['peak_cpu_percent'] = max(entry['peak_cpu_percent'], cpu)
+            entry['rss_seconds'] += rss * sample.interval
+            entry['peak_rss'] = max(entry['peak_rss'], rss)
+
+    ranked = []
+    for name, entry in totals.items():
+        ranked.append({
+            'name': name,
+            'pids': sorted(entry['pids']),
+            'samples': entry['samples'],
+            'cpu_seconds': round(entry['cpu_seconds'], 1),
+            'avg_cpu_percent': round(100.0 * entry['cpu_seconds'] / span, 1),
+            'peak_cpu_percent': round(entry['peak_cpu_percent'], 1),
+            'avg_rss': int(entry['rss_seconds'] / span),
+            'peak_rss': entry['peak_rss'],
+        })
+    key = 'cpu_seconds' if by == 'cpu' else 'avg_rss'
+    return heapq.nlargest(limit, ranked, key=lambda entry: entry[key])
+
+
+process_history_sampler = ProcessHistorySampler(
+    top_n=getattr(settings, 'PROCESS_HISTORY_TOP_N', 10)
+)
@@ -0,0 +1,362 @@
+# api/process_snapshot.py
+import heapq
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import psutil
+from django.conf import settings
+
+from . import proc_scanner
+
+Snapshot = namedtuple('Snapshot', ['generation', 'taken_at', 'processes'])
+
+
+def _read_or_none(getter):
+    try:
+        return getter()
+    except psutil.AccessDenied:
+        return None
+
+
+class ProcessRegistry:
+    """Long-lived psutil.Process handles keyed by (pid, create_time).
+
+    Reusing the same handle between ticks lets ``cpu_percent()`` measure the
+    interval since the previous sample instead of returning 0.0, and static
+    fields (name, cmdline, username) are read only once per process.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _register(self, pid):
+        proc = psutil.Process(pid)
+        with proc.oneshot():
+            entry = {
+                'key': (pid, proc.create_time()),
+                'proc': proc,
+                'name': proc.name(),
+                'username': _read_or_none(proc.username),
+                'cmdline': ' '.join(_read_or_none(proc.cmdline) or []),
+            }
+        self._entries[pid] = entry
+        return entry
+
+    def _lookup(self, pid):
+        entry = self._entries.get(pid)
+        # is_running() compare le create_time courant à celui du handle :
+        # un pid réutilisé par un autre processus donne une nouvelle entrée
+        if entry is None or not entry['proc'].is_running():
+            entry = self._register(pid)
+        return entry
+
+    def sample(self) -> list:
+        """Sample every live process and evict handles of vanished ones"""
+        processes = []
+        alive = set()
+        for pid in psutil.pids():
+            try:
+                entry = self._lookup(pid)
+                proc = entry['proc']
+                with proc.oneshot():
+                    # Champs non lisibles (AccessDenied) : la ligne est gardée avec des valeurs par défaut
+                    processes.append({
+                        'pid': pid,
+                        'name': entry['name'],
+                        'username': entry['username'],
+                        'cmdline': entry['cmdline'],
+                        'create_time': entry['key'][1],
+                        'status': _read_or_none(proc.status),
+                        # 0.0 au premier passage, puis usage depuis le tick précédent
+                        'cpu_percent': _read_or_none(lambda: proc.cpu_percent(None)) or 0.0,
+                        'memory_percent': _read_or_none(proc.memory_percent) or 0.0
+                    })
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                continue
+            except psutil.AccessDenied:
+                # Nom ou create_time illisibles : aucun handle enregistré, pas de ligne
+                pass
+            alive.add(pid)
+
+        for pid in list(self._entries):
+            if pid not in alive:
+                del self._entries[pid]
+        return processes
+
+
+process_registry = ProcessRegistry()
+
+
+def make_scanner(mode):
+    """ProcScanner for ``proc``, or ``auto`` on Linux; None means psutil"""
+    if mode == 'proc' or (mode == 'auto' and proc_scanner.available()):
+        return proc_scanner.ProcScanner()
+    return None
+
+
+fast_scanner = make_scanner(getattr(settings, 'PROCESS_SCANNER', 'psutil'))
+
+
+def sample_processes() -> list:
+    """Walk the process table once, through /proc directly or the shared registry"""
+    if fast_scanner is not None:
+        return fast_scanner.scan()
+    return process_registry.sample()
+
+
+class ProcessSnapshotEngine:
+    """Share one process table sample between every REST and WebSocket reader.
+
+    The table is sampled at most once per ``interval``; concurrent readers
+    asking for a stale snapshot wait for a single refresh (single-flight)
+    instead of each walking ``/proc`` themselves.
+    """
+
+    def __init__(self, sampler=sample_processes, interval=1.0):
+        self.sampler = sampler
+        self.interval = interval
+        self.samples = 0
+        self._snapshot = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get_snapshot(self, max_age=None) -> Snapshot:
+        """Return the current snapshot, refreshing it if older than max_age"""
+        max_age = self.interval if max_age is None else max_age
+        seen = self._snapshot
+        if self._is_fresh(seen, max_age):
+            return seen
+
+        with self._lock:
+            current = self._snapshot
+            # Un autre lecteur a rafraîchi pendant l'attente du verrou
+            if current is not seen or self._is_fresh(current, max_age):
+                return current
+            return self._refresh()
+
+    def _is_fresh(self, snapshot, max_age):
+        return snapshot is not None and time.monotonic() - snapshot.taken_at < max_age
+
+    def _refresh(self):
+        processes = self.sampler()
+        self._generation += 1
+        self.samples += 1
+        self._snapshot = Snapshot(self._generation, time.monotonic(), processes)
+        return self._snapshot
+
+    def reset(self):
+        """Drop the cached snapshot so that the next reader samples again"""
+        with self._lock:
+            self._snapshot = None
+
+
+snapshot_engine = ProcessSnapshotEngine(
+    interval=getattr(settings, 'PROCESS_SNAPSHOT_INTERVAL', 1.0)
+)
+
+
+# Champs envoyés aux navigateurs, arrondis comme à l'affichage pour que le
+# bruit de mesure ne génère pas de deltas inutiles
+STREAM_FIELDS = ('pid', 'name', 'username', 'status', 'cpu_percent', 'memory_percent')
+STREAM_PRECISION = 1
+
+
+def stream_rows(processes) -> dict:
+    """Index processes by pid with only the fields streamed over WebSocket"""
+    rows = {}
+    for process in processes:
+        row = {field: process.get(field) for field in STREAM_FIELDS}
+        row['cpu_percent'] = round(row['cpu_percent'] or 0.0, STREAM_PRECISION)
+        row['memory_percent'] = round(row['memory_percent'] or 0.0, STREAM_PRECISION)
+        rows[row['pid']] = row
+    return rows
+
+
+def diff_rows(previous, current) -> dict:
+    """Added rows, removed pids and changed fields between two stream views"""
+    added = []
+    changed = []
+    for pid, row in current.items():
+        old = previous.get(pid)
+        if old is None:
+            added.append(row)
+        elif old != row:
+            fields = {key: value for key, value in row.items() if old.get(key) != value}
+            fields['pid'] = pid
+            changed.append(fields)
+    removed = [pid for pid in previous if pid not in current]
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+
+SORT_KEYS = {
+    'cpu': (lambda row: row['cpu_percent'] or 0.0, True),
+    'memory': (lambda row: row['memory_percent'] or 0.0, True),
+    'name': (lambda row: (row['name'] or '').lower(), False),
+}
+MAX_PATTERN_LENGTH = 200
+MAX_LIMIT = 1000
+
+_SubscriptionBase = namedtuple(
+    '_SubscriptionBase', ['name', 'user', 'min_cpu', 'min_memory', 'sort', 'limit'],
+    defaults=(None, None, 0.0, 0.0, 'cpu', None)
+)
+
+
+class ProcessSubscription(_SubscriptionBase):
+    """Server-side filter, sort and top-N applied to the process table.
+
+    Instances are hashable so that the selection is computed once per
+    distinct subscription and shared by every client using it.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_message(cls, data):
+        """Build a subscription from a client message, raising ValueError if invalid"""
+        patterns = {}
+        for field in ('name', 'user'):
+            pattern = data.get(field) or None
+            if pattern is not None:
+                if len(pattern) > MAX_PATTERN_LENGTH:
+                    raise ValueError(f'{field} pattern is too long')
+                try:
+                    re.compile(pattern)
+                except re.error as e:
+                    raise ValueError(f'Invalid {field} pattern: {e}')
+            patterns[field] = pattern
+
+        sort = data.get('sort') or 'cpu'
+        if sort not in SORT_KEYS:
+            raise ValueError(f'Unknown sort key: {sort}')
+
+        limit = data.get('limit')
+        if limit is not None:
+            limit = int(limit)
+            if not 1 <= limit <= MAX_LIMIT:
+                raise ValueError(f'limit must be between 1 and {MAX_LIMIT}')
+
+        return cls(
+            name=patterns['name'],
+            user=patterns['user'],
+            min_cpu=float(data.get('min_cpu') or 0.0),
+            min_memory=float(data.get('min_memory') or 0.0),
+            sort=sort,
+            limit=limit
+        )
+
+    def select(self, rows) -> list:
+        """Filter rows, then sort them or keep the top-N with a partial heap sort"""
+        name_re = re.compile(self.name, re.IGNORECASE) if self.name else None
+        user_re = re.compile(self.user, re.IGNORECASE) if self.user else None
+        selected = [
+            row for row in rows
+            if (row['cpu_percent'] or 0.0) >= self.min_cpu
+            and (row['memory_percent'] or 0.0) >= self.min_memory
+            and (name_re is None or name_re.search(row['name'] or ''))
+            and (user_re is None or user_re.search(row.get('username') or ''))
+        ]
+        key, largest = SORT_KEYS[self.sort]
+        if self.limit is None:
+            return sorted(selected, key=key, reverse=largest)
+        if largest:
+            return heapq.nlargest(self.limit, selected, key=key)
+        return heapq.nsmallest(self.limit, selected, key=key)
+
+
+ALL_PROCESSES = ProcessSubscription()
+
+
+class ProcessStream:
+    """Stream views and deltas computed once per generation and subscription.
+
+    Subscribers that are in step (the common case) share the same delta
+    object; a lagging subscriber falls back to a diff against its own view.
+    """
+
+    def __init__(self, history=64):
+        self.history = history
+        self._views = OrderedDict()
+        self._deltas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def view(self, snapshot, subscription=ALL_PROCESSES) -> dict:
+        with self._lock:
+            view = self._views.get((subscription, snapshot.generation))
+            if view is None:
+                view = self._base_view(snapshot)
+                if subscription != ALL_PROCESSES:
+                    view = {row['pid']: row for row in subscription.select(view.values())}
+                    self._remember(self._views, (subscription, snapshot.generation), view)
+            return view
+
+    def _base_view(self, snapshot):
+        key = (ALL_PROCESSES, snapshot.generation)
+        view = self._views.get(key)
+        if view is None:
+            view = stream_rows(snapshot.processes)
+            self._remember(self._views, key, view)
+        return view
+
+    def delta(self, from_generation, from_view, to_generation, to_view,
+              subscription=ALL_PROCESSES) -> dict:
+        key = (subscription, from_generation, to_generation)
+        with self._lock:
+            delta = self._deltas.get(key)
+            if delta is None:
+                delta = diff_rows(from_view, to_view)
+                self._remember(self._deltas, key, delta)
+            return delta
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        while len(cache) > self.history:
+            cache.popitem(last=False)
+
+
+process_stream = ProcessStream()
+
+
+class ProcessStreamState:
+    """Per-connection position in the process stream (subscription, seq, view)"""
+
+    def __init__(self, engine=None, stream=None):
+        self.engine = engine or snapshot_engine
+        self.stream = stream or process_stream
+        self.subscription = ALL_PROCESSES
+        self.seq = 0
+        self.generation = None
+        self.view = None
+
+    def next_message(self, full=False):
+        """Full snapshot or delta since the previous message, None if unchanged"""
+        snapshot = self.engine.get_snapshot()
+        if not full and snapshot.generation == self.generation:
+            return None
+
+        view = self.stream.view(snapshot, self.subscription)
+        if full or self.view is None:
+            message = {'type': 'process_snapshot', 'processes': list(view.values())}
+        else:
+            delta = self.stream.delta(
+                self.generation, self.view, snapshot.generation, view, self.subscription
+            )
+            message = {'type': 'process_delta', **delta}
+            if not (delta['added'] or delta['removed'] or delta['changed']):
+                message = None
+        self.generation, self.view = snapshot.generation, view
+        if message is not None:
+            self.seq += 1
+            message['seq'] = self.seq
+        return message
@@ -0,0 +1,132 @@
+# api/recent.py
+import json
+import threading
+import time
+from collections import deque
+
+from django.apps import apps
+from django.conf import settings
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+def _usage_row(usage):
+    return {'recorded_at': usage.recorded_at.isoformat(), 'usage': usage.usage}
+
+
+def _network_row(network):
+    return {
+        'recorded_at': network.recorded_at.isoformat(),
+        'interface': network.interface,
+        'received': network.received,
+        'sent': network.sent,
+        'received_rate': network.received_rate,
+        'sent_rate': network.sent_rate
+    }
+
+
+# Série -> (modèle source, format d'une ligne lue par les consumers)
+SERIES = {
+    'cpu': ('CPUUsage', _usage_row),
+    'memory': ('MemoryUsage', _usage_row),
+    'network': ('NetworkUsage', _network_row),
+}
+SERIES_BY_MODEL = {model_name: series for series, (model_name, _) in SERIES.items()}
+
+
+class RecentSamples:
+    """Latest samples of each series kept in memory, written through by the collectors.
+
+    Readers get the newest rows without a database query. The cache is
+    filled from the database only on a cold start. With a Redis URL, every
+    process shares one Redis list per series. Otherwise each process keeps
+    its own deques. A deque filled from the database in a process that
+    receives no writes (e.g. an ASGI worker while Celery collects) is
+    reloaded after ``ttl`` seconds so that it does not go stale.
+    """
+
+    def __init__(self, maxlen=100, ttl=5.0, redis_url=None):
+        self.maxlen = maxlen
+        self.ttl = ttl
+        self.loads = 0
+        self._series = {}
+        self._lock = threading.Lock()
+        self._redis = redis.Redis.from_url(redis_url) if redis_url and redis else None
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def _key(self, series):
+        return f'hyperion:recent:{series}'
+
+    def record(self, instances):
+        """Write-through of freshly saved metric rows"""
+        rows = {}
+        for instance in instances:
+            series = SERIES_BY_MODEL.get(type(instance).__name__)
+            if series is not None:
+                rows.setdefault(series, []).append(SERIES[series][1](instance))
+        for series, series_rows in rows.items():
+            self._push(series, series_rows)
+
+    def _push(self, series, rows):
+        if self._redis is not None:
+            try:
+                pipe = self._redis.pipeline()
+                # rpushx : une liste absente (démarrage à froid) sera chargée par le prochain lecteur
+                pipe.rpushx(self._key(series), *(json.dumps(row) for row in rows))
+                pipe.ltrim(self._key(series), -self.maxlen, -1)
+                pipe.execute()
+            except redis.RedisError:
+                pass
+        with self._lock:
+            entry = self._series.get(series)
+            # Série jamais lue dans ce processus : le prochain lecteur la chargera
+            if entry is not None:
+                entry['rows'].extend(rows)
+                entry['written'] = True
+
+    def latest(self, series, limit=50) -> list:
+        """Up to ``limit`` rows of a series, newest first"""
+        if self._redis is not None:
+            try:
+                raw = self._redis.lrange(self._key(series), -limit, -1)
+                if raw:
+                    return [json.loads(row) for row in reversed(raw)]
+            except redis.RedisError:
+                pass
+
+        with self._lock:
+            entry = self._series.get(series)
+            if entry is None or (not entry['written'] and time.monotonic() - entry['loaded_at'] > self.ttl):
+                entry = self._load(series)
+            rows = list(entry['rows'])[-limit:]
+        return rows[::-1]
+
+    def _load(self, series):
+        model_name, to_row = SERIES[series]
+        Model = apps.get_model('api', model_name)
+        rows = [to_row(obj) for obj in Model.objects.order_by('-recorded_at')[:self.maxlen]][::-1]
+        self.loads += 1
+        entry = {'rows': deque(rows, maxlen=self.maxlen), 'written': False, 'loaded_at': time.monotonic()}
+        self._series[series] = entry
+        if self._redis is not None and rows:
+            try:
+                pipe = self._redis.pipeline()
+                pipe.delete(self._key(series))
+                pipe.rpush(self._key(series), *(json.dumps(row) for row in rows))
+                pipe.execute()
+            except redis.RedisError:
+                pass
+        return entry
+
+
+recent_samples = RecentSamples(
+    maxlen=getattr(settings, 'RECENT_SAMPLES_SIZE', 100),
+    ttl=getattr(settings, 'RECENT_SAMPLES_TTL', 5.0),
+    redis_url=getattr(settings, 'RECENT_SAMPLES_REDIS_URL', None),
+)
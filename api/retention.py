@@ -0,0 +1,88 @@
+# api/retention.py
+import logging
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+logger = logging.getLogger('hyperion.api')
+
+# Champ daté de chaque modèle ; recorded_at par défaut
+DATE_FIELDS = {
+    'api.AuditLog': 'timestamp',
+    'api.MetricChunk': 'end',
+    'api.MetricRollup': 'bucket',
+    'django_celery_results.TaskResult': 'date_done',
+}
+
+DEFAULT_RETENTION = {
+    'api.CPUUsage': 30,
+    'api.MemoryUsage': 30,
+    'api.NetworkUsage': 30,
+    'api.StorageUsage': 90,
+    'api.DiskIOUsage': 30,
+    'api.ProcessSample': 30,
+    'api.ProcessEvent': 30,
+    # Blocs compressés : historique long, lu après la purge des lignes brutes
+    'api.MetricChunk': 365,
+    # Agrégats par résolution ; 1m ne survit pas aux lignes brutes qu'il résume
+    'api.MetricRollup:1m': 7,
+    'api.MetricRollup:1h': 365,
+    'api.MetricRollup:1d': 1825,
+    'api.AuditLog': 365,
+    'django_celery_results.TaskResult': 7,
+}
+
+
+def purge(model, date_field, cutoff, batch_size=5000, filters=None) -> int:
+    """Delete rows older than ``cutoff`` in short transactions over primary-key ranges.
+
+    Each batch only touches ``batch_size`` consecutive primary keys, so locks
+    are held briefly and the write-ahead log grows by bounded steps.
+    """
+    expired = {f'{date_field}__lt': cutoff, **(filters or {})}
+    bounds = model.objects.filter(**expired).aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return 0
+
+    deleted = 0
+    low = bounds['low']
+    while low <= bounds['high']:
+        high = low + batch_size
+        with transaction.atomic():
+            count, _ = model.objects.filter(pk__gte=low, pk__lt=high, **expired).delete()
+        deleted += count
+        low = high
+    return deleted
+
+
+def apply_retention(policies=None, batch_size=None, now=None) -> list:
+    """Enforce the retention policies; one report entry per model"""
+    policies = getattr(settings, 'RETENTION_DAYS', DEFAULT_RETENTION) if policies is None else policies
+    batch_size = batch_size or getattr(settings, 'RETENTION_BATCH_SIZE', 5000)
+    now = now or timezone.now()
+
+    report = []
+    for label, days in policies.items():
+        if days is None:
+            continue
+        # « api.MetricRollup:1h » : une politique par résolution d'agrégat
+        model_label, _, resolution = label.partition(':')
+        try:
+            model = apps.get_model(model_label)
+        except LookupError:
+            # Application non installée (ex. django_celery_results)
+            continue
+        filters = {'resolution': resolution} if resolution else None
+        started = time.monotonic()
+        deleted = purge(
+            model, DATE_FIELDS.get(model_label, 'recorded_at'), now - timedelta(days=days), batch_size, filters
+        )
+        seconds = round(time.monotonic() - started, 3)
+        logger.info(f"Rétention {label}: {deleted} lignes supprimées en {seconds}s")
+        report.append({'model': label, 'deleted': deleted, 'seconds': seconds})
+    return report
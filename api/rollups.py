@@ -0,0 +1,181 @@
+# api/rollups.py
+import math
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import CPUUsage, DiskIOUsage, MemoryUsage, MetricRollup, NetworkUsage, StorageUsage
+
+# Résolutions du plus fin au plus grossier, en secondes
+RESOLUTIONS = {
+    '1m': 60,
+    '1h': 3600,
+    '1d': 86400,
+}
+
+Source = namedtuple('Source', ['model', 'value_field', 'series_field'])
+
+SOURCES = {
+    'cpu': Source(CPUUsage, 'usage', None),
+    'memory': Source(MemoryUsage, 'usage', None),
+    'network.received': Source(NetworkUsage, 'received', 'interface'),
+    'network.sent': Source(NetworkUsage, 'sent', 'interface'),
+    'network.received_rate': Source(NetworkUsage, 'received_rate', 'interface'),
+    'network.sent_rate': Source(NetworkUsage, 'sent_rate', 'interface'),
+    'network.packets_received_rate': Source(NetworkUsage, 'packets_received_rate', 'interface'),
+    'network.packets_sent_rate': Source(NetworkUsage, 'packets_sent_rate', 'interface'),
+    'storage': Source(StorageUsage, 'percent_used', 'mount_point'),
+    'disk.read_iops': Source(DiskIOUsage, 'read_iops', 'device'),
+    'disk.write_iops': Source(DiskIOUsage, 'write_iops', 'device'),
+    'disk.read_bytes_rate': Source(DiskIOUsage, 'read_bytes_rate', 'device'),
+    'disk.write_bytes_rate': Source(DiskIOUsage, 'write_bytes_rate', 'device'),
+    'disk.read_latency': Source(DiskIOUsage, 'read_latency', 'device'),
+    'disk.write_latency': Source(DiskIOUsage, 'write_latency', 'device'),
+    'disk.utilization': Source(DiskIOUsage, 'utilization', 'device'),
+}
+
+# Fenêtre de données brutes lue en une fois pendant le compactage
+COMPACTION_WINDOW = 86400
+
+
+def bucket_start(moment, size) -> datetime:
+    """Start of the UTC-aligned bucket of ``size`` seconds containing ``moment``"""
+    epoch = math.floor(moment.timestamp() / size) * size
+    return datetime.fromtimestamp(epoch, tz=dt_timezone.utc)
+
+
+def summarize(values) -> dict:
+    """min/max/avg/count/p95 (nearest rank) of a non-empty list of values"""
+    ordered = sorted(values)
+    count = len(ordered)
+    return {
+        'count': count,
+        'min': ordered[0],
+        'max': ordered[-1],
+        'avg': sum(ordered) / count,
+        'p95': ordered[math.ceil(0.95 * count) - 1],
+    }
+
+
+def rollup_raw(metric, resolution, start, end, series=None) -> list:
+    """Unsaved MetricRollup rows computed from raw samples in [start, end)"""
+    source = SOURCES[metric]
+    size = RESOLUTIONS[resolution]
+    rows = source.model.objects.filter(
+        recorded_at__gte=start, recorded_at__lt=end, **{f'{source.value_field}__isnull': False}
+    )
+    fields = [source.value_field, 'recorded_at']
+    if source.series_field:
+        fields.append(source.series_field)
+        if series is not None:
+            rows = rows.filter(**{source.series_field: series})
+
+    buckets = defaultdict(list)
+    for row in rows.values_list(*fields).iterator():
+        key = (row[2] if source.series_field else '', bucket_start(row[1], size))
+        buckets[key].append(row[0])
+
+    return [
+        MetricRollup(
+            metric=metric, series=key_series, resolution=resolution, bucket=key_bucket,
+            **summarize(values)
+        )
+        for (key_series, key_bucket), values in sorted(buckets.items(), key=lambda item: item[0][1])
+    ]
+
+
+def compacted_until(metric, resolution):
+    """End of the last compacted bucket, None if nothing was compacted yet"""
+    last = MetricRollup.objects.filter(
+        metric=metric, resolution=resolution
+    ).aggregate(last=Max('bucket'))['last']
+    return last + timedelta(seconds=RESOLUTIONS[resolution]) if last else None
+
+
+def compact(metric, resolution, now=None) -> int:
+    """Roll up the closed buckets not compacted yet; returns the rows written"""
+    size = RESOLUTIONS[resolution]
+    end = bucket_start(now or timezone.now(), size)
+    start = compacted_until(metric, resolution)
+    if start is None:
+        first = SOURCES[metric].model.objects.aggregate(first=Min('recorded_at'))['first']
+        if first is None:
+            return 0
+        start = bucket_start(first, size)
+
+    written = 0
+    window = timedelta(seconds=max(COMPACTION_WINDOW, size))
+    while start < end:
+        stop = min(start + window, end)
+        rollups = rollup_raw(metric, resolution, start, stop)
+        with transaction.atomic():
+            MetricRollup.objects.bulk_create(rollups, batch_size=1000, ignore_conflicts=True)
+        written += len(rollups)
+        start = stop
+    return written
+
+
+def compact_all(now=None) -> dict:
+    """Compact every metric at every resolution"""
+    now = now or timezone.now()
+    return {
+        f'{metric}:{resolution}': compact(metric, resolution, now)
+        for metric in SOURCES for resolution in RESOLUTIONS
+    }
+
+
+def pick_resolution(start, end, max_points) -> str:
+    """Finest resolution returning at most ``max_points`` buckets over [start, end)"""
+    span = (end - start).total_seconds()
+    for resolution, size in RESOLUTIONS.items():
+        if span / size <= max_points:
+            return resolution
+    return list(RESOLUTIONS)[-1]
+
+
+def rollup_points(metric, resolution, start, end, series=None) -> list:
+    """MetricRollup rows of [start, end), completed from the raw samples after the last compaction"""
+    start = bucket_start(start, RESOLUTIONS[resolution])
+    rollups = MetricRollup.objects.filter(
+        metric=metric, resolution=resolution, bucket__gte=start, bucket__lt=end
+    )
+    if series is not None:
+        rollups = rollups.filter(series=series)
+    points = list(rollups.order_by('bucket'))
+
+    tail = max(compacted_until(metric, resolution) or start, start)
+    if tail < end:
+        points.extend(rollup_raw(metric, resolution, tail, end, series))
+    return points
+
+
+def query_rollups(metric, start, end, max_points=500, series=None, resolution=None) -> dict:
+    """Series of buckets for a metric, read from the rollups at an automatic resolution.
+
+    Buckets not compacted yet (the most recent ones) are computed on the fly
+    from the raw samples so that the series always reaches ``end``.
+    """
+    if metric not in SOURCES:
+        raise ValueError(f'Unknown metric: {metric}')
+    resolution = resolution or pick_resolution(start, end, max_points)
+    points = rollup_points(metric, resolution, start, end, series)
+
+    return {
+        'metric': metric,
+        'resolution': resolution,
+        'points': [
+            {
+                'bucket': point.bucket.isoformat(),
+                'series': point.series,
+                'count': point.count,
+                'min': point.min,
+                'max': point.max,
+                'avg': point.avg,
+                'p95': point.p95,
+            }
+            for point in points
+        ],
+    }
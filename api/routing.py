@@ -5,7 +5,7 @@ from .consumers import (
     ProcessConsumer, ServiceConsumer, NetworkConsumer,
     CPUConsumer, MemoryConsumer, FileSystemConsumer,
     ShellConsumer, StorageConsumer, TemperatureConsumer,
-    SSHConsumer
+    SSHConsumer, DashboardConsumer
     )
 
 websocket_urlpatterns = [
@@ -18,5 +18,6 @@ websocket_urlpatterns = [
     path('ws/shell/', ShellConsumer.as_asgi()),
     path('ws/storage/', StorageConsumer.as_asgi()),
     path('ws/temperature/', TemperatureConsumer.as_asgi()),
+    path('ws/dashboard/', DashboardConsumer.as_asgi()),
     re_path('ws/ssh/$', consumers.SSHConsumer.as_asgi()),
 ]
\ No newline at end of file
@@ -0,0 +1,88 @@
+# api/sampler_state.py
+import json
+import logging
+import socket
+import threading
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger('hyperion.api')
+
+
+class SamplerState:
+    """Previous reading of a sampler, shared by every worker process of this host.
+
+    Readings must be JSON-serialisable. ``swap`` stores the new reading and
+    returns the previous one in a single step: with Redis
+    (``SAMPLER_STATE_REDIS_URL``) it is one atomic GETSET, so two prefork
+    children never diff against the same previous reading.
+    Without Redis the Django cache is used; a LocMem cache is private to
+    each process, which is reported once with a warning. Keys are prefixed
+    with the host name since readings such as the process table are local.
+    """
+
+    def __init__(self, redis_url=None, prefix=None):
+        self._redis_url = redis_url
+        self.prefix = prefix or f'hyperion:{socket.gethostname()}:'
+        self._redis = None
+        self._resolved = False
+        self._warned = False
+        self._lock = threading.Lock()
+
+    def _client(self):
+        # Résolu au premier accès : les réglages de test sont alors en place
+        if not self._resolved:
+            url = self._redis_url or getattr(settings, 'SAMPLER_STATE_REDIS_URL', None)
+            self._redis = redis.Redis.from_url(url) if url and redis else None
+            self._resolved = True
+        return self._redis
+
+    def _warn_if_private(self):
+        if not self._warned and isinstance(caches['default'], LocMemCache):
+            self._warned = True
+            logger.warning(
+                "État des échantillonneurs dans un cache LocMem, propre à chaque processus : "
+                "avec plusieurs workers Celery, définir SAMPLER_STATE_REDIS_URL ou CACHES"
+            )
+
+    def swap(self, key, value, timeout):
+        """Store ``value`` and return the value it replaces (None if absent)"""
+        client = self._client()
+        if client is not None:
+            try:
+                pipe = client.pipeline()
+                pipe.getset(self.prefix + key, json.dumps(value))
+                pipe.expire(self.prefix + key, int(timeout))
+                previous, _ = pipe.execute()
+                return json.loads(previous) if previous is not None else None
+            except redis.RedisError:
+                logger.exception("Redis indisponible pour l'état des échantillonneurs, repli sur le cache Django")
+
+        self._warn_if_private()
+        with self._lock:
+            previous = cache.get(self.prefix + key)
+            cache.set(self.prefix + key, value, timeout)
+        return previous
+
+    def delete(self, key):
+        client = self._client()
+        if client is not None:
+            try:
+                client.delete(self.prefix + key)
+            except redis.RedisError:
+                pass
+        cache.delete(self.prefix + key)
+
+    def reset(self):
+        self._redis = None
+        self._resolved = False
+
+
+sampler_state = SamplerState()
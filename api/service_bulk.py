@@ -0,0 +1,181 @@
+# api/service_bulk.py
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connection
+
+from .broadcast import SERVICES_GROUP
+from .models import AuditLog
+from .utils import restart_service_async, start_service_async, stop_service_async
+
+logger = logging.getLogger('hyperion.api')
+
+OPERATIONS = {
+    'start': start_service_async,
+    'stop': stop_service_async,
+    'restart': restart_service_async,
+}
+# Unités traitées par requête et actions systemctl simultanées
+MAX_UNITS = getattr(settings, 'SERVICE_BULK_MAX_UNITS', 100)
+DEFAULT_CONCURRENCY = getattr(settings, 'SERVICE_BULK_CONCURRENCY', 4)
+
+# Nom d'unité systemd sans suffixe (échappements \x2d compris) ; refuse tout ce qui ressemble à une option
+UNIT_NAME = re.compile(r'^[A-Za-z0-9@_:.\\-]+$')
+
+
+def validate_units(units) -> list:
+    if not isinstance(units, list) or not units:
+        raise ValueError('services must be a non-empty list')
+    if len(units) > MAX_UNITS:
+        raise ValueError(f'at most {MAX_UNITS} services per request')
+    for unit in units:
+        if not isinstance(unit, str) or unit.startswith('-') or not UNIT_NAME.match(unit):
+            raise ValueError(f'invalid service name: {unit!r}')
+    if len(set(units)) != len(units):
+        raise ValueError('duplicate service names')
+    return units
+
+
+def dependency_waves(units, after=None) -> list:
+    """Group units into waves; a unit runs once every unit it comes ``after`` is done.
+
+    ``after`` maps a unit to the units it depends on. Dependencies outside
+    ``units`` are ignored. Raises ValueError on a cycle.
+    """
+    after = after or {}
+    pending = {unit: {dep for dep in after.get(unit, ()) if dep in units and dep != unit} for unit in units}
+    waves = []
+    while pending:
+        wave = [unit for unit in units if unit in pending and not pending[unit]]
+        if not wave:
+            raise ValueError(f'dependency cycle between {sorted(pending)}')
+        for unit in wave:
+            del pending[unit]
+        for deps in pending.values():
+            deps.difference_update(wave)
+        waves.append(wave)
+    return waves
+
+
+class BulkOperation:
+    """One start/stop/restart over many units, wave by wave.
+
+    Units of a wave run in parallel, at most ``concurrency`` at a time. For
+    ``stop`` the waves run in reverse order, so dependents stop first. A unit
+    whose dependency failed is skipped. Each result is published on the
+    ``services.bulk`` group as soon as it is known. ``start`` runs the
+    operation in a background thread and audits it once finished.
+    """
+
+    def __init__(self, operation, units, after=None, concurrency=None, channel_layer=None):
+        if operation not in OPERATIONS:
+            raise ValueError(f'unknown operation: {operation!r}')
+        self.operation = operation
+        self.units = validate_units(units)
+        self.after = after or {}
+        if not isinstance(self.after, dict) or not all(isinstance(deps, list) for deps in self.after.values()):
+            raise ValueError('after must map a service to a list of services')
+        self.waves = dependency_waves(self.units, self.after)
+        if operation == 'stop':
+            self.waves.reverse()
+        self.concurrency = max(1, min(int(concurrency or DEFAULT_CONCURRENCY), len(self.units)))
+        self.channel_layer = channel_layer
+        self.job = uuid.uuid4().hex
+        self.results = []
+
+    def _blocked_by(self, unit, failed) -> list:
+        if self.operation == 'stop':
+            # Ordre inversé : ce sont les unités qui en dépendent qui passent avant
+            return [other for other in failed if unit in self.after.get(other, ())]
+        return [dep for dep in self.after.get(unit, ()) if dep in failed]
+
+    async def run(self) -> list:
+        self.channel_layer = self.channel_layer or get_channel_layer()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        action = OPERATIONS[self.operation]
+        failed = set()
+
+        async def run_unit(unit):
+            blocked = self._blocked_by(unit, failed)
+            if blocked:
+                # Les unités qui dépendent de celle-ci sont sautées à leur tour
+                failed.add(unit)
+                return await self._record(unit, 'skipped', 0.0, blocked_by=sorted(blocked))
+            async with semaphore:
+                started = time.monotonic()
+                success = await action(unit)
+            result = await self._record(unit, 'success' if success else 'error', time.monotonic() - started)
+            if not success:
+                failed.add(unit)
+            return result
+
+        for wave in self.waves:
+            await asyncio.gather(*[run_unit(unit) for unit in wave])
+        return self.results
+
+    async def _record(self, unit, status, duration, **extra):
+        result = {'service': unit, 'status': status, 'duration': round(duration, 3), **extra}
+        self.results.append(result)
+        if self.channel_layer is not None:
+            await self.channel_layer.group_send(SERVICES_GROUP, {
+                'type': 'metric.update',
+                'metric': 'service_bulk',
+                'text': json.dumps({
+                    'type': 'service_bulk',
+                    'job': self.job,
+                    'operation': self.operation,
+                    'done': len(self.results),
+                    'total': len(self.units),
+                    **result,
+                }),
+            })
+        return result
+
+    def start(self, user, ip_address) -> threading.Thread:
+        thread = threading.Thread(target=self._run_and_audit, args=(user, ip_address), daemon=True)
+        thread.start()
+        return thread
+
+    def _run_and_audit(self, user, ip_address):
+        try:
+            async_to_sync(self.run)()
+        except Exception:
+            logger.exception(f"Opération groupée {self.job} interrompue")
+        finally:
+            try:
+                audit_results(self, user, ip_address)
+            finally:
+                # Connexion ouverte par ce thread : la fermer avant de sortir
+                connection.close()
+
+    def summary(self) -> dict:
+        return {
+            'job': self.job,
+            'operation': self.operation,
+            'waves': self.waves,
+            'succeeded': sum(result['status'] == 'success' for result in self.results),
+            'failed': sum(result['status'] == 'error' for result in self.results),
+            'skipped': sum(result['status'] == 'skipped' for result in self.results),
+            'results': self.results,
+        }
+
+
+def audit_results(bulk, user, ip_address) -> list:
+    """One AuditLog row per unit, written with a single INSERT"""
+    return AuditLog.objects.bulk_create([
+        AuditLog(
+            user=user,
+            action='service_control',
+            details=f"{bulk.operation} {result['service']}: {result['status']} (bulk {bulk.job})",
+            ip_address=ip_address,
+        )
+        for result in bulk.results
+    ])
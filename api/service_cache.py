@@ -0,0 +1,105 @@
+# api/service_cache.py
+import logging
+import threading
+import time
+
+logger = logging.getLogger('hyperion.api')
+
+
+class ServiceInventory:
+    """Shared service list, refreshed at most once per ``interval``.
+
+    Readers never wait for systemctl once a list exists: a stale list is
+    returned as is while a single background thread reloads it
+    (single-flight). Only the very first read blocks, and concurrent first
+    readers share that one load. After an action on a unit, ``invalidate``
+    re-reads that unit alone and patches it into the list; a background
+    reload that started before the patch keeps the patched entry.
+    """
+
+    def __init__(self, loader, unit_loader, interval=5.0):
+        self.loader = loader
+        self.unit_loader = unit_loader
+        self.interval = interval
+        self.loads = 0
+        self._services = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        # Génération de chaque unité modifiée par update(), comparée au début d'un rechargement
+        self._generation = 0
+        self._patched = {}
+
+    def get(self) -> list:
+        services = self._services
+        if services is None:
+            with self._lock:
+                # Un autre lecteur a chargé la liste pendant l'attente du verrou
+                if self._services is None:
+                    self._load()
+                return list(self._services)
+
+        if time.monotonic() - self._loaded_at >= self.interval:
+            with self._lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(target=self._refresh, daemon=True).start()
+        return list(services)
+
+    def _load(self):
+        self._services = self.loader()
+        self._loaded_at = time.monotonic()
+        self.loads += 1
+
+    def _refresh(self):
+        with self._lock:
+            started = self._generation
+        try:
+            services = self.loader()
+            with self._lock:
+                # Unités modifiées pendant le chargement : leur état lu après l'action est plus récent
+                recent = {name for name, generation in self._patched.items() if generation > started}
+                if recent and self._services is not None:
+                    current = {service['name']: service for service in self._services}
+                    services = [current.get(service['name'], service) if service['name'] in recent else service
+                                for service in services]
+                    listed = {service['name'] for service in services}
+                    services += [current[name] for name in recent if name in current and name not in listed]
+                self._patched.clear()
+                self._services = services
+                self._loaded_at = time.monotonic()
+                self.loads += 1
+        except Exception:
+            # La liste précédente reste servie ; nouvel essai au prochain accès
+            logger.exception("Rechargement de la liste des services impossible")
+        finally:
+            self._refreshing = False
+
+    def invalidate(self, name):
+        """Reload the state of one unit after a start/stop/restart"""
+        self.update(name, self.unit_loader(name))
+
+    def update(self, name, entry):
+        """Patch an entry already read (e.g. asynchronously) into the list"""
+        with self._lock:
+            if self._services is None:
+                return
+            if entry is None:
+                # État illisible : rechargement complet au prochain accès
+                self._loaded_at = 0.0
+                return
+            updated = [dict(service, **entry) if service['name'] == name else service
+                       for service in self._services]
+            if not any(service['name'] == name for service in updated):
+                updated.append(dict(entry, name=name))
+            # Nouvelle liste : les lecteurs gardent une copie cohérente de l'ancienne
+            self._services = updated
+            self._generation += 1
+            self._patched[name] = self._generation
+
+    def reset(self):
+        with self._lock:
+            self._services = None
+            self._loaded_at = 0.0
+            self._patched = {}
@@ -2,28 +2,55 @@
 from celery import shared_task
 from .models import CPUUsage, MemoryUsage, NetworkUsage, StorageUsage
 from .utils import get_storage_info
+from .cpu_sampler import RECORDED_MODES, cpu_sampler
+from .collection import collect_snapshot, persist_snapshot
+from .rollups import SOURCES, compact_all
+from .retention import apply_retention
+from .chunks import pack_chunks
+from .partitions import maintain_partitions
+from .net_sampler import net_sampler
+from .recent import recent_samples
+from .process_history import process_history_sampler, record_sample
+from .process_events import persist_events, process_event_detector, publish_events
 import psutil
 import requests
 from django.conf import settings
+from django.utils import timezone
 
 @shared_task
 def record_cpu_usage():
-    usage = psutil.cpu_percent(interval=1)
-    CPUUsage.objects.create(usage=usage)
+    # Delta de cpu_times depuis l'appel précédent : pas d'attente bloquante
+    sample = cpu_sampler.sample()
+    if sample is None:
+        # Premier relevé (ou compteurs remis à zéro) : il sert de référence au suivant
+        return
+    usage = CPUUsage.objects.create(
+        usage=sample['usage'],
+        per_core=sample['per_core'],
+        **{mode: sample['modes'].get(mode) for mode in RECORDED_MODES}
+    )
+    recent_samples.record([usage])
 
 @shared_task
 def record_memory_usage():
     usage = psutil.virtual_memory().percent
-    MemoryUsage.objects.create(usage=usage)
+    recent_samples.record([MemoryUsage.objects.create(usage=usage)])
 
 @shared_task
 def record_network_usage():
-    for interface, stats in psutil.net_io_counters(pernic=True).items():
+    counters = psutil.net_io_counters(pernic=True)
+    recorded_at = timezone.now()
+    rates = net_sampler.sample(counters, recorded_at)
+    recent_samples.record([
         NetworkUsage.objects.create(
             interface=interface,
             received=stats.bytes_recv,
-            sent=stats.bytes_sent
+            sent=stats.bytes_sent,
+            recorded_at=recorded_at,
+            **rates[interface]
         )
+        for interface, stats in counters.items()
+    ])
 
 @shared_task
 def send_slack_notification(message):
@@ -38,12 +65,48 @@ def send_email_notification(subject, message, recipient_list):
     from django.core.mail import send_mail
     send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, recipient_list)
     
-@shared_task
-def record_cpu_usage():
-    usage = psutil.cpu_percent(interval=1)
-    CPUUsage.objects.create(usage=usage)
-    
 @shared_task
 def record_storage_usage():
     for info in get_storage_info():
-        StorageUsage.objects.create(**info)
\ No newline at end of file
+        StorageUsage.objects.create(**info)
+
+@shared_task
+def collect_metrics():
+    # Un seul instantané psutil par tick, écrit en un INSERT groupé par modèle
+    return persist_snapshot(collect_snapshot())
+
+@shared_task
+def compact_metric_rollups():
+    # Incrémental : seuls les intervalles clos depuis le dernier passage sont calculés
+    return compact_all()
+
+@shared_task
+def apply_retention_policies():
+    # Rapport par modèle : lignes supprimées et durée
+    return apply_retention()
+
+@shared_task
+def maintain_metric_partitions():
+    # Mois à venir créés et mois expirés supprimés (tables partitionnées sous PostgreSQL)
+    return maintain_partitions(timezone.now())
+
+@shared_task
+def pack_metric_chunks():
+    # Une fenêtre d'une heure par série, encodée en un seul bloc binaire
+    return {metric: pack_chunks(metric) for metric in SOURCES}
+
+@shared_task
+def record_process_history():
+    # Top-N des processus par CPU et par RSS depuis l'exécution précédente
+    sample = record_sample(process_history_sampler)
+    return len(sample.names) if sample is not None else 0
+
+@shared_task
+def detect_process_events():
+    # Diff de la table des processus avec celle du passage précédent
+    events = process_event_detector.detect()
+    if not events:
+        return 0
+    instances = persist_events(events)
+    publish_events(instances)
+    return len(instances)
@@ -1,9 +1,11 @@
 # api/tests.py
 import asyncio
+import collections
+import contextlib
 import json
 from unittest import mock
 from unittest.mock import Mock, patch, MagicMock
-from datetime import datetime, timezone as dt_timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
 
 import pytest
 from django.urls import reverse
@@ -19,11 +21,70 @@ from hyperion.asgi import application
 from . import models as m
 from . import tasks as t
 from . import utils as u
+from .commands import CommandResult
 from .views import LoginAPIView, ProcessViewSet, ServiceViewSet, NetworkViewSet
 from .consumers import ProcessConsumer, ServiceConsumer, NetworkConsumer
 
 User = get_user_model()
 
+CPUTimes = collections.namedtuple('scputimes', 'user nice system idle iowait steal guest')
+
+
+class FakeRunner:
+    """Command runner recording each call instead of running it"""
+
+    def __init__(self, returncode=0, stdout='', failing=()):
+        self.calls = []
+        self.returncode = returncode
+        self.stdout = stdout
+        self.failing = failing
+
+    def __call__(self, args, input=None):
+        self.calls.append((args, input))
+        returncode = 1 if any(flag in args for flag in self.failing) else self.returncode
+        return CommandResult(args, returncode, self.stdout, '', 0.0, False)
+
+
+class FakeRedis:
+    """GETSET/EXPIRE pipeline over a dict, enough for SamplerState"""
+
+    def __init__(self):
+        self.store = {}
+
+    def pipeline(self):
+        commands = []
+        store = self.store
+
+        class Pipeline:
+            def getset(self, key, value):
+                def run():
+                    previous = store.get(key)
+                    store[key] = value
+                    return previous
+                commands.append(run)
+
+            def expire(self, key, seconds):
+                commands.append(lambda: True)
+
+            def execute(self):
+                return [command() for command in commands]
+
+        return Pipeline()
+
+    def delete(self, key):
+        self.store.pop(key, None)
+
+
+def cpu_times(**modes):
+    """cpu_times d'un cœur, modes absents à zéro"""
+    return CPUTimes(**{mode: float(modes.get(mode, 0)) for mode in CPUTimes._fields})
+
+
+def prime_cpu_sampler(cores=1):
+    """Relevé précédent à zéro : le prochain échantillon couvre tout depuis le boot"""
+    from .cpu_sampler import cpu_sampler
+    cpu_sampler.state.swap(cpu_sampler.cache_key, [{}] * cores, cpu_sampler.timeout)
+
 # ------------------------------
 # Fixtures
 # ------------------------------
@@ -327,10 +388,11 @@ class APIViewTests(APITestCase):
 class CeleryTaskTests(TestCase):
     """Tests pour les tâches Celery"""
 
-    @patch('api.tasks.psutil.cpu_percent')
-    def test_record_cpu_usage_task(self, mock_cpu_percent):
+    @patch('api.cpu_sampler.psutil.cpu_times')
+    def test_record_cpu_usage_task(self, mock_cpu_times):
         """Test de la tâche d'enregistrement de l'usage CPU"""
-        mock_cpu_percent.return_value = 75.5
+        mock_cpu_times.return_value = [cpu_times(user=60, system=15.5, idle=24.5)]
+        prime_cpu_sampler()
         
         # Exécuter la tâche
         t.record_cpu_usage()
@@ -339,7 +401,7 @@ class CeleryTaskTests(TestCase):
         cpu_usage = m.CPUUsage.objects.first()
         self.assertIsNotNone(cpu_usage)
         self.assertEqual(cpu_usage.usage, 75.5)
-        mock_cpu_percent.assert_called_once_with(interval=1)
+        mock_cpu_times.assert_called_once_with(percpu=True)
 
     @patch('api.tasks.psutil.virtual_memory')
     def test_record_memory_usage_task(self, mock_virtual_memory):
@@ -359,7 +421,7 @@ class CeleryTaskTests(TestCase):
     @patch('api.tasks.psutil.net_io_counters')
     def test_record_network_usage_task(self, mock_net_io):
         """Test de la tâche d'enregistrement de l'usage réseau"""
-        mock_stats = Mock()
+        mock_stats = Mock(spec=['bytes_recv', 'bytes_sent'])
         mock_stats.bytes_recv = 1024000
         mock_stats.bytes_sent = 512000
         mock_net_io.return_value = {'eth0': mock_stats}
@@ -441,18 +503,18 @@ class CeleryTaskTests(TestCase):
 class UtilsTests(TestCase):
     """Tests pour les fonctions utilitaires"""
 
-    @patch('api.utils.psutil.process_iter')
-    def test_get_processes(self, mock_process_iter):
+    @patch('api.utils.psutil.Process')
+    @patch('api.utils.psutil.pids')
+    def test_get_processes(self, mock_pids, mock_process_class):
         """Test de la fonction get_processes"""
-        mock_proc = Mock()
-        mock_proc.info = {
-            'pid': 1234,
-            'name': 'test_process',
-            'status': 'running'
-        }
+        mock_proc = MagicMock()
+        mock_proc.name.return_value = 'test_process'
+        mock_proc.create_time.return_value = 100.0
+        mock_proc.status.return_value = 'running'
         mock_proc.cpu_percent.return_value = 5.0
         mock_proc.memory_percent.return_value = 10.0
-        mock_process_iter.return_value = [mock_proc]
+        mock_pids.return_value = [1234]
+        mock_process_class.return_value = mock_proc
         
         processes = u.get_processes()
         
@@ -481,38 +543,37 @@ class UtilsTests(TestCase):
         
         self.assertFalse(result)
 
-    @patch('api.utils.subprocess.check_output')
-    def test_get_services(self, mock_check_output):
+    @patch('api.utils.run_command')
+    def test_get_services(self, mock_run):
         """Test de la fonction get_services"""
-        mock_output = b"""  nginx.service    loaded active running   A high performance web server
-  apache2.service  loaded failed failed    The Apache HTTP Server
+        mock_output = """nginx.service    loaded active running   A high performance web server
+apache2.service  loaded failed failed    The Apache HTTP Server
 """
-        mock_check_output.return_value = mock_output
+        mock_run.side_effect = lambda args: CommandResult(
+            args, 0, mock_output if args[1] == 'list-units' else '', '', 0.0, False
+        )
         
         services = u.get_services()
         
         self.assertIsInstance(services, list)
         # Le test dépend de la logique de parsing dans get_services
 
-    @patch('api.utils.subprocess.check_call')
-    def test_block_ip_success(self, mock_check_call):
+    def test_block_ip_success(self):
         """Test blocage d'IP réussi"""
-        result = u.block_ip('192.168.1.100')
+        runner = FakeRunner()
+        with patch.object(u.ip_blocklist, 'runner', runner):
+            result = u.block_ip('192.168.1.100')
         
         self.assertTrue(result)
-        mock_check_call.assert_called_once_with([
-            'sudo', 'iptables',
-            '-A', 'INPUT',
-            '-s', '192.168.1.100',
-            '-j', 'DROP'
-        ])
-
-    @patch('api.utils.subprocess.check_call')
-    def test_block_ip_failure(self, mock_check_call):
+        self.assertEqual(runner.calls[-1], (
+            ['sudo', 'ipset', '-exist', 'restore'],
+            b'add hyperion-blocklist 192.168.1.100/32\n'
+        ))
+
+    def test_block_ip_failure(self):
         """Test blocage d'IP échoué"""
-        mock_check_call.side_effect = subprocess.CalledProcessError(1, 'iptables')
-        
-        result = u.block_ip('192.168.1.100')
+        with patch.object(u.ip_blocklist, 'runner', FakeRunner(returncode=1)):
+            result = u.block_ip('192.168.1.100')
         
         self.assertFalse(result)
 
@@ -550,10 +611,10 @@ class UtilsTests(TestCase):
 class WebSocketTests:
     """Tests pour les WebSocket consumers"""
 
-    @patch('api.utils.get_processes')
-    async def test_process_consumer(self, mock_get_processes):
+    @patch('api.process_snapshot.snapshot_engine.sampler')
+    async def test_process_consumer(self, mock_sampler):
         """Test du consumer de processus"""
-        mock_get_processes.return_value = [
+        mock_sampler.return_value = [
             {'pid': 1234, 'name': 'test', 'status': 'running'}
         ]
         
@@ -561,9 +622,10 @@ class WebSocketTests:
         connected, _ = await communicator.connect()
         assert connected
         
-        # Test réception de données
+        # Test réception de l'instantané complet
         response = await communicator.receive_json_from()
-        assert isinstance(response, list)
+        assert response['type'] == 'process_snapshot'
+        assert isinstance(response['processes'], list)
         
         # Test action stop
         await communicator.send_json_to({
@@ -873,11 +935,11 @@ class ErrorHandlingTests(TestCase):
 
     def test_invalid_ip_blocking(self):
         """Test blocage IP invalide"""
-        with patch('api.utils.subprocess.check_call') as mock_call:
-            mock_call.side_effect = subprocess.CalledProcessError(1, 'iptables')
-            
+        runner = FakeRunner()
+        with patch.object(u.ip_blocklist, 'runner', runner):
             result = u.block_ip('invalid.ip.address')
             self.assertFalse(result)
+            self.assertEqual(runner.calls, [])
 
     def test_storage_info_access_denied(self):
         """Test accès refusé aux informations de stockage"""
@@ -890,7 +952,7 @@ class ErrorHandlingTests(TestCase):
 
     def test_celery_task_failure_handling(self):
         """Test gestion d'échec des tâches Celery"""
-        with patch('api.tasks.psutil.cpu_percent') as mock_cpu:
+        with patch('api.cpu_sampler.psutil.cpu_times') as mock_cpu:
             mock_cpu.side_effect = Exception("CPU monitoring error")
             
             # La tâche ne devrait pas planter l'application
@@ -968,8 +1030,9 @@ class ConfigurationTests(TestCase):
     def test_celery_eager_mode(self):
         """Test mode eager Celery pour les tests"""
         # En mode eager, les tâches s'exécutent de façon synchrone
-        with patch('api.tasks.psutil.cpu_percent') as mock_cpu:
-            mock_cpu.return_value = 50.0
+        with patch('api.cpu_sampler.psutil.cpu_times') as mock_cpu:
+            mock_cpu.return_value = [cpu_times(user=50, idle=50)]
+            prime_cpu_sampler()
             
             result = t.record_cpu_usage()
             
@@ -1010,16 +1073,35 @@ def test_models_creation_basic(db, user):
 # Utils tests
 # ------------------------------
 
-@mock.patch('api.utils.psutil.process_iter')
-def test_get_processes(mock_iter):
-    class Proc:
-        def __init__(self, pid, name, status):
-            self.info = {'pid': pid, 'name': name, 'status': status}
-        def cpu_percent(self):
-            return 5.0
-        def memory_percent(self):
-            return 1.0
-    mock_iter.return_value = [Proc(1, 'a', 'running'), Proc(2, 'b', 'sleeping')]
+class FakeProc:
+    """Handle psutil minimal pour les tests du registre de processus"""
+    def __init__(self, pid, name, status, create_time=100.0, cpu=5.0):
+        self.pid, self._name, self._status = pid, name, status
+        self._create_time, self._cpu = create_time, cpu
+        self.running = True
+    def oneshot(self):
+        return contextlib.nullcontext()
+    def is_running(self):
+        return self.running
+    def create_time(self):
+        return self._create_time
+    def name(self):
+        return self._name
+    def username(self):
+        return 'root'
+    def cmdline(self):
+        return [self._name]
+    def status(self):
+        return self._status
+    def cpu_percent(self, interval=None):
+        return self._cpu
+    def memory_percent(self):
+        return 1.0
+
+@mock.patch('api.utils.psutil.pids', return_value=[1, 2])
+@mock.patch('api.utils.psutil.Process')
+def test_get_processes(mock_process_class, mock_pids):
+    mock_process_class.side_effect = lambda pid: FakeProc(pid, 'a' if pid == 1 else 'b', 'running')
     procs = u.get_processes()
     assert isinstance(procs, list) and len(procs) == 2
     assert all('cpu_percent' in p for p in procs)
@@ -1030,17 +1112,19 @@ def test_stop_process(mock_proc):
     mock_proc.side_effect = __import__('psutil').NoSuchProcess(999)
     assert u.stop_process(999) is False
 
-@mock.patch('api.utils.subprocess.check_output')
-def test_get_services_systemctl(mock_out):
-    sample = 'UNIT \nnginx.service loaded running \nsshd.service loaded exited \n  \n  \n  \n  \n  \n'
-    mock_out.return_value = sample.encode()
+@mock.patch('api.utils.run_command')
+def test_get_services_systemctl(mock_run):
+    sample = 'nginx.service loaded active running Web server\n● ghost.service not-found inactive dead ghost\n'
+    mock_run.side_effect = lambda args: CommandResult(args, 0 if args[1] == 'list-units' else 1, sample, '', 0.0, False)
     services = u.get_services()
-    assert {'name': 'nginx', 'status': 'running'} in services
+    # systemctl show en échec : état tel que listé
+    assert {'name': 'nginx', 'status': 'active', 'sub_state': 'running'}.items() <= services[0].items()
+    assert services[1]['name'] == 'ghost'
 
-@mock.patch('api.utils.subprocess.check_call')
-def test_block_ip(mock_call):
+def test_block_ip(monkeypatch):
+    monkeypatch.setattr(u.ip_blocklist, 'runner', FakeRunner())
     assert u.block_ip('1.2.3.4') is True
-    mock_call.side_effect = __import__('subprocess').CalledProcessError(1, 'cmd')
+    monkeypatch.setattr(u.ip_blocklist, 'runner', FakeRunner(returncode=1))
     assert u.block_ip('1.2.3.4') is False
 
 @mock.patch('api.utils.psutil.disk_partitions')
@@ -1057,10 +1141,14 @@ def test_get_storage_info(mock_usage, mock_parts):
 # Tasks tests
 # ------------------------------
 
-@mock.patch('api.tasks.psutil.cpu_percent', return_value=12.0)
+@mock.patch('api.cpu_sampler.psutil.cpu_times', return_value=[cpu_times(user=12, idle=88)])
 def test_task_record_cpu_usage(mock_cpu, db):
+    # Premier relevé : référence seulement, aucune ligne
     t.record_cpu_usage()
-    assert m.CPUUsage.objects.count() == 1
+    assert m.CPUUsage.objects.count() == 0
+    mock_cpu.return_value = [cpu_times(user=24, idle=176)]
+    t.record_cpu_usage()
+    assert m.CPUUsage.objects.get().usage == 12.0
 
 @mock.patch('api.tasks.psutil.virtual_memory')
 def test_task_record_memory_usage(mock_vm, db):
@@ -1215,6 +1303,20 @@ def test_role_management_permission_denied_then_granted(mock_log, client, user):
     r = client.get('/api/roles/')
     assert r.status_code == 200
 
+@mock.patch('api.decorators.AuditLog.objects.create')
+@pytest.mark.django_db
+def test_permission_denied_audit_uses_forwarded_client_ip(mock_log, user):
+    from django.core.exceptions import PermissionDenied
+    from django.test import RequestFactory
+    from api.decorators import require_permission
+
+    view = require_permission('manage_roles')(lambda request: None)
+    request = RequestFactory().get('/api/roles/', HTTP_X_FORWARDED_FOR='203.0.113.7, 10.0.0.1')
+    request.user = user
+    with pytest.raises(PermissionDenied):
+        view(request)
+    assert mock_log.call_args.kwargs['ip_address'] == '203.0.113.7'
+
 # ------------------------------
 # WebSocket consumers tests
 # ------------------------------
@@ -1222,21 +1324,52 @@ def test_role_management_permission_denied_then_granted(mock_log, client, user):
 @pytest.mark.asyncio
 @pytest.mark.django_db(transaction=True)
 async def test_process_consumer(monkeypatch):
-    monkeypatch.setattr('api.consumers.get_processes', lambda: [{'pid':1,'name':'a','cpu_percent':0.1,'memory_percent':0.2,'status':'running'}])
+    monkeypatch.setattr('api.process_snapshot.snapshot_engine.sampler', lambda: [{'pid':1,'name':'a','cpu_percent':0.1,'memory_percent':0.2,'status':'running'}])
     comm = WebsocketCommunicator(application, '/ws/processes/')
     connected, _ = await comm.connect()
     assert connected
-    # Receive first periodic push
+    # Receive first periodic push: full snapshot
     msg = await comm.receive_from()
     data = json.loads(msg)
-    assert isinstance(data, list) and data[0]['pid'] == 1
+    assert data['type'] == 'process_snapshot' and data['seq'] == 1
+    assert data['processes'][0]['pid'] == 1
+    await comm.disconnect()
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_process_consumer_sends_deltas_and_resync(monkeypatch):
+    from .process_snapshot import snapshot_engine
+    table = [
+        {'pid': 1, 'name': 'a', 'cpu_percent': 1.0, 'memory_percent': 0.2, 'status': 'running'},
+        {'pid': 2, 'name': 'b', 'cpu_percent': 0.0, 'memory_percent': 0.1, 'status': 'sleeping'},
+    ]
+    monkeypatch.setattr(snapshot_engine, 'sampler', lambda: [dict(p) for p in table])
+    comm = WebsocketCommunicator(application, '/ws/processes/')
+    await comm.connect()
+    first = await comm.receive_json_from()
+    assert first['type'] == 'process_snapshot' and len(first['processes']) == 2
+
+    table[0]['cpu_percent'] = 42.0
+    table[1:] = [{'pid': 3, 'name': 'c', 'cpu_percent': 0.0, 'memory_percent': 0.1, 'status': 'running'}]
+    snapshot_engine.reset()
+    delta = await comm.receive_json_from(timeout=3)
+    assert delta['type'] == 'process_delta' and delta['seq'] == 2
+    assert delta['changed'] == [{'pid': 1, 'cpu_percent': 42.0}]
+    assert delta['removed'] == [2]
+    assert [row['pid'] for row in delta['added']] == [3]
+
+    await comm.send_json_to({'action': 'resync'})
+    resync = await comm.receive_json_from()
+    assert resync['type'] == 'process_snapshot' and resync['seq'] == 3
     await comm.disconnect()
 
 @pytest.mark.asyncio
 @pytest.mark.django_db(transaction=True)
 async def test_service_consumer_actions(monkeypatch):
     monkeypatch.setattr('api.consumers.get_services', lambda: [{'name':'svc','status':'active'}])
-    monkeypatch.setattr('api.consumers.start_service', lambda s: True)
+    async def started(service):
+        return True
+    monkeypatch.setattr('api.consumers.start_service_async', started)
     comm = WebsocketCommunicator(application, '/ws/services/')
     ok, _ = await comm.connect()
     assert ok
@@ -1252,7 +1385,9 @@ async def test_service_consumer_actions(monkeypatch):
 async def test_network_consumer_block_ip(monkeypatch, db):
     # Create some data so status payload isn't empty
     m.NetworkUsage.objects.create(interface='en0', received=1, sent=2)
-    monkeypatch.setattr('api.consumers.block_ip', lambda ip: True)
+    async def blocked(ip):
+        return True
+    monkeypatch.setattr('api.consumers.block_ip_async', blocked)
     comm = WebsocketCommunicator(application, '/ws/networks/')
     ok, _ = await comm.connect()
     assert ok
@@ -1337,3 +1472,1702 @@ def test_logout_view_redirect(client, user):
     resp = client.get('/auth/logout/')
     assert resp.status_code in (302, 303)
     assert '/auth/login/' in resp.url or '/login' in resp.url
+
+# ------------------------------
+# Diffusion partagée des métriques (broadcast)
+# ------------------------------
+
+@pytest.mark.asyncio
+async def test_metric_broadcaster_fetches_once_per_tick():
+    from channels.layers import InMemoryChannelLayer
+    from .broadcast import MetricBroadcaster
+
+    calls = []
+    def fetch():
+        calls.append(1)
+        return {'type': 'cpu_usage', 'data': [{'usage': 1.0}]}
+
+    layer = InMemoryChannelLayer()
+    broadcaster = MetricBroadcaster('test', fetch, interval=3600)
+    channels = [await layer.new_channel() for _ in range(50)]
+    for name in channels:
+        await broadcaster.subscribe(layer, name)
+    await asyncio.sleep(0.05)
+    await broadcaster.tick(layer)
+
+    # 50 abonnés, 2 ticks (démarrage + tick manuel) -> 2 requêtes seulement
+    assert len(calls) == broadcaster.ticks == 2
+    for name in channels:
+        for _ in range(2):
+            msg = await layer.receive(name)
+            assert msg['type'] == 'metric.update'
+            assert json.loads(msg['text'])['type'] == 'cpu_usage'
+
+    for name in channels:
+        await broadcaster.unsubscribe(layer, name)
+    assert broadcaster.subscribers == 0
+
+
+@pytest.mark.asyncio
+async def test_metric_broadcaster_survives_a_failing_fetch():
+    from channels.layers import InMemoryChannelLayer
+    from .broadcast import MetricBroadcaster
+
+    results = iter([RuntimeError('database is down'), {'type': 'cpu_usage', 'data': []}])
+
+    def fetch():
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    layer = InMemoryChannelLayer()
+    broadcaster = MetricBroadcaster('test', fetch, interval=0.01)
+    channel = await layer.new_channel()
+    await broadcaster.subscribe(layer, channel)
+    # Le premier tick échoue, le producteur continue et le suivant est diffusé
+    msg = await asyncio.wait_for(layer.receive(channel), 2)
+    assert json.loads(msg['text'])['type'] == 'cpu_usage'
+    await broadcaster.unsubscribe(layer, channel)
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_cpu_consumers_share_broadcaster(monkeypatch):
+    from .broadcast import cpu_broadcaster
+
+    calls = []
+    def fetch():
+        calls.append(1)
+        return {'type': 'cpu_usage', 'data': [{'recorded_at': 'now', 'usage': 10.0}]}
+    monkeypatch.setattr(cpu_broadcaster, 'fetch', fetch)
+    monkeypatch.setattr(cpu_broadcaster, 'interval', 3600)
+    monkeypatch.setattr(cpu_broadcaster, 'last_text', None)
+
+    comms = [WebsocketCommunicator(application, '/ws/cpu/') for _ in range(3)]
+    for comm in comms:
+        connected, _ = await comm.connect()
+        assert connected
+    for comm in comms:
+        msg = json.loads(await comm.receive_from())
+        assert msg['type'] == 'cpu_usage' and msg['data']
+    assert len(calls) == 1
+    for comm in comms:
+        await comm.disconnect()
+    assert cpu_broadcaster.subscribers == 0
+
+# ------------------------------
+# Instantané partagé des processus
+# ------------------------------
+
+def test_process_snapshot_single_flight():
+    import threading
+    import time as _time
+    from .process_snapshot import ProcessSnapshotEngine
+
+    def slow_sampler():
+        _time.sleep(0.05)
+        return [{'pid': 1, 'name': 'a', 'status': 'running', 'cpu_percent': 0.0, 'memory_percent': 0.0}]
+
+    engine = ProcessSnapshotEngine(sampler=slow_sampler, interval=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(engine.get_snapshot())) for _ in range(20)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+    # 20 lecteurs concurrents -> un seul parcours de la table des processus
+    assert engine.samples == 1
+    assert {snap.generation for snap in results} == {1}
+
+def test_process_snapshot_refreshes_when_stale():
+    from .process_snapshot import ProcessSnapshotEngine
+    engine = ProcessSnapshotEngine(sampler=list, interval=60)
+    first = engine.get_snapshot()
+    assert engine.get_snapshot() is first
+    second = engine.get_snapshot(max_age=0)
+    assert second.generation == first.generation + 1
+
+@mock.patch('api.utils.snapshot_engine.sampler')
+def test_get_processes_reads_shared_snapshot(mock_sampler):
+    mock_sampler.return_value = [
+        {'pid': 1, 'name': 'a', 'status': 'running', 'cpu_percent': 1.0, 'memory_percent': 0.1},
+        {'pid': 2, 'name': 'b', 'status': 'running', 'cpu_percent': 9.0, 'memory_percent': 0.1},
+    ]
+    assert [p['pid'] for p in u.get_processes()] == [2, 1]
+    assert [p['pid'] for p in u.get_processes()] == [2, 1]
+    mock_sampler.assert_called_once()
+
+def test_process_registry_reuses_handles_and_evicts():
+    from .process_snapshot import ProcessRegistry
+    handles = {}
+    def make(pid):
+        handles[pid] = FakeProc(pid, f'p{pid}', 'running', create_time=float(len(handles)))
+        return handles[pid]
+
+    registry = ProcessRegistry()
+    with mock.patch('api.process_snapshot.psutil.Process', side_effect=make) as mock_process_class, \
+            mock.patch('api.process_snapshot.psutil.pids', return_value=[1, 2]) as mock_pids:
+        registry.sample()
+        registry.sample()
+        # Handles réutilisés d'un tick à l'autre
+        assert mock_process_class.call_count == 2
+
+        # Le pid 2 est réutilisé (nouveau create_time), le pid 1 disparaît
+        handles[2].running = False
+        mock_pids.return_value = [2]
+        rows = registry.sample()
+        assert mock_process_class.call_count == 3
+        assert len(registry) == 1
+        assert rows[0]['pid'] == 2 and rows[0]['create_time'] == 2.0
+
+def test_process_registry_keeps_row_when_fields_are_denied():
+    from .process_snapshot import ProcessRegistry
+
+    class DeniedProc(FakeProc):
+        def memory_percent(self):
+            raise psutil.AccessDenied(self.pid)
+
+    registry = ProcessRegistry()
+    with mock.patch('api.process_snapshot.psutil.Process', side_effect=lambda pid: DeniedProc(pid, 'sshd', 'sleeping')), \
+            mock.patch('api.process_snapshot.psutil.pids', return_value=[7]):
+        rows = registry.sample()
+    assert rows == [{
+        'pid': 7, 'name': 'sshd', 'username': 'root', 'cmdline': 'sshd', 'create_time': 100.0,
+        'status': 'sleeping', 'cpu_percent': 5.0, 'memory_percent': 0.0,
+    }]
+
+def test_process_stream_shares_deltas_between_subscribers():
+    from .process_snapshot import ProcessStream, Snapshot
+    stream = ProcessStream()
+    before = Snapshot(1, 0.0, [{'pid': 1, 'name': 'a', 'status': 'running', 'cpu_percent': 1.04, 'memory_percent': 0.0}])
+    after = Snapshot(2, 1.0, [{'pid': 1, 'name': 'a', 'status': 'running', 'cpu_percent': 1.01, 'memory_percent': 0.0}])
+    first = stream.delta(1, stream.view(before), 2, stream.view(after))
+    # Variation sous la précision d'affichage : aucun changement transmis
+    assert first == {'added': [], 'removed': [], 'changed': []}
+    assert stream.delta(1, stream.view(before), 2, stream.view(after)) is first
+
+def test_process_subscription_filters_and_keeps_top_n():
+    from .process_snapshot import ProcessSubscription
+    rows = [
+        {'pid': 1, 'name': 'python3', 'username': 'alice', 'cpu_percent': 10.0, 'memory_percent': 1.0},
+        {'pid': 2, 'name': 'python3', 'username': 'bob', 'cpu_percent': 50.0, 'memory_percent': 2.0},
+        {'pid': 3, 'name': 'PYTHON', 'username': 'alice', 'cpu_percent': 30.0, 'memory_percent': 9.0},
+        {'pid': 4, 'name': 'nginx', 'username': 'www', 'cpu_percent': 90.0, 'memory_percent': 5.0},
+    ]
+    sub = ProcessSubscription.from_message({'name': '^py', 'sort': 'cpu', 'limit': 2})
+    assert [r['pid'] for r in sub.select(rows)] == [2, 3]
+    sub = ProcessSubscription.from_message({'user': 'alice', 'min_memory': 5, 'sort': 'memory'})
+    assert [r['pid'] for r in sub.select(rows)] == [3]
+    sub = ProcessSubscription.from_message({'sort': 'name', 'limit': 1})
+    assert [r['pid'] for r in sub.select(rows)] == [4]
+
+@pytest.mark.parametrize('message', [
+    {'name': '('}, {'sort': 'pid'}, {'limit': 0}, {'limit': 'abc'}, {'user': 'x' * 500},
+])
+def test_process_subscription_rejects_invalid_messages(message):
+    from .process_snapshot import ProcessSubscription
+    with pytest.raises(ValueError):
+        ProcessSubscription.from_message(message)
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_process_consumer_subscription(monkeypatch):
+    monkeypatch.setattr('api.process_snapshot.snapshot_engine.sampler', lambda: [
+        {'pid': 1, 'name': 'a', 'cpu_percent': 5.0, 'memory_percent': 0.2, 'status': 'running'},
+        {'pid': 2, 'name': 'b', 'cpu_percent': 9.0, 'memory_percent': 0.1, 'status': 'running'},
+        {'pid': 3, 'name': 'c', 'cpu_percent': 1.0, 'memory_percent': 0.1, 'status': 'running'},
+    ])
+    comm = WebsocketCommunicator(application, '/ws/processes/')
+    await comm.connect()
+    await comm.receive_json_from()
+
+    await comm.send_json_to({'action': 'subscribe', 'sort': 'cpu', 'limit': 2})
+    msg = await comm.receive_json_from()
+    assert msg['type'] == 'process_snapshot'
+    assert [row['pid'] for row in msg['processes']] == [2, 1]
+
+    await comm.send_json_to({'action': 'subscribe', 'name': '['})
+    error = await comm.receive_json_from()
+    assert error['type'] == 'error' and error['action'] == 'subscribe'
+    await comm.disconnect()
+
+@mock.patch('api.utils.snapshot_engine.sampler')
+@pytest.mark.django_db
+def test_process_list_api_applies_subscription_params(mock_sampler, user):
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    mock_sampler.return_value = [
+        {'pid': 1, 'name': 'a', 'status': 'running', 'cpu_percent': 5.0, 'memory_percent': 0.2},
+        {'pid': 2, 'name': 'b', 'status': 'running', 'cpu_percent': 9.0, 'memory_percent': 0.1},
+    ]
+    view = ProcessViewSet.as_view({'get': 'list'})
+    request = APIRequestFactory().get('/api/processes/', {'sort': 'memory', 'limit': 1})
+    force_authenticate(request, user=user)
+    resp = view(request)
+    assert resp.status_code == 200
+    assert [p['pid'] for p in resp.data] == [1]
+
+    request = APIRequestFactory().get('/api/processes/', {'sort': 'bogus'})
+    force_authenticate(request, user=user)
+    assert view(request).status_code == 400
+
+# ------------------------------
+# WebSocket multiplexé du dashboard
+# ------------------------------
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_dashboard_consumer_multiplexes_streams(monkeypatch):
+    from .broadcast import cpu_broadcaster
+    monkeypatch.setattr('api.process_snapshot.snapshot_engine.sampler', lambda: [
+        {'pid': 1, 'name': 'a', 'cpu_percent': 5.0, 'memory_percent': 0.2, 'status': 'running'},
+        {'pid': 2, 'name': 'b', 'cpu_percent': 9.0, 'memory_percent': 0.1, 'status': 'running'},
+    ])
+    monkeypatch.setattr('api.consumers.get_services', lambda: [{'name': 'svc', 'status': 'active'}])
+    monkeypatch.setattr(cpu_broadcaster, 'fetch', lambda: {'type': 'cpu_usage', 'data': [{'usage': 3.0}]})
+    monkeypatch.setattr(cpu_broadcaster, 'interval', 3600)
+    monkeypatch.setattr(cpu_broadcaster, 'last_text', None)
+
+    comm = WebsocketCommunicator(application, '/ws/dashboard/')
+    connected, _ = await comm.connect()
+    assert connected
+    await comm.send_json_to({'action': 'subscribe', 'stream': 'processes', 'limit': 1})
+    await comm.send_json_to({'action': 'subscribe', 'stream': 'services', 'interval': 60})
+    await comm.send_json_to({'action': 'subscribe', 'stream': 'cpu'})
+
+    received = {}
+    while len(received) < 3:
+        msg = await comm.receive_json_from(timeout=3)
+        received[msg['stream']] = msg['data']
+    assert received['processes']['type'] == 'process_snapshot'
+    assert [row['pid'] for row in received['processes']['processes']] == [2]
+    assert received['services'] == [{'name': 'svc', 'status': 'active'}]
+    assert received['cpu']['type'] == 'cpu_usage'
+
+    await comm.send_json_to({'action': 'unsubscribe', 'stream': 'cpu'})
+    await comm.send_json_to({'action': 'subscribe', 'stream': 'bogus'})
+    error = await comm.receive_json_from()
+    assert error['type'] == 'error'
+    await comm.disconnect()
+    assert cpu_broadcaster.subscribers == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_dashboard_failing_stream_does_not_stop_the_others(monkeypatch):
+    monkeypatch.setattr('api.consumers.get_system_temperatures', lambda: [{'sensor': 'cpu', 'current': 50.0}])
+    monkeypatch.setattr('api.consumers.get_storage_info', mock.Mock(side_effect=PermissionError('/mnt/secret')))
+    comm = WebsocketCommunicator(application, '/ws/dashboard/')
+    await comm.connect()
+    await comm.send_json_to({'action': 'subscribe', 'stream': 'temperature', 'interval': 0.1})
+    await comm.send_json_to({'action': 'subscribe', 'stream': 'storage', 'interval': 0.1})
+
+    errors, temperatures = [], 0
+    while temperatures < 3:
+        msg = await comm.receive_json_from(timeout=3)
+        if 'error' in msg:
+            errors.append(msg)
+        elif msg['stream'] == 'temperature':
+            temperatures += 1
+    assert errors and errors[0] == {'stream': 'storage', 'error': '/mnt/secret'}
+    await comm.disconnect()
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_dashboard_consumer_routes_actions(monkeypatch):
+    async def restarted(service):
+        return True
+    monkeypatch.setattr('api.consumers.restart_service_async', restarted)
+    comm = WebsocketCommunicator(application, '/ws/dashboard/')
+    await comm.connect()
+    await comm.send_json_to({'stream': 'services', 'action': 'restart', 'service': 'nginx'})
+    msg = await comm.receive_json_from()
+    assert msg == {'stream': 'services', 'data': {'status': 'success', 'action': 'restart', 'service': 'nginx'}}
+    await comm.disconnect()
+
+
+# ------------------------------
+# Tests de l'échantillonneur CPU non bloquant
+# ------------------------------
+
+def test_cpu_sampler_uses_deltas_between_calls():
+    from .cpu_sampler import cpu_sampler
+    first = [cpu_times(user=100, idle=100), cpu_times(user=50, idle=150)]
+    second = [
+        cpu_times(user=190, system=10, idle=100),
+        cpu_times(user=55, idle=230, iowait=10, steal=5),
+    ]
+    with mock.patch('api.cpu_sampler.psutil.cpu_times', side_effect=[first, second]), \
+            mock.patch('api.cpu_sampler.psutil.cpu_percent') as cpu_percent:
+        # Premier appel : aucune référence, pas de moyenne depuis le boot ni d'attente
+        assert cpu_sampler.sample() is None
+        sample = cpu_sampler.sample()
+    cpu_percent.assert_not_called()
+
+    # Cœur 0 : 100 % occupé ; cœur 1 : 10 ticks occupés sur 100
+    assert sample['per_core'] == [100.0, 10.0]
+    assert sample['usage'] == 55.0
+    assert sample['modes']['user'] == 47.5
+    assert sample['modes']['system'] == 5.0
+    assert sample['modes']['iowait'] == 5.0
+    assert sample['modes']['steal'] == 2.5
+
+
+def test_cpu_sampler_handles_counter_reset():
+    from .cpu_sampler import cpu_sampler
+    before = [cpu_times(user=500, idle=500)]
+    after = [cpu_times(user=30, idle=10)]
+    with mock.patch('api.cpu_sampler.psutil.cpu_times', side_effect=[before, after, [cpu_times(user=40, idle=20)]]):
+        cpu_sampler.sample()
+        # Compteurs revenus en arrière : intervalle ignoré, le relevé sert de nouvelle référence
+        assert cpu_sampler.sample() is None
+        sample = cpu_sampler.sample()
+    assert sample['usage'] == 50.0
+
+
+def test_cpu_sampler_continues_across_workers():
+    from .cpu_sampler import CPUSampler
+    from .sampler_state import SamplerState
+    state = SamplerState(prefix='host:')
+    state._redis, state._resolved = FakeRedis(), True
+    first, second = (CPUSampler(cache_key='cpu', state=state) for _ in range(2))
+    readings = [[cpu_times(user=10, idle=90)], [cpu_times(user=60, idle=140)], [cpu_times(user=60, idle=240)]]
+    with mock.patch('api.cpu_sampler.psutil.cpu_times', side_effect=readings):
+        assert first.sample() is None
+        # Le second worker n'a jamais échantillonné : il repart du relevé du premier
+        assert second.sample()['usage'] == 50.0
+        assert first.sample()['usage'] == 0.0
+
+
+@mock.patch('api.cpu_sampler.psutil.cpu_times')
+def test_task_record_cpu_usage_breakdown(mock_cpu, db):
+    mock_cpu.return_value = [
+        cpu_times(user=40, system=10, idle=50),
+        cpu_times(user=10, idle=80, iowait=10),
+    ]
+    prime_cpu_sampler(cores=2)
+    t.record_cpu_usage()
+    usage = m.CPUUsage.objects.get()
+    assert usage.usage == 30.0
+    assert usage.per_core == [50.0, 10.0]
+    assert (usage.user, usage.system, usage.iowait, usage.steal) == (25.0, 5.0, 5.0, 0.0)
+
+
+# ------------------------------
+# Tests de la collecte groupée des métriques
+# ------------------------------
+
+@pytest.fixture
+def psutil_snapshot():
+    counters = type('N', (), {'bytes_recv': 10, 'bytes_sent': 20})
+    with mock.patch('api.cpu_sampler.psutil.cpu_times', return_value=[cpu_times(user=25, idle=75)]), \
+            mock.patch('api.collection.psutil.virtual_memory', return_value=type('M', (), {'percent': 40.0})), \
+            mock.patch('api.collection.psutil.swap_memory', return_value=type('S', (), {'percent': 5.0})), \
+            mock.patch('api.collection.psutil.net_io_counters', return_value={'eth0': counters, 'lo': counters}), \
+            mock.patch('api.disk_sampler.psutil.disk_io_counters', return_value={}), \
+            mock.patch('api.collection.get_storage_info', return_value=[
+                {'device': '/dev/sda1', 'mount_point': '/', 'total': 100, 'used': 60,
+                 'free': 40, 'percent_used': 60.0, 'fs_type': 'ext4'},
+            ]):
+        prime_cpu_sampler()
+        yield
+
+
+def test_collect_metrics_bulk_inserts_one_timestamp(psutil_snapshot, db):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries:
+        counts = t.collect_metrics()
+
+    assert counts == {'CPUUsage': 1, 'MemoryUsage': 1, 'NetworkUsage': 2, 'StorageUsage': 1, 'DiskIOUsage': 0}
+    inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+    assert len(inserts) == 4
+
+    timestamps = set()
+    for model in (m.CPUUsage, m.MemoryUsage, m.NetworkUsage, m.StorageUsage):
+        timestamps.update(model.objects.values_list('recorded_at', flat=True))
+    assert len(timestamps) == 1
+    assert m.MemoryUsage.objects.get().swap == 5.0
+    assert m.CPUUsage.objects.get().usage == 25.0
+
+
+def test_collect_metrics_is_atomic(psutil_snapshot, db):
+    with mock.patch.object(m.StorageUsage.objects, 'bulk_create', side_effect=RuntimeError):
+        with pytest.raises(RuntimeError):
+            t.collect_metrics()
+    assert not m.CPUUsage.objects.exists()
+    assert not m.NetworkUsage.objects.exists()
+
+
+def test_collect_metrics_keeps_other_sources_when_one_fails(psutil_snapshot, db):
+    with mock.patch('api.collection.get_storage_info', side_effect=PermissionError('/mnt/secret')), \
+            mock.patch('api.collection.psutil.swap_memory', side_effect=OSError):
+        counts = t.collect_metrics()
+    assert counts == {'CPUUsage': 1, 'MemoryUsage': 1, 'NetworkUsage': 2, 'StorageUsage': 0, 'DiskIOUsage': 0}
+    assert m.MemoryUsage.objects.get().swap is None
+
+
+def test_storage_info_skips_unreadable_mount_points():
+    partitions = [type('P', (), {'device': d, 'mountpoint': mp, 'fstype': 'ext4'})
+                  for d, mp in (('/dev/sda1', '/'), ('/dev/sdb1', '/mnt/private'))]
+    usage = type('U', (), {'total': 10, 'used': 5, 'free': 5, 'percent': 50.0})
+
+    def disk_usage(path):
+        if path == '/mnt/private':
+            raise PermissionError(path)
+        return usage
+
+    with mock.patch('api.utils.psutil.disk_partitions', return_value=partitions), \
+            mock.patch('api.utils.psutil.disk_usage', side_effect=disk_usage):
+        assert [info['mount_point'] for info in u.get_storage_info()] == ['/']
+
+
+# ------------------------------
+# Tests du démon de collecte haute fréquence
+# ------------------------------
+
+def test_ring_buffer_wraps_around():
+    from .collector import RingBuffer
+    buffer = RingBuffer(3)
+    for second in range(5):
+        buffer.append(float(second), second * 10.0)
+    assert len(buffer) == 3
+    assert buffer.last() == [(2.0, 20.0), (3.0, 30.0), (4.0, 40.0)]
+    assert buffer.last(1) == [(4.0, 40.0)]
+    assert buffer.values_since(3) == [30.0, 40.0]
+    # Échantillons écrasés : seuls ceux encore en mémoire sont rendus
+    assert buffer.values_since(0) == [20.0, 30.0, 40.0]
+
+
+@pytest.fixture
+def collector_psutil():
+    counters = iter([
+        {'eth0': type('N', (), {'bytes_recv': 1000, 'bytes_sent': 100})},
+        {'eth0': type('N', (), {'bytes_recv': 3000, 'bytes_sent': 300})},
+    ])
+    with mock.patch('api.collector.psutil.cpu_percent', side_effect=[10.0, 30.0]), \
+            mock.patch('api.collector.psutil.virtual_memory', return_value=type('M', (), {'percent': 50.0})), \
+            mock.patch('api.collector.psutil.net_io_counters', side_effect=lambda pernic: next(counters)):
+        yield
+
+
+def test_collector_flushes_aggregated_batch(collector_psutil, db):
+    from .collector import MetricCollector
+    collector = MetricCollector(capacity=10)
+    collector.sample(now=100.0)
+    collector.sample(now=102.0)
+
+    payload = collector.live_payload()
+    assert payload['cpu'] == [(100.0, 10.0), (102.0, 30.0)]
+    assert payload['network'] == {'eth0': {'received': 1000.0, 'sent': 100.0}}
+
+    assert collector.flush() == {'CPUUsage': 1, 'MemoryUsage': 1, 'NetworkUsage': 1}
+    assert m.CPUUsage.objects.get().usage == 20.0
+    assert m.NetworkUsage.objects.get().received == 3000
+    # Rien de nouveau depuis la dernière écriture
+    assert collector.flush() == {}
+
+
+def test_hyperion_collector_command(db):
+    from django.core.management import call_command
+    counters = {'lo': type('N', (), {'bytes_recv': 1, 'bytes_sent': 1})}
+    with mock.patch('api.collector.psutil.cpu_percent', return_value=5.0), \
+            mock.patch('api.collector.psutil.virtual_memory', return_value=type('M', (), {'percent': 50.0})), \
+            mock.patch('api.collector.psutil.net_io_counters', return_value=counters):
+        call_command('hyperion_collector', '--interval', '0.01', '--flush-interval', '60', '--samples', '3')
+    assert m.CPUUsage.objects.count() == 1
+    assert m.MemoryUsage.objects.count() == 1
+
+
+def test_collector_survives_publish_and_flush_failures(db):
+    from django.db import DatabaseError, transaction
+    from .collector import MetricCollector
+    real_atomic, attempts = transaction.atomic, []
+
+    def flaky_atomic(*args, **kwargs):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise DatabaseError('database unavailable')
+        return real_atomic(*args, **kwargs)
+
+    counters = {'lo': type('N', (), {'bytes_recv': 1, 'bytes_sent': 1})}
+    collector = MetricCollector(interval=0, flush_interval=0, capacity=10)
+    with mock.patch('api.collector.psutil.cpu_percent', side_effect=[0.0, 10.0, 30.0]), \
+            mock.patch('api.collector.psutil.virtual_memory', return_value=type('M', (), {'percent': 50.0})), \
+            mock.patch('api.collector.psutil.net_io_counters', return_value=counters), \
+            mock.patch.object(collector, 'publish', side_effect=RuntimeError('channel layer down')), \
+            mock.patch('api.collector.transaction.atomic', side_effect=flaky_atomic):
+        collector.run(samples=2)
+    # Premier flush en échec : ses échantillons sont écrits avec ceux du suivant
+    assert m.CPUUsage.objects.get().usage == 20.0
+    assert collector.flushes == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_dashboard_live_stream_reads_collector_buffers(collector_psutil):
+    from asgiref.sync import sync_to_async
+    from .collector import MetricCollector
+    collector = MetricCollector(capacity=10)
+    collector.sample(now=100.0)
+
+    comm = WebsocketCommunicator(application, '/ws/dashboard/')
+    await comm.connect()
+    await comm.send_json_to({'action': 'subscribe', 'stream': 'live'})
+    await asyncio.sleep(0.05)
+    await sync_to_async(collector.publish)()
+    msg = await comm.receive_json_from(timeout=3)
+    assert msg['stream'] == 'live'
+    assert msg['data']['type'] == 'live_metrics'
+    assert msg['data']['cpu'] == [[100.0, 10.0]]
+    await comm.disconnect()
+
+
+# ------------------------------
+# Tests des agrégats (rollups) 1m/1h/1d
+# ------------------------------
+
+def _utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+def test_rollup_summary_and_resolution_choice():
+    from .rollups import pick_resolution, summarize
+    summary = summarize([float(v) for v in range(1, 101)])
+    assert summary == {'count': 100, 'min': 1.0, 'max': 100.0, 'avg': 50.5, 'p95': 95.0}
+
+    start = _utc(2025, 1, 1)
+    assert pick_resolution(start, start + timedelta(hours=6), 500) == '1m'
+    assert pick_resolution(start, start + timedelta(days=7), 500) == '1h'
+    assert pick_resolution(start, start + timedelta(days=90), 500) == '1d'
+
+
+def test_compaction_is_incremental(db):
+    from .rollups import compact, query_rollups
+    start = _utc(2025, 1, 1, 10)
+    m.CPUUsage.objects.bulk_create([
+        m.CPUUsage(usage=float(i), recorded_at=start + timedelta(seconds=20 * i))
+        for i in range(9)  # trois minutes, trois échantillons chacune
+    ])
+
+    # La minute en cours (10:02) n'est pas close : seules 10:00 et 10:01 sont compactées
+    assert compact('cpu', '1m', now=start + timedelta(minutes=2, seconds=30)) == 2
+    assert compact('cpu', '1m', now=start + timedelta(minutes=2, seconds=30)) == 0
+    first = m.MetricRollup.objects.get(metric='cpu', resolution='1m', bucket=start)
+    assert (first.count, first.min, first.max, first.avg, first.p95) == (3, 0.0, 2.0, 1.0, 2.0)
+
+    # La requête complète la minute non compactée depuis les données brutes
+    result = query_rollups('cpu', start, start + timedelta(minutes=3), max_points=10)
+    assert result['resolution'] == '1m'
+    assert [point['avg'] for point in result['points']] == [1.0, 4.0, 7.0]
+
+    assert compact('cpu', '1m', now=start + timedelta(minutes=5)) == 1
+    assert m.MetricRollup.objects.filter(metric='cpu', resolution='1m').count() == 3
+
+
+def test_compaction_per_series(db):
+    from .rollups import compact_all, query_rollups
+    start = _utc(2025, 1, 1)
+    m.NetworkUsage.objects.bulk_create([
+        m.NetworkUsage(interface=interface, received=value, sent=0, recorded_at=start + timedelta(hours=hour))
+        for hour in range(3) for interface, value in (('eth0', 100 * hour), ('lo', 1))
+    ])
+    counts = compact_all(now=start + timedelta(days=2))
+    assert counts['network.received:1h'] == 6
+    assert counts['network.received:1d'] == 2
+
+    result = query_rollups('network.received', start, start + timedelta(days=1), max_points=30, series='eth0')
+    assert result['resolution'] == '1h'
+    assert [point['max'] for point in result['points']] == [0.0, 100.0, 200.0]
+    assert {point['series'] for point in result['points']} == {'eth0'}
+
+
+def test_apply_retention_per_rollup_resolution(db):
+    from .retention import apply_retention
+    start = _utc(2025, 1, 1)
+    m.MetricRollup.objects.bulk_create([
+        m.MetricRollup(metric='cpu', resolution=resolution, bucket=start, count=1, min=0, max=0, avg=0, p95=0)
+        for resolution in ('1m', '1h')
+    ])
+    report = apply_retention({'api.MetricRollup:1m': 7, 'api.MetricRollup:1h': 365},
+                             now=start + timedelta(days=30))
+    assert [(entry['model'], entry['deleted']) for entry in report] == [
+        ('api.MetricRollup:1m', 1), ('api.MetricRollup:1h', 0),
+    ]
+    assert list(m.MetricRollup.objects.values_list('resolution', flat=True)) == ['1h']
+
+
+# ------------------------------
+# Tests de la politique de rétention
+# ------------------------------
+
+def test_purge_deletes_in_pk_batches(db):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from .retention import purge
+
+    now = timezone.now()
+    m.CPUUsage.objects.bulk_create(
+        [m.CPUUsage(usage=1.0, recorded_at=now - timedelta(days=40)) for _ in range(25)]
+        + [m.CPUUsage(usage=2.0, recorded_at=now) for _ in range(5)]
+    )
+    with CaptureQueriesContext(connection) as queries:
+        deleted = purge(m.CPUUsage, 'recorded_at', now - timedelta(days=30), batch_size=10)
+
+    assert deleted == 25
+    assert list(m.CPUUsage.objects.values_list('usage', flat=True).distinct()) == [2.0]
+    deletes = [q for q in queries.captured_queries if q['sql'].startswith('DELETE')]
+    assert len(deletes) == 3
+
+
+def test_apply_retention_reports_per_model(db):
+    from django_celery_results.models import TaskResult
+    from .retention import apply_retention
+
+    now = timezone.now()
+    old_log = m.AuditLog.objects.create(action='login', details='', ip_address='127.0.0.1')
+    m.AuditLog.objects.filter(pk=old_log.pk).update(timestamp=now - timedelta(days=400))
+    m.AuditLog.objects.create(action='login', details='', ip_address='127.0.0.1')
+    TaskResult.objects.create(task_id='old')
+    TaskResult.objects.filter(task_id='old').update(date_done=now - timedelta(days=10))
+
+    report = apply_retention({
+        'api.AuditLog': 365,
+        'django_celery_results.TaskResult': 7,
+        'api.MemoryUsage': None,
+        'missing.Model': 1,
+    })
+    assert [(entry['model'], entry['deleted']) for entry in report] == [
+        ('api.AuditLog', 1),
+        ('django_celery_results.TaskResult', 1),
+    ]
+    assert all(entry['seconds'] >= 0 for entry in report)
+    assert m.AuditLog.objects.count() == 1
+
+
+# ------------------------------
+# Tests de l'historique agrégé /api/metrics/<metric>/
+# ------------------------------
+
+@pytest.fixture
+def cpu_history(db):
+    start = _utc(2025, 1, 1)
+    # Dix minutes d'échantillons toutes les 10 secondes, valeur = rang de l'échantillon
+    m.CPUUsage.objects.bulk_create([
+        m.CPUUsage(usage=float(i), recorded_at=start + timedelta(seconds=10 * i))
+        for i in range(60)
+    ])
+    return start
+
+
+@pytest.mark.parametrize('agg, expected', [
+    ('avg', [14.5, 44.5]),
+    ('min', [0.0, 30.0]),
+    ('max', [29.0, 59.0]),
+    ('p95', [28.0, 58.0]),
+    ('last', [29.0, 59.0]),
+])
+def test_bucketed_series_aggregates_in_sql(cpu_history, agg, expected):
+    from .timeseries import SeriesQuery, bucketed_series
+    query = SeriesQuery('cpu', cpu_history, cpu_history + timedelta(minutes=10), 300, agg)
+    points = bucketed_series(query)
+    assert [point['value'] for point in points] == expected
+    assert points[1]['time'] == (cpu_history + timedelta(minutes=5)).isoformat()
+
+
+def test_metric_history_endpoint(auth_client, cpu_history):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    url = reverse('metric-history', args=['cpu'])
+    with CaptureQueriesContext(connection) as queries:
+        resp = auth_client.get(url, {
+            'start': '2025-01-01T00:00:00Z', 'end': '2025-01-01T00:10:00Z', 'step': '2m', 'agg': 'max',
+        })
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body['step'] == 120
+    assert [point['value'] for point in body['points']] == [11.0, 23.0, 35.0, 47.0, 59.0]
+    assert len([q for q in queries.captured_queries if 'api_cpuusage' in q['sql']]) == 1
+
+    # Sans step : environ 500 points, pas arrondi à l'heure au-delà d'une heure par point
+    resp = auth_client.get(url, {'start': '2024-12-02T00:00:00Z', 'end': '2025-01-01T00:10:00Z'})
+    assert resp.json()['step'] == 7200
+    resp = auth_client.get(url, {'start': '2024-12-31T00:00:00Z', 'end': '2025-01-01T00:10:00Z'})
+    assert resp.json()['step'] == 174
+
+
+@pytest.mark.parametrize('params', [
+    {'agg': 'median'},
+    {'step': 'abc'},
+    {'step': '1', 'start': '2024-01-01T00:00:00Z', 'end': '2025-01-01T00:00:00Z'},
+    {'start': '2025-01-02T00:00:00Z', 'end': '2025-01-01T00:00:00Z'},
+])
+def test_metric_history_rejects_invalid_params(auth_client, params):
+    resp = auth_client.get(reverse('metric-history', args=['cpu']), params)
+    assert resp.status_code == 400
+    assert resp.json()['error']
+
+
+def test_metric_history_unknown_metric(auth_client):
+    resp = auth_client.get(reverse('metric-history', args=['gpu']))
+    assert resp.status_code == 400
+
+
+@pytest.mark.parametrize('agg, step, expected', [
+    ('avg', 7200, [2.5]),
+    ('max', 7200, [5.0]),
+    ('p95', 3600, [2.0, 5.0]),
+])
+def test_bucketed_series_reads_rollups_for_hourly_steps(db, agg, step, expected):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from .rollups import compact
+    from .timeseries import SeriesQuery, bucketed_series, rollup_resolution
+    start = _utc(2025, 1, 1)
+    m.CPUUsage.objects.bulk_create([
+        m.CPUUsage(usage=float(i), recorded_at=start + timedelta(minutes=20 * i)) for i in range(6)
+    ])
+    compact('cpu', '1h', now=start + timedelta(hours=2))
+
+    query = SeriesQuery('cpu', start, start + timedelta(hours=2), step, agg)
+    assert rollup_resolution(query) == '1h'
+    with CaptureQueriesContext(connection) as queries:
+        points = bucketed_series(query)
+    assert [point['value'] for point in points] == expected
+    # Intervalles compactés : aucune lecture des lignes brutes
+    assert not [q for q in queries.captured_queries if 'api_cpuusage' in q['sql']]
+
+    # Pas non multiple de l'heure, début non aligné ou « last » : lignes brutes
+    assert rollup_resolution(SeriesQuery('cpu', start, start + timedelta(hours=2), 5400, agg)) is None
+    assert rollup_resolution(SeriesQuery('cpu', start + timedelta(minutes=1), start + timedelta(hours=2), 3600)) is None
+    assert rollup_resolution(SeriesQuery('cpu', start, start + timedelta(hours=2), 3600, 'last')) is None
+
+
+@pytest.mark.parametrize('agg, expected', [
+    ('avg', [14.5, 44.5]),
+    ('max', [29.0, 59.0]),
+    ('p95', [28.0, 58.0]),
+    ('last', [29.0, 59.0]),
+])
+def test_bucketed_series_reads_chunks_after_raw_purge(cpu_history, settings, agg, expected):
+    from .chunks import pack_chunks
+    from .timeseries import SeriesQuery, bucketed_series
+    settings.RETENTION_DAYS = {'api.CPUUsage': 30}
+    pack_chunks('cpu', now=cpu_history + timedelta(hours=1))
+    m.CPUUsage.objects.all().delete()
+
+    query = SeriesQuery('cpu', cpu_history, cpu_history + timedelta(minutes=10), 300, agg)
+    points = bucketed_series(query)
+    assert [point['value'] for point in points] == expected
+    assert points[1]['time'] == (cpu_history + timedelta(minutes=5)).isoformat()
+
+    # Rétention illimitée : seules les lignes brutes sont lues
+    settings.RETENTION_DAYS = {'api.CPUUsage': None}
+    assert bucketed_series(query) == []
+
+
+# ------------------------------
+# Tests des index et du partitionnement mensuel
+# ------------------------------
+
+def test_latest_samples_query_uses_recorded_at_index(db):
+    from django.db import connection
+    sql, params = m.NetworkUsage.objects.order_by('-recorded_at')[:50].query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        plan = ' '.join(str(row) for row in cursor.fetchall())
+    assert 'api_netusage_recorded_idx' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_month_ranges_cross_year_boundary():
+    from .partitions import month_ranges, partition_name
+    ranges = month_ranges(_utc(2024, 11, 15, 8), _utc(2025, 1, 31))
+    assert ranges == [
+        (_utc(2024, 11, 1), _utc(2024, 12, 1)),
+        (_utc(2024, 12, 1), _utc(2025, 1, 1)),
+        (_utc(2025, 1, 1), _utc(2025, 2, 1)),
+    ]
+    assert partition_name('api_cpuusage', ranges[-1][0]) == 'api_cpuusage_p202501'
+
+
+def test_partitions_command_requires_postgres(db):
+    from django.core.management import call_command
+    from django.core.management.base import CommandError
+    with pytest.raises(CommandError):
+        call_command('hyperion_partitions', 'status')
+
+
+def test_partitions_require_postgres(db):
+    from django.db import NotSupportedError
+    from .partitions import list_partitions
+    with pytest.raises(NotSupportedError):
+        list_partitions(m.CPUUsage)
+
+
+def test_new_partition_takes_its_rows_from_the_default_partition():
+    from . import partitions
+    executed = []
+
+    class Cursor:
+        def execute(self, sql, params=None):
+            executed.append((sql, params))
+
+        def fetchone(self):
+            # to_regclass : seule la partition DEFAULT existe déjà
+            return [executed[-1][1] == ['api_cpuusage_default']]
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    connection = mock.Mock(vendor='postgresql', cursor=Cursor)
+    connection.ops.quote_name = lambda name: f'"{name}"'
+    with mock.patch.object(partitions, 'connection', connection), \
+            mock.patch.object(partitions.transaction, 'atomic', contextlib.nullcontext):
+        created = partitions.create_partitions(m.CPUUsage, _utc(2025, 1, 1), _utc(2025, 1, 1))
+    assert created == ['api_cpuusage_p202501']
+    statements = [sql.split(' (')[0] for sql, _ in executed if not sql.startswith('SELECT')]
+    assert statements == [
+        'ALTER TABLE "api_cpuusage" DETACH PARTITION "api_cpuusage_default"',
+        'CREATE TABLE "api_cpuusage_p202501" PARTITION OF "api_cpuusage" FOR VALUES FROM',
+        'INSERT INTO "api_cpuusage_p202501" SELECT * FROM "api_cpuusage_default" WHERE "recorded_at" >= %s AND "recorded_at" < %s',
+        'DELETE FROM "api_cpuusage_default" WHERE "recorded_at" >= %s AND "recorded_at" < %s',
+        'ALTER TABLE "api_cpuusage" ATTACH PARTITION "api_cpuusage_default" DEFAULT',
+    ]
+
+
+def test_maintain_metric_partitions_is_a_noop_without_postgres(db):
+    assert t.maintain_metric_partitions() == {}
+
+
+# ------------------------------
+# Tests du stockage compressé par blocs (Gorilla)
+# ------------------------------
+
+def test_gorilla_round_trip():
+    import random
+    from .chunks import decode_points, encode_points
+    rng = random.Random(42)
+    timestamp = 1735689600000
+    points = []
+    for i in range(500):
+        # Échantillonnage régulier avec gigue, valeurs répétées, aléatoires et extrêmes
+        timestamp += 10000 + rng.choice([0, 0, 0, 1, -3, 250, 5000, 10 ** 7])
+        value = rng.choice([12.5, 12.5, rng.random() * 100, -0.0, 1e300, float(i)])
+        points.append((timestamp, value))
+    assert list(decode_points(encode_points(points))) == points
+    assert list(decode_points(encode_points([]))) == []
+
+
+def test_gorilla_compresses_regular_series():
+    from .chunks import encode_points
+    points = [(1735689600000 + 10000 * i, [21.5, 21.5, 22.0][i % 3]) for i in range(360)]
+    data = encode_points(points)
+    # Une ligne CPUUsage coûte environ 60 octets hors index
+    assert len(data) * 10 < 60 * len(points)
+
+
+def test_pack_chunks_and_stream_points(db):
+    from .chunks import iter_points, pack_chunks
+    start = _utc(2025, 1, 1)
+    samples = [(start + timedelta(minutes=i), float(i % 7)) for i in range(120)]
+    samples.append((start + timedelta(hours=5), 99.0))  # trou de plusieurs heures
+    m.CPUUsage.objects.bulk_create([m.CPUUsage(usage=v, recorded_at=t) for t, v in samples])
+
+    assert pack_chunks('cpu', now=start + timedelta(hours=6)) == 3
+    assert pack_chunks('cpu', now=start + timedelta(hours=6)) == 0
+    assert m.MetricChunk.objects.get(metric='cpu', start=start).count == 60
+
+    streamed = list(iter_points('cpu', start + timedelta(minutes=30), start + timedelta(hours=6)))
+    assert [(t, v) for _, t, v in streamed] == samples[30:]
+
+
+# ------------------------------
+# Tests du cache des derniers échantillons
+# ------------------------------
+
+def test_recent_samples_cold_load_then_memory(db):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from .recent import recent_samples
+    m.CPUUsage.objects.bulk_create([
+        m.CPUUsage(usage=float(i), recorded_at=_utc(2025, 1, 1, 0, i)) for i in range(3)
+    ])
+
+    rows = recent_samples.latest('cpu', 2)
+    assert [row['usage'] for row in rows] == [2.0, 1.0]
+    with CaptureQueriesContext(connection) as queries:
+        assert len(recent_samples.latest('cpu')) == 3
+    assert not queries.captured_queries
+    assert recent_samples.loads == 1
+
+
+def test_recent_samples_write_through(psutil_snapshot, db):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from .recent import recent_samples
+    assert recent_samples.latest('network') == []
+    loads = recent_samples.loads
+
+    t.collect_metrics()
+    with CaptureQueriesContext(connection) as queries:
+        network = recent_samples.latest('network')
+    assert not queries.captured_queries
+    assert recent_samples.loads == loads
+    assert [(row['received'], row['sent']) for row in network] == [(10, 20), (10, 20)]
+
+
+def test_recent_samples_reloads_stale_entry_without_writes(db):
+    from .recent import RecentSamples
+    cache = RecentSamples(maxlen=10, ttl=0)
+    assert cache.latest('memory') == []
+    # Écriture par un autre processus (Celery) : invisible du cache local
+    m.MemoryUsage.objects.create(usage=42.0)
+    assert [row['usage'] for row in cache.latest('memory')] == [42.0]
+    assert cache.loads == 2
+
+
+def test_recent_samples_redis_unavailable_falls_back(db):
+    from .recent import RecentSamples, redis
+    if redis is None:
+        pytest.skip('redis non installé')
+    cache = RecentSamples(redis_url='redis://127.0.0.1:1/0')
+    m.MemoryUsage.objects.create(usage=12.0)
+    assert [row['usage'] for row in cache.latest('memory')] == [12.0]
+    cache.record([m.MemoryUsage.objects.create(usage=13.0)])
+    assert [row['usage'] for row in cache.latest('memory')] == [13.0, 12.0]
+
+
+# ------------------------------
+# Tests des débits réseau
+# ------------------------------
+
+def test_counter_delta_wrap_and_reset():
+    from .net_sampler import counter_delta
+    assert counter_delta(100, 250) == 150
+    # Compteur 32 bits qui reboucle
+    assert counter_delta(2 ** 32 - 100, 50) == 150
+    # Redémarrage : le compteur repart de zéro
+    assert counter_delta(2 ** 31, 10) is None
+    assert counter_delta(2 ** 40, 10) is None
+
+
+def test_net_sampler_rates_between_calls():
+    from .net_sampler import net_sampler
+    snetio = collections.namedtuple(
+        'snetio', 'bytes_sent bytes_recv packets_sent packets_recv errin errout dropin dropout'
+    )
+    first = net_sampler.sample({'eth0': snetio(100, 1000, 1, 10, 0, 0, 0, 0)}, _utc(2025, 1, 1, 0, 0, 0))
+    assert set(first['eth0'].values()) == {None}
+
+    second = net_sampler.sample({
+        'eth0': snetio(1100, 21000, 11, 210, 2, 0, 5, 1),
+        'wlan0': snetio(5, 5, 1, 1, 0, 0, 0, 0),
+    }, _utc(2025, 1, 1, 0, 0, 10))
+    assert second['eth0'] == {
+        'received_rate': 2000.0, 'sent_rate': 100.0,
+        'packets_received_rate': 20.0, 'packets_sent_rate': 1.0,
+        'errors_in': 2, 'errors_out': 0, 'drops_in': 5, 'drops_out': 1,
+    }
+    # Interface apparue entre deux relevés
+    assert second['wlan0']['received_rate'] is None
+
+    reset = net_sampler.sample({'eth0': snetio(10, 10, 1, 1, 0, 0, 0, 0)}, _utc(2025, 1, 1, 0, 0, 20))
+    assert reset['eth0']['received_rate'] is None
+
+
+def test_net_sampler_intervals_do_not_overlap_across_workers():
+    from .net_sampler import NetworkSampler
+    from .sampler_state import SamplerState
+    snetio = collections.namedtuple(
+        'snetio', 'bytes_sent bytes_recv packets_sent packets_recv errin errout dropin dropout'
+    )
+    state = SamplerState(prefix='host:')
+    state._redis, state._resolved = FakeRedis(), True
+    first, second = (NetworkSampler(cache_key='net', state=state) for _ in range(2))
+    t0 = _utc(2025, 1, 1)
+    first.sample({'eth0': snetio(0, 0, 0, 0, 0, 0, 0, 0)}, t0)
+    second.sample({'eth0': snetio(0, 600, 0, 0, 3, 0, 0, 0)}, t0 + timedelta(minutes=1))
+    # Le premier worker repart du relevé du second : chaque erreur n'est comptée qu'une fois
+    rates = first.sample({'eth0': snetio(0, 1800, 0, 0, 4, 0, 0, 0)}, t0 + timedelta(minutes=2))
+    assert (rates['eth0']['received_rate'], rates['eth0']['errors_in']) == (20.0, 1)
+
+
+def test_collect_metrics_stores_network_rates(db):
+    counters = iter([
+        {'eth0': type('N', (), {'bytes_recv': 1000, 'bytes_sent': 100})},
+        {'eth0': type('N', (), {'bytes_recv': 7000, 'bytes_sent': 700})},
+    ])
+    moments = iter([_utc(2025, 1, 1, 0, 0, 0), _utc(2025, 1, 1, 0, 1, 0)])
+    with mock.patch('api.cpu_sampler.psutil.cpu_times', return_value=[cpu_times(user=25, idle=75)]), \
+            mock.patch('api.collection.psutil.net_io_counters', side_effect=lambda pernic: next(counters)), \
+            mock.patch('api.collection.get_storage_info', return_value=[]), \
+            mock.patch('api.collection.timezone.now', side_effect=lambda: next(moments)):
+        t.collect_metrics()
+        t.collect_metrics()
+
+    first, second = m.NetworkUsage.objects.order_by('recorded_at')
+    assert first.received_rate is None
+    assert (second.received, second.received_rate, second.sent_rate) == (7000, 100.0, 10.0)
+
+
+# ------------------------------
+# Tests de l'activité disque
+# ------------------------------
+
+sdiskio = collections.namedtuple(
+    'sdiskio', 'read_count write_count read_bytes write_bytes read_time write_time busy_time'
+)
+
+
+def test_disk_io_sampler_rates_and_reset():
+    from .disk_sampler import DiskIOSampler
+    sampler = DiskIOSampler(cache_key='test:disk_io')
+    assert sampler.sample({'sda': sdiskio(100, 50, 4096, 8192, 200, 100, 1000)}, _utc(2025, 1, 1, 0, 0, 0)) == {}
+
+    rates = sampler.sample({
+        'sda': sdiskio(300, 150, 413696, 417792, 600, 600, 3500),
+        'sdb': sdiskio(1, 1, 1, 1, 1, 1, 1),
+    }, _utc(2025, 1, 1, 0, 0, 10))
+    assert rates == {'sda': {
+        'read_iops': 20.0, 'write_iops': 10.0,
+        'read_bytes_rate': 40960.0, 'write_bytes_rate': 40960.0,
+        'read_latency': 2.0, 'write_latency': 5.0, 'utilization': 25.0,
+    }}
+
+    # Compteurs remis à zéro (redémarrage) : pas de mesure pour cet intervalle
+    assert sampler.sample({'sda': sdiskio(1, 1, 1, 1, 1, 1, 1)}, _utc(2025, 1, 1, 0, 0, 20)) == {}
+
+
+def test_disk_io_intervals_do_not_overlap_across_workers():
+    from .disk_sampler import DiskIOSampler
+    from .sampler_state import SamplerState
+    state = SamplerState(prefix='host:')
+    state._redis, state._resolved = FakeRedis(), True
+    first, second = (DiskIOSampler(cache_key='disk', state=state) for _ in range(2))
+    t0 = _utc(2025, 1, 1)
+    first.sample({'sda': sdiskio(0, 0, 0, 0, 0, 0, 0)}, t0)
+    second.sample({'sda': sdiskio(600, 0, 0, 0, 0, 0, 0)}, t0 + timedelta(minutes=1))
+    # Le premier worker repart du relevé du second, sur une minute
+    rates = first.sample({'sda': sdiskio(1800, 0, 0, 0, 0, 0, 0)}, t0 + timedelta(minutes=2))
+    assert rates['sda']['read_iops'] == 20.0
+
+
+def test_collect_metrics_stores_disk_io(psutil_snapshot, db):
+    counters = iter([
+        {'nvme0n1': sdiskio(0, 0, 0, 0, 0, 0, 0)},
+        {'nvme0n1': sdiskio(600, 0, 6000, 0, 300, 0, 30000)},
+    ])
+    with mock.patch('api.disk_sampler.psutil.disk_io_counters', side_effect=lambda perdisk: next(counters)), \
+            mock.patch('api.collection.timezone.now', side_effect=[_utc(2025, 1, 1, 0, 0), _utc(2025, 1, 1, 0, 1)]):
+        assert t.collect_metrics()['DiskIOUsage'] == 0
+        assert t.collect_metrics()['DiskIOUsage'] == 1
+
+    usage = m.DiskIOUsage.objects.get()
+    assert (usage.device, usage.read_iops, usage.read_latency, usage.utilization) == ('nvme0n1', 10.0, 0.5, 50.0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_storage_consumer_io_subchannel(monkeypatch):
+    from .broadcast import disk_io_broadcaster
+    monkeypatch.setattr('api.consumers.get_storage_info', lambda: [{'device': '/dev/d1'}])
+    monkeypatch.setattr(
+        'api.broadcast.live_disk_io_sampler.sample',
+        lambda: {'sda': {'read_iops': 5.0, 'utilization': 12.5}}
+    )
+    comm = WebsocketCommunicator(application, '/ws/storage/')
+    ok, _ = await comm.connect()
+    assert ok
+    assert json.loads(await comm.receive_from())['type'] == 'storage_info'
+
+    await comm.send_json_to({'action': 'subscribe', 'channel': 'io'})
+    msg = json.loads(await comm.receive_from())
+    assert msg == {'type': 'disk_io', 'data': [{'device': 'sda', 'read_iops': 5.0, 'utilization': 12.5}]}
+    assert disk_io_broadcaster.subscribers == 1
+
+    await comm.disconnect()
+    assert disk_io_broadcaster.subscribers == 0
+
+
+# ------------------------------
+# Tests de l'historique des processus (top-N)
+# ------------------------------
+
+def _proc_info(pid, name, create_time, cpu, rss):
+    return type('P', (), {'info': {
+        'pid': pid, 'name': name, 'create_time': create_time,
+        'cpu_times': type('T', (), {'user': cpu, 'system': 0.0}),
+        'memory_info': type('M', (), {'rss': rss}),
+    }})
+
+
+def test_process_history_sampler_top_n():
+    from .process_history import ProcessHistorySampler
+    sampler = ProcessHistorySampler(top_n=1, cache_key='test:process_history')
+    t0 = _utc(2025, 1, 1)
+    first = [_proc_info(1, 'init', 0.0, 10.0, 1000), _proc_info(2, 'python', 0.0, 5.0, 9000),
+             _proc_info(3, 'nginx', 0.0, 1.0, 500)]
+    later = [_proc_info(1, 'init', 0.0, 10.0, 1000), _proc_info(2, 'python', 0.0, 8.0, 9000),
+             _proc_info(3, 'nginx', 0.0, 1.5, 500),
+             # Démarré pendant l'intervalle : tout son temps CPU compte
+             _proc_info(4, 'make', t0.timestamp() + 30, 45.0, 2000)]
+    with mock.patch('api.process_history.psutil.process_iter', side_effect=[first, later]):
+        assert sampler.sample(t0) is None
+        interval, rows = sampler.sample(t0 + timedelta(minutes=1))
+    assert interval == 60.0
+    assert rows == [(4, 'make', 75.0, 2000), (2, 'python', 5.0, 9000)]
+
+
+def test_process_history_intervals_do_not_overlap_across_workers():
+    from .process_history import ProcessHistorySampler
+    from .sampler_state import SamplerState
+    state = SamplerState(prefix='host:')
+    state._redis, state._resolved = FakeRedis(), True
+    first, second = (ProcessHistorySampler(top_n=1, cache_key='history', state=state) for _ in range(2))
+    t0 = _utc(2025, 1, 1)
+    readings = [[_proc_info(1, 'python', 0.0, cpu, 100)] for cpu in (0.0, 30.0, 60.0)]
+    with mock.patch('api.process_history.psutil.process_iter', side_effect=readings):
+        assert first.sample(t0) is None
+        assert second.sample(t0 + timedelta(minutes=1)) == (60.0, [(1, 'python', 50.0, 100)])
+        # Le premier worker repart du relevé du second, pas du sien
+        assert first.sample(t0 + timedelta(minutes=2)) == (60.0, [(1, 'python', 50.0, 100)])
+
+
+def test_process_history_pack_and_contributions(db):
+    from .process_history import contributions, iter_entries, pack
+    start = _utc(2025, 1, 1)
+    for minute, rows in enumerate([
+        [(10, 'postgres', 50.0, 400), (11, 'python', 10.0, 900)],
+        [(12, 'postgres', 100.0, 600), (11, 'python', 30.0, 900)],
+    ]):
+        m.ProcessSample.objects.create(
+            recorded_at=start + timedelta(minutes=minute), interval=60.0,
+            pids=pack('i', [r[0] for r in rows]), names=[r[1] for r in rows],
+            cpu=pack('f', [r[2] for r in rows]), rss=pack('q', [r[3] for r in rows]),
+        )
+    assert list(iter_entries(m.ProcessSample.objects.earliest('recorded_at')))[0] == (10, 'postgres', 50.0, 400)
+
+    by_cpu = contributions(start, start + timedelta(hours=1), 'cpu')
+    assert [(p['name'], p['pids'], p['cpu_seconds'], p['avg_cpu_percent']) for p in by_cpu] == [
+        ('postgres', [10, 12], 90.0, 75.0), ('python', [11], 24.0, 20.0),
+    ]
+    by_memory = contributions(start, start + timedelta(hours=1), 'memory', limit=1)
+    assert [(p['name'], p['avg_rss'], p['peak_rss']) for p in by_memory] == [('python', 900, 900)]
+
+
+def test_process_top_api(auth_client):
+    m.ProcessSample.objects.create(interval=60.0, pids=b'', names=[], cpu=b'', rss=b'')
+    url = reverse('process-top')
+    response = auth_client.get(url, {'by': 'memory', 'limit': 5})
+    assert response.status_code == 200
+    assert response.json()['by'] == 'memory' and response.json()['processes'] == []
+    assert auth_client.get(url, {'by': 'disk'}).status_code == 400
+    assert auth_client.get(url, {'start': 'hier'}).status_code == 400
+
+
+# ------------------------------
+# Tests des événements de cycle de vie des processus
+# ------------------------------
+
+def test_diff_tables_started_exited_restarted():
+    from .process_events import diff_tables
+    previous = {(1, 10.0): 'init', (20, 50.0): 'worker', (30, 60.0): 'cron', (40, 70.0): 'sshd'}
+    current = {(1, 10.0): 'init', (21, 90.0): 'worker', (40, 95.0): 'bash', (50, 99.0): 'vim'}
+    events = {(e['kind'], e['pid'], e['name'], e['previous_pid']) for e in diff_tables(previous, current)}
+    assert events == {
+        ('restarted', 21, 'worker', 20),
+        # pid réutilisé par un autre programme : arrêt puis démarrage
+        ('started', 40, 'bash', None),
+        ('exited', 40, 'sshd', None),
+        ('started', 50, 'vim', None),
+        ('exited', 30, 'cron', None),
+    }
+
+
+def test_process_event_detector_first_tick_records_only():
+    from .process_events import ProcessEventDetector
+    detector = ProcessEventDetector(cache_key='test:process_events')
+    assert detector.detect({(1, 10.0): 'init'}) == []
+    assert [e['kind'] for e in detector.detect({(1, 10.0): 'init', (2, 20.0): 'sh'})] == ['started']
+    assert [e['kind'] for e in detector.detect({(1, 10.0): 'init'})] == ['exited']
+
+
+def test_process_events_not_duplicated_across_worker_processes():
+    from .process_events import ProcessEventDetector
+    from .sampler_state import SamplerState
+    state = SamplerState(prefix='host:')
+    state._redis, state._resolved = FakeRedis(), True
+    # Deux enfants prefork : deux détecteurs, un seul état partagé
+    first, second = (ProcessEventDetector(cache_key='events', state=state) for _ in range(2))
+    assert first.detect({(1, 10.0): 'init'}) == []
+    assert [e['pid'] for e in second.detect({(1, 10.0): 'init', (2, 20.0): 'sh'})] == [2]
+    assert first.detect({(1, 10.0): 'init', (2, 20.0): 'sh'}) == []
+    assert list(state._redis.store) == ['host:events']
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_process_events_persisted_and_pushed():
+    from asgiref.sync import sync_to_async
+    comm = WebsocketCommunicator(application, '/ws/dashboard/')
+    await comm.connect()
+    await comm.send_json_to({'action': 'subscribe', 'stream': 'process_events'})
+    await asyncio.sleep(0.05)
+
+    tables = iter([{(7, 1.0): 'gunicorn'}, {(8, 2.0): 'gunicorn', (9, 3.0): 'celery'}])
+    with mock.patch('api.process_events.read_process_table', side_effect=lambda: next(tables)):
+        assert await sync_to_async(t.detect_process_events)() == 0
+        assert await sync_to_async(t.detect_process_events)() == 2
+
+    msg = await comm.receive_json_from(timeout=3)
+    assert msg['stream'] == 'process_events'
+    assert [(e['kind'], e['pid'], e['previous_pid']) for e in msg['data']['events']] == [
+        ('restarted', 8, 7), ('started', 9, None),
+    ]
+    assert await sync_to_async(m.ProcessEvent.objects.count)() == 2
+    await comm.disconnect()
+
+
+# ------------------------------
+# Tests du scanner /proc (stat/statm)
+# ------------------------------
+
+def _fake_proc_entry(root, pid, comm, state, utime, stime, starttime, rss_pages):
+    base = root / str(pid)
+    base.mkdir(exist_ok=True)
+    (base / 'stat').write_text(
+        f'{pid} ({comm}) {state} 1 1 1 0 -1 0 0 0 0 0 {utime} {stime} 0 0 20 0 1 0 {starttime} 0 0 '
+        + ' '.join(['0'] * 29) + '\n'
+    )
+    (base / 'statm').write_text(f'1000 {rss_pages} 10 10 0 100 0\n')
+
+
+@pytest.fixture
+def fake_proc(tmp_path):
+    (tmp_path / 'stat').write_text('cpu  1 2 3 4\nbtime 1735689600\n')
+    (tmp_path / 'meminfo').write_text('MemTotal:       4000 kB\nMemFree:        1000 kB\n')
+    _fake_proc_entry(tmp_path, 1, 'systemd', 'S', 10, 5, 100, 10)
+    _fake_proc_entry(tmp_path, 42, 'tmux: server (1)', 'R', 200, 100, 500, 50)
+    return tmp_path
+
+
+def test_proc_scanner_parses_stat_and_statm(fake_proc):
+    from .proc_scanner import ProcScanner
+    scanner = ProcScanner(str(fake_proc))
+    scanner.page_size = 4096
+    scanner.clock_ticks = 100
+    rows = {row['pid']: row for row in scanner.scan()}
+    assert set(rows) == {1, 42}
+    assert rows[42]['name'] == 'tmux: server (1)'
+    assert rows[42]['status'] == 'running' and rows[1]['status'] == 'sleeping'
+    assert rows[42]['create_time'] == 1735689600 + 5.0
+    assert rows[42]['memory_percent'] == pytest.approx(100.0 * 50 * 4096 / (4000 * 1024))
+    assert rows[42]['cpu_percent'] == 0.0
+
+
+def test_proc_scanner_cpu_percent_between_scans(fake_proc):
+    from .proc_scanner import ProcScanner
+    scanner = ProcScanner(str(fake_proc))
+    scanner.clock_ticks = 100
+    with mock.patch('api.proc_scanner.time.monotonic', side_effect=[10.0, 12.0]):
+        scanner.scan()
+        # 100 ticks de plus en 2 secondes : 50 % d'un cœur
+        _fake_proc_entry(fake_proc, 42, 'tmux: server (1)', 'R', 250, 150, 500, 50)
+        rows = {row['pid']: row for row in scanner.scan()}
+    assert rows[42]['cpu_percent'] == 50.0
+    assert rows[1]['cpu_percent'] == 0.0
+
+
+def test_make_scanner_modes():
+    from .process_snapshot import make_scanner
+    assert make_scanner('psutil') is None
+    assert make_scanner('proc') is not None
+    with mock.patch('api.proc_scanner.sys.platform', 'darwin'):
+        assert make_scanner('auto') is None
+
+
+# ------------------------------
+# Tests du cache de l'inventaire des services
+# ------------------------------
+
+def test_service_inventory_single_flight_cold_load():
+    import threading
+    from .service_cache import ServiceInventory
+    release = threading.Event()
+
+    def slow_loader():
+        release.wait(2)
+        return [{'name': 'nginx', 'status': 'active'}]
+
+    inventory = ServiceInventory(slow_loader, lambda name: None, interval=60)
+    results = []
+    readers = [threading.Thread(target=lambda: results.append(inventory.get())) for _ in range(8)]
+    for reader in readers:
+        reader.start()
+    release.set()
+    for reader in readers:
+        reader.join(2)
+    assert inventory.loads == 1
+    assert results == [[{'name': 'nginx', 'status': 'active'}]] * 8
+
+
+def test_service_inventory_stale_read_refreshes_in_background():
+    import time
+    from .service_cache import ServiceInventory
+    statuses = ['active', 'failed']
+    inventory = ServiceInventory(
+        lambda: [{'name': 'nginx', 'status': statuses.pop(0) if len(statuses) > 1 else statuses[0]}],
+        lambda name: None, interval=0
+    )
+    assert inventory.get()[0]['status'] == 'active'
+    # Liste périmée : servie telle quelle pendant le rechargement en arrière-plan
+    assert inventory.get()[0]['status'] == 'active'
+    for _ in range(100):
+        if inventory.loads == 2:
+            break
+        time.sleep(0.01)
+    assert inventory.get()[0]['status'] == 'failed'
+
+
+def test_service_inventory_refresh_keeps_units_patched_meanwhile():
+    import threading
+    import time
+    from .service_cache import ServiceInventory
+    loading, release = threading.Event(), threading.Event()
+    loads = [[{'name': 'nginx', 'status': 'active'}, {'name': 'sshd', 'status': 'active'}]]
+
+    def loader():
+        if loads:
+            return loads.pop()
+        # Rechargement lancé avant l'arrêt de nginx : il lit l'ancien état
+        loading.set()
+        release.wait(2)
+        return [{'name': 'nginx', 'status': 'active'}, {'name': 'sshd', 'status': 'failed'}]
+
+    inventory = ServiceInventory(loader, lambda name: None, interval=60)
+    inventory.get()
+    inventory.interval = 0
+    inventory.get()
+    assert loading.wait(2)
+    inventory.update('nginx', {'status': 'inactive'})
+    release.set()
+    for _ in range(100):
+        if inventory.loads == 2:
+            break
+        time.sleep(0.01)
+    assert {service['name']: service['status'] for service in inventory.get()} == {'nginx': 'inactive', 'sshd': 'failed'}
+
+
+def show_output(*units):
+    return ''.join(f'Id={name}.service\nActiveState={state}\nSubState=running\nMainPID=0\n\n' for name, state in units)
+
+
+@mock.patch('api.utils.run_command')
+def test_service_action_invalidates_only_its_unit(mock_run):
+    outputs = {'list-units': 'nginx.service loaded active running\nsshd.service loaded active running\n',
+               'show': show_output(('nginx', 'active'), ('sshd', 'active'))}
+    mock_run.side_effect = lambda args: CommandResult(args, 0, outputs.get(args[1], ''), '', 0.0, False)
+    assert {'name': 'nginx', 'status': 'active'}.items() <= u.get_services()[0].items()
+    u.get_services()
+    assert mock_run.call_count == 2
+
+    outputs['show'] = show_output(('nginx', 'inactive'))
+    assert u.stop_service('nginx') is True
+    assert mock_run.call_args_list[2][0][0] == ['systemctl', 'stop', 'nginx.service']
+    assert mock_run.call_args[0][0][-1] == 'nginx.service'
+    services = {service['name']: service['status'] for service in u.get_services()}
+    assert services == {'nginx': 'inactive', 'sshd': 'active'}
+    assert mock_run.call_count == 4
+
+
+# ------------------------------
+# Tests de la couche d'exécution des commandes système
+# ------------------------------
+
+@pytest.mark.asyncio
+async def test_run_command_async_structured_result_and_timeout():
+    from .commands import run_command_async
+    result = await run_command_async(['sh', '-c', 'echo out; echo err >&2; exit 3'])
+    assert (result.returncode, result.stdout, result.stderr, result.ok) == (3, 'out\n', 'err\n', False)
+
+    result = await run_command_async(['sleep', '5'], timeout=0.1)
+    assert result.timed_out and result.returncode is None and result.duration < 2
+
+    missing = await run_command_async(['hyperion-missing-binary'])
+    assert missing.returncode == 127 and not missing.ok
+
+
+@pytest.mark.asyncio
+async def test_run_command_async_concurrency_limit(monkeypatch):
+    import time
+    from . import commands
+    monkeypatch.setattr(commands, 'MAX_CONCURRENCY', 2)
+    started = time.monotonic()
+    results = await asyncio.gather(*[commands.run_command_async(['sleep', '0.2']) for _ in range(4)])
+    # Deux vagues de deux commandes
+    assert all(result.ok for result in results)
+    assert time.monotonic() - started >= 0.4
+
+
+@pytest.mark.asyncio
+async def test_run_command_refuses_to_block_the_loop():
+    from .commands import run_command
+    with pytest.raises(RuntimeError):
+        run_command(['true'])
+
+
+@pytest.mark.asyncio
+async def test_async_service_action_keeps_the_loop_responsive(monkeypatch):
+    from .consumers import handle_service_action
+    calls = []
+
+    async def fake_run(args, timeout=None):
+        calls.append(args)
+        await asyncio.sleep(0.1)
+        return CommandResult(args, 0, show_output(('nginx', 'active')) if args[1] == 'show' else '', '', 0.1, False)
+
+    monkeypatch.setattr('api.utils.run_command_async', fake_run)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    task = asyncio.ensure_future(ticker())
+    reply = await handle_service_action({'action': 'restart', 'service': 'nginx'})
+    task.cancel()
+    assert reply == {'status': 'success', 'action': 'restart', 'service': 'nginx'}
+    assert calls[0] == ['systemctl', 'restart', 'nginx.service'] and calls[1][1] == 'show'
+    assert ticks >= 10
+
+
+def test_parse_systemctl_show_reads_every_unit_in_one_pass():
+    import time
+    booted = time.monotonic() - 120
+    output = (
+        'Id=nginx.service\nActiveState=active\nSubState=running\nMainPID=812\nMemoryCurrent=7340032\n'
+        f'CPUUsageNSec=1500000000\nNRestarts=2\nActiveEnterTimestampMonotonic={int(booted * 1e6)}\n\n'
+        'Id=backup.service\nActiveState=inactive\nSubState=dead\nMainPID=0\nMemoryCurrent=[not set]\n'
+        'CPUUsageNSec=18446744073709551615\nNRestarts=0\nActiveEnterTimestampMonotonic=0\n'
+    )
+    nginx, backup = u.parse_systemctl_show(output)
+    assert (nginx['name'], nginx['main_pid'], nginx['memory_bytes'], nginx['cpu_seconds'], nginx['restarts']) == \
+        ('nginx', 812, 7340032, 1.5, 2)
+    started = datetime.fromisoformat(nginx['active_since'])
+    assert abs((datetime.now(dt_timezone.utc) - started).total_seconds() - 120) < 5
+    assert backup == {'name': 'backup', 'status': 'inactive', 'sub_state': 'dead', 'main_pid': None,
+                      'memory_bytes': None, 'cpu_seconds': None, 'restarts': 0, 'active_since': None}
+
+
+# ------------------------------
+# Tests des opérations groupées sur les services
+# ------------------------------
+
+def test_dependency_waves_orders_units_and_rejects_cycles():
+    from .service_bulk import dependency_waves
+    after = {'app': ['db', 'cache'], 'worker': ['app'], 'db': ['external']}
+    assert dependency_waves(['worker', 'app', 'db', 'cache', 'mail'], after) == \
+        [['db', 'cache', 'mail'], ['app'], ['worker']]
+    with pytest.raises(ValueError):
+        dependency_waves(['a', 'b'], {'a': ['b'], 'b': ['a']})
+
+
+@pytest.mark.asyncio
+async def test_bulk_operation_bounds_parallelism_and_skips_dependents(monkeypatch):
+    from . import service_bulk
+    running = []
+    peak = 0
+
+    async def restart(unit):
+        nonlocal peak
+        running.append(unit)
+        peak = max(peak, len(running))
+        await asyncio.sleep(0.02)
+        running.remove(unit)
+        return unit != 'db'
+
+    monkeypatch.setitem(service_bulk.OPERATIONS, 'restart', restart)
+    units = [f'web{i}' for i in range(6)] + ['db', 'app', 'worker']
+    bulk = service_bulk.BulkOperation('restart', units, after={'app': ['db'], 'worker': ['app']}, concurrency=2)
+    await bulk.run()
+    statuses = {result['service']: result['status'] for result in bulk.results}
+    assert peak == 2
+    assert statuses['web0'] == 'success' and statuses['db'] == 'error'
+    assert statuses['app'] == statuses['worker'] == 'skipped'
+    assert bulk.summary()['failed'] == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_bulk_progress_is_streamed_on_services_socket(monkeypatch):
+    from . import service_bulk
+
+    async def start(unit):
+        return True
+
+    monkeypatch.setitem(service_bulk.OPERATIONS, 'start', start)
+    monkeypatch.setattr('api.consumers.get_services', lambda: [])
+    comm = WebsocketCommunicator(application, '/ws/services/')
+    await comm.connect()
+    await comm.receive_json_from()
+    bulk = service_bulk.BulkOperation('start', ['nginx', 'redis'])
+    await bulk.run()
+    progress = []
+    while len(progress) < 2:
+        message = await comm.receive_json_from()
+        if isinstance(message, dict) and message.get('type') == 'service_bulk':
+            progress.append(message)
+    assert [(msg['job'], msg['done'], msg['total']) for msg in progress] == [(bulk.job, 1, 2), (bulk.job, 2, 2)]
+    await comm.disconnect()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bulk_services_api_audits_every_unit(monkeypatch):
+    import threading
+    from . import service_bulk
+
+    async def stop(unit):
+        return unit != 'cron'
+
+    threads = []
+
+    class RecordedThread(threading.Thread):
+        def start(self):
+            threads.append(self)
+            super().start()
+
+    monkeypatch.setitem(service_bulk.OPERATIONS, 'stop', stop)
+    monkeypatch.setattr(service_bulk.threading, 'Thread', RecordedThread)
+    user = get_user_model().objects.create_user('ops', password='x')
+    client = APIClient()
+    client.force_authenticate(user=user)
+    url = reverse('service-bulk')
+    # Sans la permission manage_services : refusé
+    assert client.post(url, {'operation': 'stop', 'services': ['nginx']}, format='json').status_code == 403
+    assert threads == []
+
+    profile = m.UserProfile.objects.get(user=user)
+    profile.role = m.Role.objects.create(name='ops', permissions={'manage_services': True})
+    profile.save()
+    client.force_authenticate(user=get_user_model().objects.get(pk=user.pk))
+    response = client.post(url, {'operation': 'stop', 'services': ['nginx', 'cron']}, format='json')
+    assert response.status_code == 202
+    assert (response.data['total'], response.data['waves']) == (2, [['nginx', 'cron']])
+    threads[0].join(5)
+    job = response.data['job']
+    details = set(m.AuditLog.objects.filter(action='service_control').values_list('details', flat=True))
+    assert details == {f"stop nginx: success (bulk {job})", f"stop cron: error (bulk {job})"}
+
+    assert client.post(url, {'operation': 'stop', 'services': ['--force']}, format='json').status_code == 400
+    assert client.post(url, {'operation': 'reload', 'services': ['nginx']}, format='json').status_code == 400
+
+
+# ------------------------------
+# Tests de la liste de blocage ipset
+# ------------------------------
+
+def test_blocklist_creates_sets_and_rules_once():
+    from .blocklist import IPBlocklist
+    runner = FakeRunner(failing=['-C'])
+    blocklist = IPBlocklist('bl', runner=runner, max_elements=1024, sudo=False)
+    assert blocklist.add(['10.0.0.1']) and blocklist.add(['10.0.0.2'])
+    commands = [args for args, _ in runner.calls]
+    assert commands[0] == ['ipset', '-exist', 'restore']
+    assert runner.calls[0][1] == b'create bl hash:net family inet maxelem 1024\n'
+    rule = ['INPUT', '-m', 'set', '--match-set', 'bl', 'src', '-j', 'DROP']
+    assert commands[1:3] == [['iptables', '-C'] + rule, ['iptables', '-I'] + rule]
+    # Ensemble IPv6 créé seulement avec sa première adresse
+    assert not any(args[0] == 'ip6tables' for args in commands)
+    # Deuxième ajout : une seule commande, sans recréer l'ensemble
+    assert len(commands) == 5 and commands[-1] == ['ipset', '-exist', 'restore']
+
+
+def test_blocklist_ipv6_failure_does_not_block_ipv4():
+    from .blocklist import IPBlocklist
+    runner = FakeRunner(failing=['ip6tables'])
+    blocklist = IPBlocklist('bl', runner=runner, sudo=False)
+    assert blocklist.add(['10.0.0.1'])
+    # Ajout mixte : l'adresse IPv4 est appliquée, l'échec IPv6 est signalé
+    assert not blocklist.add(['10.0.0.2', '2001:db8::1'])
+    assert runner.calls[-1][1] == b'add bl 10.0.0.2/32\n'
+
+
+def test_blocklist_batches_adds_and_removes_in_one_restore():
+    from .blocklist import IPBlocklist
+    runner = FakeRunner()
+    blocklist = IPBlocklist('bl', runner=runner, sudo=False)
+    blocklist.ensure(4) and blocklist.ensure(6)
+    runner.calls.clear()
+    addresses = [f'203.0.{i // 256}.{i % 256}' for i in range(10000)]
+    assert blocklist.apply(add=addresses + ['2001:db8::/32'], remove=['198.51.100.7'])
+    assert len(runner.calls) == 1
+    script = runner.calls[0][1].decode().splitlines()
+    assert len(script) == 10002
+    assert script[0] == 'add bl 203.0.0.0/32' and 'add bl-v6 2001:db8::/32' in script
+    assert script[-1] == 'del bl 198.51.100.7/32'
+    with pytest.raises(ValueError):
+        blocklist.add(['999.1.1.1'])
+    assert len(runner.calls) == 1
+
+
+def test_blocklist_members_read_back_from_ipset_save():
+    from .blocklist import IPBlocklist
+    runner = FakeRunner(stdout='create bl hash:net family inet\nadd bl 10.0.0.1\nadd bl 192.0.2.0/24\n')
+    assert IPBlocklist('bl', runner=runner).members()[:2] == ['10.0.0.1', '192.0.2.0/24']
+    assert runner.calls[0][0] == ['sudo', 'ipset', 'save', 'bl']
+
+
+def test_blocklist_drops_duplicated_legacy_rules():
+    from .blocklist import IPBlocklist
+
+    class LegacyRunner(FakeRunner):
+        # Deux règles -s 10.0.0.1 identiques : le troisième -D échoue
+        def __call__(self, args, input=None):
+            self.calls.append((args, input))
+            if args[1] == '-S':
+                stdout = '-A INPUT -s 10.0.0.1/32 -j DROP\n' if args[0] == 'iptables' else ''
+                return CommandResult(args, 0, stdout, '', 0.0, False)
+            deletes = sum(call[0][:2] == ['iptables', '-D'] for call in self.calls)
+            return CommandResult(args, 0 if deletes <= 2 else 1, '', '', 0.0, False)
+
+    runner = LegacyRunner()
+    blocklist = IPBlocklist('bl', runner=runner, sudo=False)
+    assert blocklist.drop_legacy_rules(['10.0.0.1', '10.0.0.2']) == 2
+    commands = [args for args, _ in runner.calls]
+    assert commands[:2] == [['iptables', '-S', 'INPUT'], ['ip6tables', '-S', 'INPUT']]
+    assert commands[2] == ['iptables', '-D', 'INPUT', '-s', '10.0.0.1', '-j', 'DROP']
+    # 10.0.0.2 n'a pas d'ancienne règle : aucun -D
+    assert len(commands) == 5
+
+
+def test_blocklist_migrates_legacy_rules_into_the_set():
+    from .blocklist import IPBlocklist
+    rules = '-P INPUT ACCEPT\n-A INPUT -s 10.0.0.1/32 -j DROP\n-A INPUT -p tcp -m tcp --dport 22 -j ACCEPT\n'
+    runner = FakeRunner(stdout=rules, failing=['-D'])
+    blocklist = IPBlocklist('bl', runner=runner, sudo=False)
+    assert blocklist.legacy_rules() == ['10.0.0.1/32']
+    runner.calls.clear()
+    assert blocklist.migrate_legacy_rules() == ['10.0.0.1/32']
+    assert runner.calls[-2][1] == b'add bl 10.0.0.1/32\n'
+    assert runner.calls[-1][0] == ['iptables', '-D', 'INPUT', '-s', '10.0.0.1', '-j', 'DROP']
+
+
+def test_unblock_ips_removes_only_listed_legacy_rules(monkeypatch):
+    from .blocklist import IPBlocklist
+    from . import utils
+    runner = FakeRunner(stdout='-A INPUT -s 10.0.0.1/32 -j DROP\n', failing=['-D'])
+    monkeypatch.setattr(utils, 'ip_blocklist', IPBlocklist('bl', runner=runner, sudo=False))
+    addresses = [f'10.1.{i // 256}.{i % 256}' for i in range(1000)]
+    assert utils.unblock_ips(addresses + ['10.0.0.1'])
+    commands = [args for args, _ in runner.calls]
+    assert [args for args in commands if args[1] == '-D'] == [['iptables', '-D', 'INPUT', '-s', '10.0.0.1', '-j', 'DROP']]
+    # Création de l'ensemble et sa règle, un restore groupé, deux lectures -S et un -D, quelle que soit la taille du lot
+    assert len(commands) == 6
@@ -0,0 +1,262 @@
+# api/timeseries.py
+import math
+import re
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import NotSupportedError, connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .chunks import iter_points
+from .retention import DEFAULT_RETENTION
+from .rollups import RESOLUTIONS, SOURCES, bucket_start, rollup_points
+
+AGGREGATES = ('avg', 'min', 'max', 'p95', 'last')
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+DEFAULT_RANGE = timedelta(hours=1)
+# Pas à partir duquel l'historique est lu dans les agrégats MetricRollup (1h, 1d)
+ROLLUP_MIN_STEP = 3600
+ROLLUP_AGGREGATES = ('avg', 'min', 'max', 'p95')
+
+_STEP_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Agrégats SQL par moteur ; {v} = colonne de valeur, {t} = colonne recorded_at
+_POSTGRES_AGGREGATES = {
+    'avg': 'AVG({v}) AS value',
+    'min': 'MIN({v}) AS value',
+    'max': 'MAX({v}) AS value',
+    # percentile_disc : valeur au rang le plus proche, comme SQLite, chunk_buckets et MetricRollup
+    'p95': 'percentile_disc(0.95) WITHIN GROUP (ORDER BY {v}) AS value',
+    'last': '(array_agg({v} ORDER BY {t} DESC))[1] AS value',
+}
+_SQLITE_AGGREGATES = {
+    'avg': 'AVG({v}) AS value',
+    'min': 'MIN({v}) AS value',
+    'max': 'MAX({v}) AS value',
+    # SQLite renvoie la colonne « nue » de la ligne retenue par MAX()
+    'last': '{v} AS value, MAX({t}) AS latest',
+}
+
+
+def parse_step(value) -> int:
+    """Step in seconds from ``300`` or ``30s``/``5m``/``1h``/``1d``"""
+    match = re.fullmatch(r'(\d+)([smhd]?)', str(value).strip())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f'Invalid step: {value}')
+    return int(match.group(1)) * _STEP_UNITS[match.group(2) or 's']
+
+
+def parse_moment(value, default):
+    if not value:
+        return default
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(f'Invalid datetime: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, timezone.utc)
+    return moment
+
+
+class SeriesQuery:
+    """Validated parameters of a bucketed history query"""
+
+    def __init__(self, metric, start, end, step, agg='avg', series=None):
+        if metric not in SOURCES:
+            raise ValueError(f'Unknown metric: {metric}')
+        if agg not in AGGREGATES:
+            raise ValueError(f'Unknown aggregate: {agg}')
+        # Bornes des intervalles à la seconde, comme strftime('%s') sous SQLite
+        start = start.replace(microsecond=0)
+        if end <= start:
+            raise ValueError('end must be after start')
+        span = (end - start).total_seconds()
+        if not step:
+            step = max(math.ceil(span / DEFAULT_POINTS), 1)
+            if step >= ROLLUP_MIN_STEP:
+                # Longue période : pas et début calés sur l'heure pour lire les agrégats
+                step = math.ceil(step / ROLLUP_MIN_STEP) * ROLLUP_MIN_STEP
+                start = bucket_start(start, ROLLUP_MIN_STEP)
+                span = (end - start).total_seconds()
+        if span / step > MAX_POINTS:
+            raise ValueError(f'step too small: at most {MAX_POINTS} points per query')
+        self.metric = metric
+        self.start = start
+        self.end = end
+        self.step = step
+        self.agg = agg
+        self.series = series
+        self.buckets = math.ceil(span / step)
+
+    @classmethod
+    def from_params(cls, metric, params):
+        end = parse_moment(params.get('end'), timezone.now())
+        start = parse_moment(params.get('start'), end - DEFAULT_RANGE)
+        step = parse_step(params['step']) if params.get('step') else None
+        return cls(metric, start, end, step, params.get('agg') or 'avg', params.get('series') or None)
+
+
+def _postgres_sql(query, table, value, recorded_at, series):
+    start_epoch = query.start.timestamp()
+    bucket = f'width_bucket(EXTRACT(EPOCH FROM {recorded_at})::double precision, %s, %s, %s) - 1'
+    params = [start_epoch, start_epoch + query.buckets * query.step, query.buckets]
+    aggregate = _POSTGRES_AGGREGATES[query.agg].format(v=value, t=recorded_at)
+    return f'SELECT {bucket} AS bucket, {series} AS series, {aggregate} FROM {table}', params
+
+
+def _sqlite_sql(query, table, value, recorded_at, series):
+    bucket = f"(CAST(strftime('%%s', {recorded_at}) AS INTEGER) - %s) / %s"
+    params = [int(query.start.timestamp()), query.step]
+    if query.agg == 'p95':
+        # Pas de percentile_disc : rang le plus proche via des fonctions de fenêtre
+        ranked = (
+            f'SELECT {bucket} AS bucket, {series} AS series, {value} AS value, '
+            f'ROW_NUMBER() OVER (PARTITION BY {bucket}, {series} ORDER BY {value}) AS rank, '
+            f'COUNT(*) OVER (PARTITION BY {bucket}, {series}) AS total FROM {table}'
+        )
+        return ranked, params * 3
+    aggregate = _SQLITE_AGGREGATES[query.agg].format(v=value, t=recorded_at)
+    return f'SELECT {bucket} AS bucket, {series} AS series, {aggregate} FROM {table}', params
+
+
+def raw_cutoff(metric, now=None):
+    """Moment before which the retention policy purges the raw rows; None if kept forever"""
+    label = SOURCES[metric].model._meta.label
+    days = getattr(settings, 'RETENTION_DAYS', DEFAULT_RETENTION).get(label)
+    if days is None:
+        return None
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def _python_aggregate(agg, values):
+    # Mêmes agrégats que le SQL ; p95 au rang le plus proche dans tous les cas
+    if agg == 'avg':
+        return sum(values) / len(values)
+    if agg == 'min':
+        return min(values)
+    if agg == 'max':
+        return max(values)
+    if agg == 'p95':
+        return sorted(values)[(95 * len(values) + 99) // 100 - 1]
+    return values[-1]
+
+
+def chunk_buckets(query, end) -> dict:
+    """Aggregate the compressed chunks in [query.start, end) per (bucket, series)"""
+    series = query.series if SOURCES[query.metric].series_field else None
+    origin = query.start.timestamp()
+    groups = defaultdict(list)
+    # Points dans l'ordre chronologique pour chaque série : « last » est le dernier ajouté
+    for name, moment, value in iter_points(query.metric, query.start, end, series):
+        groups[int((moment.timestamp() - origin) // query.step), name].append(value)
+    return {key: _python_aggregate(query.agg, values) for key, values in groups.items()}
+
+
+def rollup_resolution(query):
+    """Coarsest rollup resolution (1h or more) whose buckets tile the query grid, else None"""
+    if query.agg not in ROLLUP_AGGREGATES:
+        return None
+    origin = int(query.start.timestamp())
+    for resolution, size in reversed(RESOLUTIONS.items()):
+        if size < ROLLUP_MIN_STEP or query.step % size or origin % size:
+            continue
+        # Un p95 ne se combine pas : un agrégat par intervalle exactement
+        if query.agg == 'p95' and query.step != size:
+            continue
+        return resolution
+    return None
+
+
+def rollup_series(query, resolution) -> list:
+    """Same rows as bucketed_series, merged from the MetricRollup buckets"""
+    series = query.series if SOURCES[query.metric].series_field else None
+    origin = query.start.timestamp()
+    groups = defaultdict(list)
+    for point in rollup_points(query.metric, resolution, query.start, query.end, series):
+        groups[int((point.bucket.timestamp() - origin) // query.step), point.series].append(point)
+
+    rows = []
+    for (bucket, name), points in sorted(groups.items(), key=lambda item: item[0]):
+        if query.agg == 'avg':
+            value = sum(point.avg * point.count for point in points) / sum(point.count for point in points)
+        elif query.agg == 'min':
+            value = min(point.min for point in points)
+        elif query.agg == 'max':
+            value = max(point.max for point in points)
+        else:
+            value = points[0].p95
+        rows.append({
+            'time': (query.start + timedelta(seconds=bucket * query.step)).isoformat(),
+            'series': name,
+            'value': value,
+        })
+    return rows
+
+
+def bucketed_series(query) -> list:
+    """Aggregate a metric per ``step`` bucket in the database.
+
+    Returns ``[{'time', 'series', 'value'}]`` ordered by time, one row per
+    non-empty bucket and series (interface or mount point). Buckets older
+    than the raw retention are read from the compressed ``MetricChunk`` rows
+    when they exist, so history survives the purge of the raw table. Steps
+    of whole hours or days on an aligned start read ``MetricRollup`` instead.
+    """
+    resolution = rollup_resolution(query)
+    if resolution is not None:
+        return rollup_series(query, resolution)
+
+    source = SOURCES[query.metric]
+    quote = connection.ops.quote_name
+    meta = source.model._meta
+    table = quote(meta.db_table)
+    value = quote(meta.get_field(source.value_field).column)
+    recorded_at = quote(meta.get_field('recorded_at').column)
+    series = quote(meta.get_field(source.series_field).column) if source.series_field else "''"
+
+    if connection.vendor == 'postgresql':
+        select, params = _postgres_sql(query, table, value, recorded_at, series)
+    elif connection.vendor == 'sqlite':
+        select, params = _sqlite_sql(query, table, value, recorded_at, series)
+    else:
+        raise NotSupportedError(f'Bucketed history is not implemented for {connection.vendor}')
+
+    adapt = connection.ops.adapt_datetimefield_value
+    # Débits réseau vides au premier relevé ou après une remise à zéro des compteurs
+    where = f' WHERE {recorded_at} >= %s AND {recorded_at} < %s AND {value} IS NOT NULL'
+    params += [adapt(query.start), adapt(query.end)]
+    if query.series is not None and source.series_field:
+        where += f' AND {series} = %s'
+        params.append(query.series)
+
+    if connection.vendor == 'sqlite' and query.agg == 'p95':
+        sql = (
+            f'SELECT bucket, series, value FROM ({select}{where}) '
+            f'WHERE rank = (95 * total + 99) / 100 ORDER BY bucket, series'
+        )
+    else:
+        sql = f'{select}{where} GROUP BY bucket, series ORDER BY bucket, series'
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    values = {(row[0], row[1]): row[2] for row in rows}
+    cutoff = raw_cutoff(query.metric)
+    if cutoff is not None and query.start < cutoff:
+        # Lignes brutes purgées : les intervalles archivés sont lus dans les MetricChunk,
+        # jusqu'à la fin de l'intervalle contenant la limite de rétention
+        buckets = math.ceil((cutoff - query.start).total_seconds() / query.step)
+        archived_end = min(query.start + timedelta(seconds=buckets * query.step), query.end)
+        values.update(chunk_buckets(query, archived_end))
+
+    return [
+        {
+            'time': (query.start + timedelta(seconds=bucket * query.step)).isoformat(),
+            'series': series,
+            'value': value,
+        }
+        for (bucket, series), value in sorted(values.items(), key=lambda item: item[0])
+    ]
@@ -6,7 +6,8 @@ from .views import (
     SlackNotificationView, EmailNotificationView, SSHCommandView,
     dashboard, LoginView, LogoutView, LoginAPIView,
     TwoFactorSetupView, TwoFactorVerifyView, TwoFactorManageView,
-    RoleManagementView, TwoFactorQRView, TwoFactorBackupTokensView
+    RoleManagementView, TwoFactorQRView, TwoFactorBackupTokensView,
+    MetricHistoryView
     )
 from . import views
 
@@ -22,6 +23,7 @@ urlpatterns = [
     path('notify/email/', EmailNotificationView.as_view(), name='email-notify'),
     path('ssh/command/', SSHCommandView.as_view(), name='ssh-command'),
     path('dashboard/', dashboard, name='dashboard'),
+    path('metrics/<str:metric>/', MetricHistoryView.as_view(), name='metric-history'),
     
     path('auth/login/', LoginView.as_view(), name='login'),
     path('auth/logout/', LogoutView.as_view(), name='logout'),
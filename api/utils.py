@@ -2,32 +2,30 @@
 import os
 import shutil
 import subprocess
-from datetime import datetime
+import time
+from datetime import datetime, timezone as dt_timezone
 from typing import List, Dict
 
 import netifaces
 import paramiko
 import psutil
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from rest_framework.views import exception_handler
 from rest_framework.response import Response
 import logging
 
+from .blocklist import ip_blocklist
+from .commands import run_command, run_command_async
+from .process_snapshot import snapshot_engine
+from .service_cache import ServiceInventory
+
 logger = logging.getLogger('hyperion.api')
 
 def get_processes():
-    processes = []
-    for proc in psutil.process_iter(['pid', 'name', 'status', 'cpu_percent', 'memory_percent']):
-        try:
-            processes.append({
-                'pid': proc.info['pid'],
-                'name': proc.info['name'],
-                'status': proc.info['status'],
-                'cpu_percent': proc.cpu_percent(),
-                'memory_percent': proc.memory_percent()
-            })
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            pass
+    """Processes of the shared snapshot, sorted by CPU usage"""
+    processes = snapshot_engine.get_snapshot().processes
     return sorted(processes, key=lambda x: x['cpu_percent'], reverse=True)
 
 
@@ -49,54 +47,166 @@ def change_process_priority(pid, priority):
         return False
 
 
-def get_services():
-    services = []
+# Propriétés lues pour chaque unité, en un seul appel `systemctl show`
+SERVICE_PROPERTIES = (
+    'Id', 'ActiveState', 'SubState', 'MainPID', 'MemoryCurrent',
+    'CPUUsageNSec', 'NRestarts', 'ActiveEnterTimestampMonotonic',
+)
+# Valeurs renvoyées par systemd quand une propriété n'est pas disponible (UINT64_MAX)
+_UNSET = ('', '[not set]', '18446744073709551615')
+
+
+def _number(value):
+    if value is None or value in _UNSET:
+        return None
     try:
-        # Get service list using systemctl
-        output = subprocess.check_output(['systemctl', 'list-units', '--type=service', '--all'])
-        for line in output.decode('utf-8').split('\n')[1:-7]:
-            if line.strip():
-                parts = line.split()
-                if len(parts) >= 3:
-                    name = parts[0].replace('.service', '')
-                    status = parts[2]
-                    services.append({
-                        'name': name,
-                        'status': status
-                    })
-    except:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def service_entry(properties) -> dict:
+    """Inventory entry built from the ``systemctl show`` properties of one unit"""
+    unit = properties.get('Id', '')
+    cpu_nsec = _number(properties.get('CPUUsageNSec'))
+    # Horloge monotone de systemd : même horloge que time.monotonic() sous Linux
+    entered = _number(properties.get('ActiveEnterTimestampMonotonic'))
+    active_since = None
+    if entered:
+        active_since = datetime.fromtimestamp(
+            time.time() - (time.monotonic() - entered / 1e6), dt_timezone.utc
+        ).isoformat()
+    return {
+        'name': unit[:-len('.service')] if unit.endswith('.service') else unit,
+        'status': properties.get('ActiveState') or None,
+        'sub_state': properties.get('SubState') or None,
+        'main_pid': _number(properties.get('MainPID')) or None,
+        'memory_bytes': _number(properties.get('MemoryCurrent')),
+        'cpu_seconds': round(cpu_nsec / 1e9, 3) if cpu_nsec is not None else None,
+        'restarts': _number(properties.get('NRestarts')) or 0,
+        'active_since': active_since,
+    }
+
+
+def parse_systemctl_show(output: str) -> List[Dict]:
+    """Entries of a multi-unit ``systemctl show`` output (blocks of key=value)"""
+    entries = []
+    properties = {}
+    for line in output.splitlines() + ['']:
+        if not line.strip():
+            if properties.get('Id'):
+                entries.append(service_entry(properties))
+            properties = {}
+            continue
+        key, _, value = line.partition('=')
+        properties[key] = value
+    return entries
+
+
+def _show_command(units):
+    return ['systemctl', 'show', '--property=' + ','.join(SERVICE_PROPERTIES), *units]
+
+
+def list_services():
+    """Every service unit with its state and resource usage (two forks in total)"""
+    listed = run_command([
+        'systemctl', 'list-units', '--type=service', '--all', '--plain', '--no-legend', '--no-pager'
+    ])
+    if not listed.ok:
         # Fallback to psutil for non-systemd systems
+        services = []
         for proc in psutil.process_iter(['pid', 'name', 'status']):
             if 'service' in proc.info['name']:
                 services.append({
                     'name': proc.info['name'],
                     'status': proc.info['status']
                 })
-    return services
+        return services
+
+    # Colonnes UNIT LOAD ACTIVE SUB DESCRIPTION ; « ● » devant les unités introuvables
+    states = {}
+    for line in listed.stdout.splitlines():
+        parts = [part for part in line.split() if part != '●']
+        if len(parts) >= 3 and parts[0].endswith('.service'):
+            states[parts[0]] = {'Id': parts[0], 'ActiveState': parts[2], 'SubState': parts[3] if len(parts) > 3 else ''}
+    if not states:
+        return []
 
+    shown = run_command(_show_command(list(states)))
+    if shown.ok:
+        return parse_systemctl_show(shown.stdout)
+    # systemctl show indisponible : état seul, tel que listé
+    return [service_entry(properties) for properties in states.values()]
 
-def start_service(service_name):
+
+def _read_entry(result):
+    if not result.ok:
+        return None
+    entries = parse_systemctl_show(result.stdout)
+    return entries[0] if entries and entries[0]['status'] else None
+
+
+def read_service_entry(service_name):
+    """Inventory entry of a single unit, None if systemctl cannot tell"""
+    return _read_entry(run_command(_show_command([f'{service_name}.service'])))
+
+
+async def read_service_entry_async(service_name):
+    return _read_entry(await run_command_async(_show_command([f'{service_name}.service'])))
+
+
+service_inventory = ServiceInventory(
+    list_services, read_service_entry,
+    interval=getattr(settings, 'SERVICE_CACHE_TTL', 5.0)
+)
+
+
+def get_services():
+    """Services of the shared inventory (systemctl runs at most once per SERVICE_CACHE_TTL)"""
+    return service_inventory.get()
+
+
+def _service_command(action, service_name):
+    return ['systemctl', action, f'{service_name}.service']
+
+
+def _service_action(action, service_name):
     try:
-        subprocess.check_call(['systemctl', 'start', f'{service_name}.service'])
-        return True
-    except:
-        return False
+        return run_command(_service_command(action, service_name)).ok
+    finally:
+        service_inventory.invalidate(service_name)
 
 
-def stop_service(service_name):
+async def _service_action_async(action, service_name):
     try:
-        subprocess.check_call(['systemctl', 'stop', f'{service_name}.service'])
-        return True
-    except:
-        return False
+        return (await run_command_async(_service_command(action, service_name))).ok
+    finally:
+        service_inventory.update(service_name, await read_service_entry_async(service_name))
+
+
+def start_service(service_name):
+    return _service_action('start', service_name)
+
+
+def stop_service(service_name):
+    return _service_action('stop', service_name)
 
 
 def restart_service(service_name):
-    try:
-        subprocess.check_call(['systemctl', 'restart', f'{service_name}.service'])
-        return True
-    except:
-        return False
+    return _service_action('restart', service_name)
+
+
+# Variantes pour les consumers : la commande ne bloque pas la boucle d'événements
+async def start_service_async(service_name):
+    return await _service_action_async('start', service_name)
+
+
+async def stop_service_async(service_name):
+    return await _service_action_async('stop', service_name)
+
+
+async def restart_service_async(service_name):
+    return await _service_action_async('restart', service_name)
 
 
 def get_network_usage():
@@ -110,47 +220,55 @@ def get_network_usage():
     return network_stats
 
 
-def block_ip(ip_address: str) -> bool:
-    """Block an IP address using iptables"""
+def _block_port_command(port, protocol):
+    return ['sudo', 'iptables', '-A', 'INPUT', '-p', protocol, '--dport', str(port), '-j', 'DROP']
+
+
+def block_ips(addresses) -> bool:
+    """Add addresses or networks to the ipset blocklist in one batch"""
     try:
-        subprocess.check_call([
-            'sudo', 'iptables',
-            '-A', 'INPUT',
-            '-s', ip_address,
-            '-j', 'DROP'
-        ])
-        return True
-    except subprocess.CalledProcessError:
+        return ip_blocklist.add(addresses)
+    except ValueError:
         return False
 
 
-def unblock_ip(ip_address: str) -> bool:
-    """Unblock a previously blocked IP address"""
+def unblock_ips(addresses) -> bool:
     try:
-        subprocess.check_call([
-            'sudo', 'iptables',
-            '-D', 'INPUT',
-            '-s', ip_address,
-            '-j', 'DROP'
-        ])
-        return True
-    except subprocess.CalledProcessError:
+        removed = ip_blocklist.remove(addresses)
+        # Adresses bloquées avant la liste ipset : un seul iptables -S, puis -D
+        # uniquement pour celles qui ont encore leur ancienne règle
+        legacy = ip_blocklist.drop_legacy_rules(addresses)
+    except ValueError:
         return False
+    return removed or legacy > 0
+
+
+def block_ip(ip_address: str) -> bool:
+    """Block an IP address through the ipset blocklist"""
+    return block_ips([ip_address])
+
+
+def unblock_ip(ip_address: str) -> bool:
+    """Unblock a previously blocked IP address"""
+    return unblock_ips([ip_address])
 
 
 def block_port(port: int, protocol: str = 'tcp') -> bool:
     """Block a specific port using iptables"""
-    try:
-        subprocess.check_call([
-            'sudo', 'iptables',
-            '-A', 'INPUT',
-            '-p', protocol,
-            '--dport', str(port),
-            '-j', 'DROP'
-        ])
-        return True
-    except subprocess.CalledProcessError:
-        return False
+    return run_command(_block_port_command(port, protocol)).ok
+
+
+# La liste de blocage appelle son runner synchrone : exécutée hors de la boucle
+async def block_ip_async(ip_address: str) -> bool:
+    return await sync_to_async(block_ip, thread_sensitive=False)(ip_address)
+
+
+async def unblock_ip_async(ip_address: str) -> bool:
+    return await sync_to_async(unblock_ip, thread_sensitive=False)(ip_address)
+
+
+async def block_port_async(port: int, protocol: str = 'tcp') -> bool:
+    return (await run_command_async(_block_port_command(port, protocol))).ok
 
 
 def get_network_interfaces() -> List[Dict]:
@@ -276,7 +394,11 @@ def get_storage_info():
     storage_info = []
     for partition in psutil.disk_partitions(all=False):
         if partition.mountpoint and partition.fstype:
-            usage = psutil.disk_usage(partition.mountpoint)
+            try:
+                usage = psutil.disk_usage(partition.mountpoint)
+            except OSError:
+                # Point de montage illisible (droits, montage réseau absent) : ignoré
+                continue
             storage_info.append({
                 'device': partition.device,
                 'mount_point': partition.mountpoint,
@@ -363,6 +485,15 @@ def get_system_temperatures():
         print(f"Error retrieving system information: {e}")
         return {}
     
+def get_client_ip(request):
+    """Obtenir l'IP réelle du client"""
+    # Premier saut de X-Forwarded-For derrière le proxy ; AuditLog.ip_address est obligatoire
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '127.0.0.1')
+
+
 def custom_exception_handler(exc, context):
     """Gestionnaire d'exceptions standardisé pour les API"""
     response = exception_handler(exc, context)
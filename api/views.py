@@ -12,6 +12,7 @@ from django.views import View
 from django.views.generic import FormView, TemplateView
 from django.http import HttpResponse, JsonResponse
 from django.urls import reverse_lazy
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.views.decorators.clickjacking import xframe_options_deny
@@ -69,8 +70,13 @@ from .secure_serializers import (
 from .utils import (
     get_processes, stop_process, change_process_priority,
     get_services, execute_ssh_command, block_ip, unblock_ip,
-    block_port, get_network_interfaces, configure_interface
+    block_port, get_network_interfaces, configure_interface, get_client_ip
     )
+from .process_snapshot import ProcessSubscription
+from .timeseries import DEFAULT_RANGE, SeriesQuery, bucketed_series, parse_moment
+from .process_history import DEFAULT_LIMIT, MAX_LIMIT, contributions
+from .service_bulk import BulkOperation
+from .recent import recent_samples
 from .tasks import send_slack_notification, send_email_notification
 from .decorators import require_permission
 
@@ -109,15 +115,6 @@ def security_headers(func):
         return response
     return wrapper
 
-def get_client_ip(request):
-    """Obtenir l'IP réelle du client"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0].strip()
-    else:
-        ip = request.META.get('REMOTE_ADDR', '127.0.0.1')
-    return ip
-
 def log_security_event(user, action, details, ip_address, success=True):
     """Journaliser un événement de sécurité"""
     try:
@@ -288,23 +285,18 @@ class ProcessViewSet(viewsets.ViewSet):
     serializer_class = ProcessSerializer
 
     def get_queryset(self):
-        processes = []
-        for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent', 'status']):
-            try:
-                pinfo = proc.as_dict(attrs=['pid', 'name', 'cpu_percent', 'memory_percent', 'status'])
-                processes.append({
-                    'pid': pinfo['pid'],
-                    'name': pinfo['name'],
-                    'cpu_percent': pinfo['cpu_percent'] or 0.0,
-                    'memory_percent': pinfo['memory_percent'] or 0.0,
-                    'status': pinfo['status'] or 'unknown'
-                })
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                continue
-        return processes
+        # Lecture de l'instantané partagé au lieu d'un parcours de psutil par requête
+        return get_processes()
 
     def list(self, request):
         processes = self.get_queryset()
+        # Mêmes filtres, tri et top-N que les abonnements WebSocket
+        if request.query_params:
+            try:
+                subscription = ProcessSubscription.from_message(request.query_params)
+            except (TypeError, ValueError) as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            processes = subscription.select(processes)
         serializer = ProcessSerializer(processes, many=True)
         return Response(serializer.data)
 
@@ -324,6 +316,27 @@ class ProcessViewSet(viewsets.ViewSet):
         except psutil.NoSuchProcess:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=False, methods=['get'])
+    def top(self, request):
+        # Processus classés par contribution CPU ou mémoire sur une période passée
+        params = request.query_params
+        try:
+            end = parse_moment(params.get('end'), timezone.now())
+            start = parse_moment(params.get('start'), end - DEFAULT_RANGE)
+            if end <= start:
+                raise ValueError('end must be after start')
+            limit = min(max(int(params.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+            by = params.get('by', 'cpu')
+            processes = contributions(start, end, by, limit)
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'by': by,
+            'processes': processes,
+        })
+
 @method_decorator([
     csrf_protect,
     never_cache,
@@ -346,6 +359,29 @@ class ServiceViewSet(viewsets.ViewSet):
         services = get_services()
         return Response(services)
 
+    @action(detail=False, methods=['post'])
+    @method_decorator(require_permission('manage_services'))
+    def bulk(self, request):
+        """Start, stop or restart many units in parallel, in dependency order"""
+        try:
+            bulk = BulkOperation(
+                request.data.get('operation'),
+                request.data.get('services'),
+                after=request.data.get('after'),
+                concurrency=request.data.get('concurrency'),
+            )
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Exécution en arrière-plan : l'avancement est publié sur /ws/services/
+        bulk.start(request.user, get_client_ip(request))
+        return Response({
+            'job': bulk.job,
+            'operation': bulk.operation,
+            'waves': bulk.waves,
+            'total': len(bulk.units),
+        }, status=status.HTTP_202_ACCEPTED)
+
 @method_decorator([
     csrf_protect,
     never_cache,
@@ -510,6 +546,24 @@ class NetworkViewSet(viewsets.ModelViewSet):
             return Response({'status': 'Interface configured'})
         return Response({'error': 'Failed to configure interface'}, status=400)
 
+class MetricHistoryView(APIView):
+    """Historique d'une métrique agrégé par intervalle côté base de données"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, metric):
+        try:
+            query = SeriesQuery.from_params(metric, request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'metric': query.metric,
+            'start': query.start.isoformat(),
+            'end': query.end.isoformat(),
+            'step': query.step,
+            'agg': query.agg,
+            'points': bucketed_series(query),
+        })
+
 class SlackNotificationView(APIView):
     def post(self, request):
         message = request.data.get('message')
@@ -577,18 +631,16 @@ def dashboard(request):
             
             # Données CPU - permission view_analytics requise
             if role.has_permission('view_analytics'):
-                cpu_usage = list(CPUUsage.objects.values()[:100])  # Limiter à 100 entrées
-                context['cpu_usage'] = json.dumps(cpu_usage, default=str)
+                # Derniers échantillons servis depuis le cache mémoire (100 au plus)
+                context['cpu_usage'] = json.dumps(recent_samples.latest('cpu', 100))
             
             # Données mémoire - permission view_analytics requise
             if role.has_permission('view_analytics'):
-                memory_usage = list(MemoryUsage.objects.values()[:100])
-                context['memory_usage'] = json.dumps(memory_usage, default=str)
+                context['memory_usage'] = json.dumps(recent_samples.latest('memory', 100))
             
             # Données réseau - permission view_network requise
             if role.has_permission('view_analytics'):
-                network_usage = list(NetworkUsage.objects.values()[:100])
-                context['network_usage'] = json.dumps(network_usage, default=str)
+                context['network_usage'] = json.dumps(recent_samples.latest('network', 100))
         
         # Ajouter des informations sur l'utilisateur (sécurisées)
         context.update({
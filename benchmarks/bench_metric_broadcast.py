@@ -0,0 +1,113 @@
+# benchmarks/bench_metric_broadcast.py
+"""Compare DB load of per-socket polling vs. the shared MetricBroadcaster.
+
+Usage:
+    python benchmarks/bench_metric_broadcast.py [--connections 10 50 200] [--ticks 5]
+
+Each scenario simulates N open /ws/cpu/ sockets for a number of 1-second ticks
+(without sleeping) and counts the SQL queries hitting the database.
+``polling`` and ``broadcast`` read the latest rows with an explicit ORM
+query, as every socket did before the shared producer; ``cached`` is the
+current ``get_cpu_payload``, served from the recent-samples cache.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_db_file = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+os.environ['DATABASE_URL'] = f'sqlite:///{_db_file}'
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hyperion.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+django.setup()
+settings.CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+from asgiref.sync import sync_to_async  # noqa: E402
+from channels.layers import InMemoryChannelLayer  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from api.broadcast import MetricBroadcaster, get_cpu_payload  # noqa: E402
+from api.models import CPUUsage  # noqa: E402
+from api.recent import recent_samples  # noqa: E402
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def query_cpu_payload():
+    """The payload read straight from the database, one query per call"""
+    rows = CPUUsage.objects.order_by('-recorded_at').values('recorded_at', 'usage')[:50]
+    return {
+        'type': 'cpu_usage',
+        'data': [{'recorded_at': row['recorded_at'].isoformat(), 'usage': row['usage']} for row in rows],
+    }
+
+
+def counted(fetch, counter):
+    def wrapper():
+        with connection.execute_wrapper(counter):
+            return fetch()
+    return wrapper
+
+
+async def run_polling(connections, ticks, counter):
+    """Legacy behaviour: every socket runs its own query per tick"""
+    fetch = sync_to_async(counted(query_cpu_payload, counter))
+    for _ in range(ticks):
+        await asyncio.gather(*(fetch() for _ in range(connections)))
+
+
+async def run_broadcast(connections, ticks, counter, fetch=query_cpu_payload):
+    """Shared producer: one query per tick, fanned out via group_send"""
+    layer = InMemoryChannelLayer(capacity=ticks + 10)
+    broadcaster = MetricBroadcaster('bench', counted(fetch, counter), interval=3600)
+    channels = [await layer.new_channel() for _ in range(connections)]
+    for name in channels:
+        await broadcaster.subscribe(layer, name)
+    for _ in range(ticks - 1):
+        await broadcaster.tick(layer)
+    for name in channels:
+        await broadcaster.unsubscribe(layer, name)
+
+
+async def run_cached(connections, ticks, counter):
+    """Shared producer reading the recent-samples cache (cold load only)"""
+    recent_samples.clear()
+    await run_broadcast(connections, ticks, counter, fetch=get_cpu_payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--ticks', type=int, default=5)
+    args = parser.parse_args()
+
+    call_command('migrate', 'api', verbosity=0)
+    CPUUsage.objects.bulk_create([CPUUsage(usage=i % 100) for i in range(5000)])
+
+    print(f"{'connections':>12} {'mode':>10} {'queries':>8} {'queries/tick':>13} {'seconds':>8}")
+    for connections in args.connections:
+        for mode, runner in (('polling', run_polling), ('broadcast', run_broadcast), ('cached', run_cached)):
+            counter = QueryCounter()
+            start = time.perf_counter()
+            asyncio.run(runner(connections, args.ticks, counter))
+            elapsed = time.perf_counter() - start
+            print(f"{connections:>12} {mode:>10} {counter.count:>8} "
+                  f"{counter.count / args.ticks:>13.1f} {elapsed:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
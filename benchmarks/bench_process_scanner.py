@@ -0,0 +1,99 @@
+# benchmarks/bench_process_scanner.py
+"""Compare the psutil process walk with the /proc stat/statm scanner.
+
+Usage:
+    python benchmarks/bench_process_scanner.py [--processes 1000 10000] [--rounds 3]
+
+Both samplers read the same synthetic /proc tree (psutil through
+``psutil.PROCFS_PATH``), so the comparison does not depend on the host's
+process table. The first pass registers handles and is reported apart;
+the following passes are what every ``get_processes`` refresh costs.
+Linux only: psutil's Linux backend is needed to read the fake tree.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hyperion.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import psutil  # noqa: E402
+
+from api.proc_scanner import ProcScanner  # noqa: E402
+from api.process_snapshot import ProcessRegistry  # noqa: E402
+
+MEMINFO = (
+    'MemTotal:       16384000 kB\nMemFree:         8192000 kB\nMemAvailable:   12000000 kB\n'
+    'Buffers:          100000 kB\nCached:          2000000 kB\nSwapCached:            0 kB\n'
+    'Active:          4000000 kB\nInactive:        2000000 kB\nSwapTotal:       2000000 kB\n'
+    'SwapFree:        2000000 kB\nShmem:             10000 kB\nSReclaimable:     100000 kB\n'
+)
+
+
+def build_proc(root, processes):
+    """Write a minimal /proc tree with ``processes`` entries"""
+    with open(os.path.join(root, 'stat'), 'w') as stat:
+        stat.write('cpu  100 0 100 1000 0 0 0 0 0 0\nbtime 1735689600\n')
+    with open(os.path.join(root, 'meminfo'), 'w') as meminfo:
+        meminfo.write(MEMINFO)
+    uid = os.getuid()
+    for pid in range(1, processes + 1):
+        base = os.path.join(root, str(pid))
+        os.mkdir(base)
+        name = f'worker-{pid % 50}'
+        with open(os.path.join(base, 'stat'), 'w') as stat:
+            stat.write(
+                f'{pid} ({name}) S 1 {pid} {pid} 0 -1 4194560 100 0 0 0 '
+                f'{pid % 500} {pid % 70} 0 0 20 0 1 0 {1000 + pid} 10000000 {pid % 900 + 100} '
+                + ' '.join(['0'] * 29) + '\n'
+            )
+        with open(os.path.join(base, 'statm'), 'w') as statm:
+            statm.write(f'2441 {pid % 900 + 100} 300 200 0 500 0\n')
+        with open(os.path.join(base, 'status'), 'w') as status:
+            status.write(f'Name:\t{name}\nUid:\t{uid}\t{uid}\t{uid}\t{uid}\nGid:\t0\t0\t0\t0\n')
+        with open(os.path.join(base, 'cmdline'), 'w') as cmdline:
+            cmdline.write(f'/usr/bin/{name}\0--serve\0')
+
+
+def timed(sample, rounds):
+    start = time.perf_counter()
+    rows = sample()
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(rounds):
+        rows = sample()
+    return first, (time.perf_counter() - start) / rounds, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+    if not sys.platform.startswith('linux'):
+        sys.exit('Linux only')
+
+    print(f"{'processes':>10} {'sampler':>8} {'first (ms)':>11} {'per pass (ms)':>14} {'rows':>6}")
+    for processes in args.processes:
+        root = tempfile.mkdtemp()
+        try:
+            build_proc(root, processes)
+            psutil.PROCFS_PATH = root
+            for label, sample in (('psutil', ProcessRegistry().sample), ('proc', ProcScanner(root).scan)):
+                first, per_pass, rows = timed(sample, args.rounds)
+                print(f'{processes:>10} {label:>8} {first * 1000:>11.1f} {per_pass * 1000:>14.1f} {rows:>6}')
+        finally:
+            psutil.PROCFS_PATH = '/proc'
+            shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
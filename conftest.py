@@ -20,6 +20,9 @@ def _configure_test_settings():
         }
     }
 
+    # État des échantillonneurs dans le cache Django (pas de Redis requis)
+    django_settings.SAMPLER_STATE_REDIS_URL = None
+
     # Email en mémoire
     django_settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 
@@ -46,6 +49,59 @@ def _configure_test_settings():
     # Two-factor: s'assurer du module settings
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hyperion.settings')
 
+@pytest.fixture(autouse=True)
+def _reset_process_snapshot():
+    """Chaque test repart d'un instantané de processus vide"""
+    from api.process_snapshot import process_registry, snapshot_engine
+    snapshot_engine.reset()
+    process_registry.clear()
+
+@pytest.fixture(autouse=True)
+def _reset_service_inventory():
+    """Liste des services rechargée par chaque test"""
+    from api.utils import service_inventory
+    service_inventory.reset()
+
+@pytest.fixture(autouse=True)
+def _reset_ip_blocklist():
+    """Ensembles ipset et règles DROP recréés par chaque test"""
+    from api.blocklist import ip_blocklist
+    ip_blocklist.reset()
+
+@pytest.fixture(autouse=True)
+def _reset_cpu_sampler():
+    """Pas de cpu_times précédents hérités d'un autre test"""
+    from api.cpu_sampler import cpu_sampler
+    cpu_sampler.reset()
+
+
+@pytest.fixture(autouse=True)
+def _reset_net_sampler():
+    """Pas de compteurs réseau précédents entre deux tests"""
+    from api.net_sampler import collector_net_sampler, net_sampler
+    net_sampler.reset()
+    collector_net_sampler.reset()
+
+
+@pytest.fixture(autouse=True)
+def _reset_disk_io_sampler():
+    """Pas de compteurs disque précédents entre deux tests"""
+    from api.disk_sampler import disk_io_sampler, live_disk_io_sampler
+    disk_io_sampler.reset()
+    live_disk_io_sampler.reset()
+
+@pytest.fixture(autouse=True)
+def _reset_process_event_detector():
+    """Pas de table de processus précédente entre deux tests"""
+    from api.process_events import process_event_detector
+    process_event_detector.reset()
+
+@pytest.fixture(autouse=True)
+def _reset_recent_samples():
+    """Cache des derniers échantillons vide au début de chaque test"""
+    from api.recent import recent_samples
+    recent_samples.clear()
+
 @pytest.fixture
 def api_client():
     from rest_framework.test import APIClient
@@ -11,16 +11,32 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 app.conf.beat_schedule = {
-    'record-cpu-usage-every-minute': {
-        'task': 'api.tasks.record_cpu_usage',
+    'collect-metrics-every-minute': {
+        'task': 'api.tasks.collect_metrics',
         'schedule': crontab(minute='*/1'),
     },
-    'record-memory-usage-every-minute': {
-        'task': 'api.tasks.record_memory_usage',
-        'schedule': crontab(minute='*/1'),
+    'detect-process-events-every-10-seconds': {
+        'task': 'api.tasks.detect_process_events',
+        'schedule': 10.0,
     },
-    'record-network-usage-every-minute': {
-        'task': 'api.tasks.record_network_usage',
+    'record-process-history-every-minute': {
+        'task': 'api.tasks.record_process_history',
         'schedule': crontab(minute='*/1'),
     },
+    'compact-metric-rollups-every-5-minutes': {
+        'task': 'api.tasks.compact_metric_rollups',
+        'schedule': crontab(minute='*/5'),
+    },
+    'pack-metric-chunks-hourly': {
+        'task': 'api.tasks.pack_metric_chunks',
+        'schedule': crontab(minute=2),
+    },
+    'apply-retention-policies-daily': {
+        'task': 'api.tasks.apply_retention_policies',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'maintain-metric-partitions-daily': {
+        'task': 'api.tasks.maintain_metric_partitions',
+        'schedule': crontab(hour=3, minute=45),
+    },
 }
\ No newline at end of file
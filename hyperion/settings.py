@@ -186,19 +186,95 @@ TWO_FACTOR_AUTH = {
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'django-db'
 CELERY_BEAT_SCHEDULE = {
-    'record-cpu-usage-every-minute': {
-        'task': 'api.tasks.record_cpu_usage',
+    'collect-metrics-every-minute': {
+        'task': 'api.tasks.collect_metrics',
         'schedule': crontab(minute='*/1'),
     },
-    'record-memory-usage-every-minute': {
-        'task': 'api.tasks.record_memory_usage',
-        'schedule': crontab(minute='*/1'),
+    'detect-process-events-every-10-seconds': {
+        'task': 'api.tasks.detect_process_events',
+        'schedule': 10.0,
     },
-    'record-network-usage-every-minute': {
-        'task': 'api.tasks.record_network_usage',
+    'record-process-history-every-minute': {
+        'task': 'api.tasks.record_process_history',
         'schedule': crontab(minute='*/1'),
     },
+    'compact-metric-rollups-every-5-minutes': {
+        'task': 'api.tasks.compact_metric_rollups',
+        'schedule': crontab(minute='*/5'),
+    },
+    'pack-metric-chunks-hourly': {
+        'task': 'api.tasks.pack_metric_chunks',
+        'schedule': crontab(minute=2),
+    },
+    'apply-retention-policies-daily': {
+        'task': 'api.tasks.apply_retention_policies',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'maintain-metric-partitions-daily': {
+        'task': 'api.tasks.maintain_metric_partitions',
+        'schedule': crontab(hour=3, minute=45),
+    },
+}
+
+# Monitoring temps réel
+# Intervalle (secondes) entre deux échantillonnages de la table des processus
+PROCESS_SNAPSHOT_INTERVAL = 1.0
+# Processus conservés à chaque minute par l'historique (top-N par CPU et par RSS)
+PROCESS_HISTORY_TOP_N = 10
+# Lecture de la table des processus : 'psutil', 'proc' (lecture directe de
+# /proc/<pid>/stat et statm, Linux) ou 'auto' (proc sous Linux, psutil ailleurs).
+# Le mode proc ne renseigne pas cmdline et tronque les noms à 15 caractères.
+PROCESS_SCANNER = os.environ.get('PROCESS_SCANNER', 'psutil')
+# Durée (secondes) pendant laquelle la liste des services est servie sans relancer systemctl
+SERVICE_CACHE_TTL = 5.0
+# Commandes système (systemctl, iptables) : délai maximal (secondes) avant
+# d'interrompre la commande et nombre de commandes exécutées en parallèle
+COMMAND_TIMEOUT = 30.0
+COMMAND_CONCURRENCY = 4
+# POST /api/services/bulk/ : unités acceptées par requête et actions simultanées par défaut
+SERVICE_BULK_MAX_UNITS = 100
+SERVICE_BULK_CONCURRENCY = 4
+# Liste de blocage IP : ensembles ipset (suffixe -v6 pour IPv6) et nombre maximal d'adresses par ensemble
+BLOCKLIST_SET_NAME = 'hyperion-blocklist'
+BLOCKLIST_MAX_ELEMENTS = 65536
+# Démon hyperion_collector : période d'échantillonnage et d'écriture (secondes),
+# taille des tampons circulaires (échantillons conservés en mémoire)
+COLLECTOR_SAMPLE_INTERVAL = 0.5
+COLLECTOR_FLUSH_INTERVAL = 10.0
+COLLECTOR_BUFFER_SIZE = 3600
+
+# Rétention des données (jours) par modèle ; None = conservation illimitée.
+# Les suppressions se font par lots de RETENTION_BATCH_SIZE clés primaires.
+RETENTION_DAYS = {
+    'api.CPUUsage': 30,
+    'api.MemoryUsage': 30,
+    'api.NetworkUsage': 30,
+    'api.StorageUsage': 90,
+    'api.DiskIOUsage': 30,
+    'api.ProcessSample': 30,
+    'api.ProcessEvent': 30,
+    'api.MetricChunk': 365,
+    # Agrégats MetricRollup par résolution ; 1m au plus aussi longtemps que les lignes brutes
+    'api.MetricRollup:1m': 7,
+    'api.MetricRollup:1h': 365,
+    'api.MetricRollup:1d': 1825,
+    'api.AuditLog': 365,
+    'django_celery_results.TaskResult': 7,
 }
+RETENTION_BATCH_SIZE = 5000
+# Tables partitionnées : mois créés à l'avance par la tâche maintain_metric_partitions
+PARTITION_MONTHS_AHEAD = 3
+
+# Cache des derniers échantillons lus par les WebSockets et le tableau de bord.
+# Sans URL Redis, chaque processus garde son propre cache mémoire.
+RECENT_SAMPLES_SIZE = 100
+RECENT_SAMPLES_TTL = 5.0
+RECENT_SAMPLES_REDIS_URL = os.environ.get('RECENT_SAMPLES_REDIS_URL')
+
+# Relevé précédent des détecteurs (événements et historique des processus),
+# partagé par tous les workers Celery de la machine. Sans Redis, repli sur le
+# cache Django, propre à chaque processus avec le cache LocMem par défaut.
+SAMPLER_STATE_REDIS_URL = os.environ.get('SAMPLER_STATE_REDIS_URL', CELERY_BROKER_URL)
 
 # Channels settings
 ASGI_APPLICATION = 'hyperion.asgi.application'